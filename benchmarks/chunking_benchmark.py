@@ -0,0 +1,168 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmarks.load_generator import _git_revision
+from benchmarks.retrieval_tuning import load_labeled_questions, is_relevant
+from config.settings import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_PACK_TOKENS
+from embeddings.local_embedding import LocalEmbedding
+from utils.extracter import extract_questions_and_answers
+from utils.splitter import FAQTextSplitter, TokenTextSplitter
+from utils.tokenizer import count_tokens
+
+def chunk_statistics(documents, chunk_tokens):
+    """
+    청크 수와 임베딩에 쓰이는 토큰 수를 계산합니다.
+
+    Parameters:
+        documents (list): 청크 리스트
+        chunk_tokens (int): 청크 토큰 예산
+
+    Returns:
+        dict: 청크 통계
+    """
+    tokens = np.asarray([count_tokens(document) for document in documents], dtype=np.int64)
+    return {
+        'chunks': len(documents),
+        'embedding_tokens': int(tokens.sum()),
+        'mean_tokens': round(float(tokens.mean()), 1) if tokens.size else 0.0,
+        'max_tokens': int(tokens.max()) if tokens.size else 0,
+        'over_budget': int((tokens > chunk_tokens).sum())
+    }
+
+def retrieval_recall(documents, metadatas, labeled, ks):
+    """
+    청크로 로컬 임베딩 모델을 학습하고 전수 검색으로 질문별 관련 청크 재현율을 계산합니다.
+    분할 방식마다 같은 조건으로 학습하므로 API 호출 없이 분할 방식끼리 비교할 수 있습니다.
+
+    Parameters:
+        documents (list): 청크 리스트
+        metadatas (list): 청크 메타데이터 리스트
+        labeled (list): 질문 딕셔너리(question, relevant_questions, relevant_ids) 리스트
+        ks (list): 재현율을 계산할 결과 수 리스트
+
+    Returns:
+        dict: k별 재현율
+    """
+    embedding = LocalEmbedding().fit(documents)
+    chunk_embeddings = embedding.encode(documents)
+    query_embeddings = embedding.encode([item['question'] for item in labeled])
+    records = [
+        {'id': str(index), 'metadata': metadata}
+        for index, metadata in enumerate(metadatas)
+    ]
+
+    max_k = min(max(ks), len(documents))
+    # 단위 벡터이므로 내적이 클수록 L2 거리가 가깝습니다.
+    similarities = query_embeddings @ chunk_embeddings.T
+    top = np.argpartition(-similarities, max_k - 1, axis=1)[:, :max_k]
+    hits = {k: 0 for k in ks}
+    in_domain = 0
+    for item, row, candidates in zip(labeled, similarities, top):
+        if not (item['relevant_questions'] or item['relevant_ids']):
+            continue
+        in_domain += 1
+        ranked = candidates[np.argsort(-row[candidates])]
+        relevant = [is_relevant(item, records[index]) for index in ranked]
+        for k in ks:
+            hits[k] += any(relevant[:k])
+    return {f'recall@{k}': round(hits[k] / in_domain, 4) if in_domain else None for k in ks}
+
+def self_retrieval_questions(qa_pairs, count, seed):
+    """
+    FAQ 질문 자체를 질의로 쓰는 질문 세트를 만듭니다. 정답은 그 질문의 청크입니다.
+    """
+    questions = list(dict.fromkeys(item['question'] for item in qa_pairs if item['question']))
+    random.Random(seed).shuffle(questions)
+    return [
+        {'question': question, 'relevant_questions': {question}, 'relevant_ids': set()}
+        for question in questions[:count]
+    ]
+
+def run_splitter(name, splitter, qa_pairs, labeled, ks, chunk_tokens):
+    started = time.perf_counter()
+    documents, metadatas = splitter.split(qa_pairs)
+    split_seconds = time.perf_counter() - started
+    result = {'splitter': name, 'split_seconds': round(split_seconds, 2)}
+    result.update(chunk_statistics(documents, chunk_tokens))
+    result.update(retrieval_recall(documents, metadatas, labeled, ks))
+    return result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="문자 수 기준 분할기와 토큰 수 기준 분할기의 청크 수, 임베딩 토큰, 검색 재현율을 비교합니다.")
+    parser.add_argument("file_path", nargs="?", default="datasets/final_result.pkl", help="FAQ 데이터 파일 경로")
+    parser.add_argument("--questions", default=None, help="레이블이 붙은 질문 세트 (JSON Lines, 없으면 FAQ 질문으로 검색)")
+    parser.add_argument("--sample", type=int, default=1000, help="질문 세트가 없을 때 질의로 쓸 FAQ 질문 수")
+    parser.add_argument("--chunk-size", type=int, default=256, help="기존 분할기의 청크 최대 문자 수")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS, help="토큰 분할기의 청크 최대 토큰 수")
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS, help="토큰 분할기의 중첩 토큰 수")
+    parser.add_argument("--pack-tokens", type=int, default=CHUNK_PACK_TOKENS, help="이 토큰 수 이하인 항목을 묶음 (0이면 묶지 않음)")
+    parser.add_argument("--k", default="1,3,5", help="쉼표로 구분한 재현율 계산 결과 수 목록")
+    parser.add_argument("--seed", type=int, default=0, help="질의 표본 난수 시드")
+    parser.add_argument("--output", default=None, help="JSON 보고서 경로")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    ks = [int(value) for value in args.k.split(",")]
+    qa_pairs = extract_questions_and_answers(args.file_path)
+    if not qa_pairs:
+        raise ValueError(f"FAQ 데이터가 없습니다: {args.file_path}")
+    if args.questions:
+        labeled = load_labeled_questions(args.questions)
+    else:
+        labeled = self_retrieval_questions(qa_pairs, args.sample, args.seed)
+    print(f"FAQ 항목 {len(qa_pairs)}개, 질문 {len(labeled)}개")
+
+    splitters = [
+        (f"chars-{args.chunk_size}", FAQTextSplitter(chunk_size=args.chunk_size, chunk_overlap=0)),
+        (
+            f"tokens-{args.chunk_tokens}",
+            TokenTextSplitter(
+                chunk_tokens=args.chunk_tokens,
+                overlap_tokens=args.overlap_tokens,
+                pack_tokens=args.pack_tokens
+            )
+        )
+    ]
+    results = []
+    for name, splitter in splitters:
+        result = run_splitter(name, splitter, qa_pairs, labeled, ks, args.chunk_tokens)
+        results.append(result)
+        print(
+            f"[{name}] 청크: {result['chunks']}개, 임베딩 토큰: {result['embedding_tokens']:,}, "
+            f"평균/최대: {result['mean_tokens']}/{result['max_tokens']} 토큰, 예산 초과: {result['over_budget']}개, "
+            + ", ".join(f"recall@{k}: {result[f'recall@{k}']}" for k in ks)
+        )
+
+    baseline, candidate = results
+    if baseline['embedding_tokens']:
+        print(
+            f"청크: {baseline['chunks']}개 -> {candidate['chunks']}개, "
+            f"임베딩 토큰 {1 - candidate['embedding_tokens'] / baseline['embedding_tokens']:.1%} 절약"
+        )
+
+    if args.output:
+        report = {
+            'build': _git_revision(),
+            'config': {
+                'faq_items': len(qa_pairs),
+                'questions': len(labeled),
+                'question_source': args.questions or "faq",
+                'chunk_size': args.chunk_size,
+                'chunk_tokens': args.chunk_tokens,
+                'overlap_tokens': args.overlap_tokens,
+                'pack_tokens': args.pack_tokens,
+                'ks': ks
+            },
+            'results': results
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"보고서를 저장했습니다: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from benchmarks.load_generator import _git_revision
+from benchmarks.retrieval_tuning import load_labeled_questions
+from chains.domain_gate import DomainGate, train_domain_classifier, save_domain_classifier, load_domain_classifier
+from config.settings import (
+    OPENAI_API_KEY,
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_THRESHOLD,
+    DOMAIN_GATE_SCORE_THRESHOLD,
+    DOMAIN_GATE_LEXICAL_THRESHOLD,
+    DOMAIN_CLASSIFIER_PATH,
+    DOMAIN_CLASSIFIER_THRESHOLD
+)
+from embeddings.embedding import embedding_model_version
+from stores.factory import create_vector_store
+
+def refusal_metrics(refused, off_topic):
+    """
+    거절 결정의 정밀도와 재현율을 계산합니다. 주제 밖 질문을 양성으로 봅니다.
+
+    Parameters:
+        refused (list): 각 질문을 거절했는지 여부
+        off_topic (list): 각 질문이 실제로 주제 밖인지 여부
+
+    Returns:
+        dict: 정밀도, 재현율, 잘못 거절한 주제 질문 수, 절약한 LLM 호출 단계 수
+    """
+    refused = np.asarray(refused, dtype=bool)
+    off_topic = np.asarray(off_topic, dtype=bool)
+    true_positives = int((refused & off_topic).sum())
+    false_positives = int((refused & ~off_topic).sum())
+    return {
+        'precision': round(true_positives / int(refused.sum()), 4) if refused.any() else None,
+        'recall': round(true_positives / int(off_topic.sum()), 4) if off_topic.any() else None,
+        'false_refusals': false_positives,
+        'refused': int(refused.sum()),
+        'llm_calls_saved': true_positives
+    }
+
+def cross_validated_probabilities(embeddings, labels, folds=5, seed=0):
+    """
+    교차 검증으로 각 질문이 학습에 쓰이지 않은 분류기의 FAQ 주제 확률을 구합니다.
+
+    Returns:
+        numpy.ndarray: 질문별 FAQ 주제 확률 또는 교차 검증할 수 없으면 None
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    labels = np.asarray(labels, dtype=bool)
+    folds = min(folds, int(labels.sum()), int((~labels).sum()))
+    if folds < 2:
+        return None
+    probabilities = np.zeros(len(labels), dtype=np.float64)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for train, test in splitter.split(embeddings, labels):
+        model = train_domain_classifier(embeddings[train], labels[train])
+        probabilities[test] = model['classifier'].predict_proba(embeddings[test])[:, 1]
+    return probabilities
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="주제 밖 질문 판별기의 정밀도와 재현율을 측정하고 분류기를 학습합니다.")
+    parser.add_argument("questions", help="레이블이 붙은 질문 세트 (JSON Lines, 관련 문서가 없으면 주제 밖 질문)")
+    parser.add_argument("--score-threshold", type=float, default=DOMAIN_GATE_SCORE_THRESHOLD, help="검색 점수 임계값")
+    parser.add_argument("--lexical-threshold", type=float, default=DOMAIN_GATE_LEXICAL_THRESHOLD, help="어휘 겹침 임계값")
+    parser.add_argument("--classifier-threshold", type=float, default=DOMAIN_CLASSIFIER_THRESHOLD, help="분류기 확률 임계값")
+    parser.add_argument("--classifier-path", default=DOMAIN_CLASSIFIER_PATH, help="분류기 파일 경로")
+    parser.add_argument("--train", action="store_true", help="질문 세트로 분류기를 학습하여 저장합니다. (평가는 교차 검증 확률 사용)")
+    parser.add_argument("--output", default=None, help="JSON 보고서 경로")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    labeled = load_labeled_questions(args.questions)
+    vector_store = create_vector_store(OPENAI_API_KEY)
+    documents = vector_store.load_documents()
+    if not documents:
+        raise ValueError("Chroma DB에 저장된 임베딩 데이터가 없습니다. 먼저 embed_and_store.py를 실행하세요.")
+    model_version = embedding_model_version(vector_store.embedding_model)
+
+    gate = DomainGate.from_documents(
+        documents,
+        score_threshold=args.score_threshold,
+        lexical_threshold=args.lexical_threshold,
+        classifier_threshold=args.classifier_threshold
+    )
+    off_topic = [not (item['relevant_questions'] or item['relevant_ids']) for item in labeled]
+    embeddings = np.asarray([vector_store.embed_query(item['question']) for item in labeled], dtype=np.float32)
+    top_scores, lexical = [], []
+    for item, embedding in zip(labeled, embeddings):
+        results = vector_store.similarity_search(
+            item['question'], RETRIEVAL_TOP_K, threshold=RETRIEVAL_THRESHOLD, query_embedding=embedding.tolist()
+        )
+        top_scores.append(max((result['score'] for result in results or []), default=0.0))
+        lexical.append(gate.lexical_overlap(item['question']))
+    print(f"질문 {len(labeled)}개 (주제 밖 질문 {sum(off_topic)}개)")
+
+    probabilities = None
+    if args.train:
+        in_domain = [not value for value in off_topic]
+        probabilities = cross_validated_probabilities(embeddings, in_domain)
+        model = train_domain_classifier(embeddings, in_domain, embedding_model=model_version)
+        save_domain_classifier(model, args.classifier_path)
+        print(f"분류기를 저장했습니다: {args.classifier_path}")
+    else:
+        model = load_domain_classifier(args.classifier_path, model_version)
+        if model is not None:
+            probabilities = model['classifier'].predict_proba(embeddings)[:, 1]
+
+    gate_probabilities = [None] * len(labeled) if probabilities is None else probabilities
+    decisions = {
+        'score': [score < args.score_threshold for score in top_scores],
+        'lexical': [value < args.lexical_threshold for value in lexical],
+        'gate': [
+            not gate.decide(score, value, probability)
+            for score, value, probability in zip(top_scores, lexical, gate_probabilities)
+        ]
+    }
+    if probabilities is not None:
+        decisions['classifier'] = [probability < args.classifier_threshold for probability in probabilities]
+
+    results = {}
+    for name, refused in decisions.items():
+        results[name] = refusal_metrics(refused, off_topic)
+        metrics = results[name]
+        print(
+            f"[{name}] 정밀도: {metrics['precision']}, 재현율: {metrics['recall']}, "
+            f"잘못 거절: {metrics['false_refusals']}개, 절약한 LLM 호출: {metrics['llm_calls_saved']}개"
+        )
+
+    if args.output:
+        report = {
+            'build': _git_revision(),
+            'config': {
+                'questions': len(labeled),
+                'off_topic': sum(off_topic),
+                'score_threshold': args.score_threshold,
+                'lexical_threshold': args.lexical_threshold,
+                'classifier_threshold': args.classifier_threshold if probabilities is not None else None,
+                'classifier_cross_validated': bool(args.train and probabilities is not None)
+            },
+            'results': results
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"보고서를 저장했습니다: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.load_generator import _git_revision, _percentiles
+from stores.ivfpq_vector_store import IVFPQIndex, default_subquantizers
+
+def synthetic_embeddings(count, dimension, clusters=1000, spread=0.35, seed=0):
+    """
+    FAQ 임베딩처럼 주제별로 뭉친 단위 벡터를 만듭니다.
+
+    Parameters:
+        count (int): 벡터 수
+        dimension (int): 차원
+        clusters (int): 주제(군집) 수 (기본값: 1000)
+        spread (float): 군집 내 흩어짐 정도 (기본값: 0.35)
+        seed (int): 난수 시드 (기본값: 0)
+
+    Returns:
+        numpy.ndarray: (count, dimension) 단위 벡터 행렬
+    """
+    generator = np.random.default_rng(seed)
+    centers = generator.standard_normal((clusters, dimension), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[generator.integers(0, clusters, count)]
+    vectors += generator.standard_normal((count, dimension), dtype=np.float32) * (spread / np.sqrt(dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def make_queries(vectors, count, noise=0.3, seed=1):
+    """
+    저장된 벡터에 잡음을 더해 질의를 만듭니다. 질문을 다르게 표현한 경우를 흉내 냅니다.
+    """
+    generator = np.random.default_rng(seed)
+    queries = vectors[generator.integers(0, vectors.shape[0], count)].copy()
+    queries += generator.standard_normal(queries.shape, dtype=np.float32) * (noise / np.sqrt(vectors.shape[1]))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+def exact_neighbors(vectors, queries, k, chunk_size=65536):
+    """
+    전수 검색으로 정답 최근접 이웃을 구합니다.
+
+    Returns:
+        numpy.ndarray: (질의 수, k) 벡터 번호
+    """
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    best_distances = np.full((queries.shape[0], k), np.inf, dtype=np.float32)
+    best_indices = np.zeros((queries.shape[0], k), dtype=np.int64)
+    for start in range(0, vectors.shape[0], chunk_size):
+        block = vectors[start:start + chunk_size]
+        distances = norms[start:start + chunk_size][None, :] - 2 * (queries @ block.T)
+        merged_distances = np.concatenate([best_distances, distances], axis=1)
+        merged_indices = np.concatenate([best_indices, np.arange(start, start + block.shape[0])[None, :].repeat(queries.shape[0], 0)], axis=1)
+        top = np.argpartition(merged_distances, k - 1, axis=1)[:, :k]
+        best_distances = np.take_along_axis(merged_distances, top, axis=1)
+        best_indices = np.take_along_axis(merged_indices, top, axis=1)
+    return best_indices
+
+def measure(index, queries, truth, k, nprobe, rerank):
+    """
+    nprobe, rerank 조합에 대한 재현율과 질의 지연을 측정합니다.
+
+    Returns:
+        dict: 측정 결과
+    """
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        positions, _ = index.search(query, k, nprobe=nprobe, rerank=rerank)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(index.order[positions].tolist()) & set(expected.tolist()))
+    return {
+        'nprobe': nprobe,
+        'rerank': rerank,
+        f'recall@{k}': round(hits / truth.size, 4),
+        'latency': _percentiles(latencies),
+        'mean_ms': round(float(np.mean(latencies)) * 1000, 3)
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="IVF-PQ 색인의 재현율, 지연, 메모리 사용량을 측정합니다.")
+    parser.add_argument("--embeddings", default=None, help="측정할 임베딩 .npy 파일 (예: 스냅샷의 embeddings.npy, 없으면 합성 데이터)")
+    parser.add_argument("--count", type=int, default=200000, help="합성 벡터 수")
+    parser.add_argument("--dimension", type=int, default=256, help="합성 벡터 차원")
+    parser.add_argument("--queries", type=int, default=500, help="질의 수")
+    parser.add_argument("--k", type=int, default=5, help="재현율을 계산할 결과 수")
+    parser.add_argument("--nlist", type=int, default=None, help="리스트 수 (기본값: 벡터 수의 제곱근의 4배)")
+    parser.add_argument("--m", type=int, default=None, help="하위 양자화기 수 (기본값: 하위 벡터 차원 16)")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="쉼표로 구분한 nprobe 목록")
+    parser.add_argument("--rerank", default="0,64,256", help="쉼표로 구분한 재정렬 후보 수 목록")
+    parser.add_argument("--seed", type=int, default=0, help="난수 시드")
+    parser.add_argument("--output", default=None, help="JSON 보고서 경로")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.embeddings:
+        vectors = np.asarray(np.load(args.embeddings, mmap_mode='r'), dtype=np.float32)
+    else:
+        vectors = synthetic_embeddings(args.count, args.dimension, seed=args.seed)
+    count, dimension = vectors.shape
+    queries = make_queries(vectors, args.queries, seed=args.seed + 1)
+
+    truth = exact_neighbors(vectors, queries, args.k)
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    exact_latencies = []
+    for query in queries[:50]:
+        started = time.perf_counter()
+        distances = norms - 2 * (vectors @ query)
+        np.argpartition(distances, args.k - 1)[:args.k]
+        exact_latencies.append(time.perf_counter() - started)
+    exact_ms = float(np.mean(exact_latencies)) * 1000
+
+    nlist = args.nlist or max(1, min(int(4 * np.sqrt(count)), count // 39))
+    started = time.perf_counter()
+    index = IVFPQIndex(nlist, args.m or default_subquantizers(dimension), seed=args.seed).build(vectors)
+    build_seconds = time.perf_counter() - started
+
+    memory = {
+        'raw_float32_bytes': int(vectors.nbytes),
+        'ivfpq_resident_bytes': int(index.memory_bytes()),
+        # 링크 수 M=16 기준 HNSW 추정치: 원본 벡터 + 0층 링크 2M개 + 상위 층 링크
+        'hnsw_estimate_bytes': int(count * (dimension * 4 + 2 * 16 * 4 * 1.1))
+    }
+    print(
+        f"벡터 {count}개 x {dimension}차원, 리스트 {index.nlist}개, 벡터당 코드 {index.m}바이트, 색인 생성 {build_seconds:.1f}초"
+    )
+    print(
+        f"메모리: 원본 {memory['raw_float32_bytes'] / 2 ** 20:.1f} MiB, IVF-PQ 상주 {memory['ivfpq_resident_bytes'] / 2 ** 20:.1f} MiB, "
+        f"HNSW 추정 {memory['hnsw_estimate_bytes'] / 2 ** 20:.1f} MiB / 전수 검색 {exact_ms:.2f} ms/질의"
+    )
+
+    results = []
+    for rerank in [int(value) for value in args.rerank.split(",")]:
+        for nprobe in [int(value) for value in args.nprobe.split(",")]:
+            result = measure(index, queries, truth, args.k, nprobe, rerank)
+            results.append(result)
+            print(
+                f"[nprobe {nprobe:>3} rerank {rerank:>3}] recall@{args.k}: {result[f'recall@{args.k}']:.3f}, "
+                f"평균: {result['mean_ms']:.3f} ms, p99: {result['latency']['p99_ms']} ms"
+            )
+
+    if args.output:
+        report = {
+            'build': _git_revision(),
+            'config': {
+                'source': args.embeddings or "synthetic",
+                'count': count,
+                'dimension': dimension,
+                'queries': len(queries),
+                'k': args.k,
+                'nlist': index.nlist,
+                'm': index.m,
+                'build_seconds': round(build_seconds, 2)
+            },
+            'exact_ms_per_query': round(exact_ms, 3),
+            'memory': memory,
+            'results': results
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"보고서를 저장했습니다: {args.output}")
+
+if __name__ == "__main__":
+    main()
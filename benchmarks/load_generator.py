@@ -0,0 +1,367 @@
+import argparse
+import itertools
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from benchmarks.stubs import (
+    LatencyDistribution,
+    StubLanguageModel,
+    StubEmbedding,
+    StubVectorStore,
+    StubOpenAIServer
+)
+from config.settings import RETRIEVAL_TOP_K, RETRIEVAL_THRESHOLD
+from chains.retrieval_qa_chain import RetrievalQAChain
+from retrievers.vector_store_retriever import VectorStoreRetriever
+from caches.semantic_cache import SemanticCache
+
+def load_questions(file_path):
+    """
+    질문 로그를 불러옵니다. 한 줄에 질문 하나인 텍스트 파일이나 'question' 키를 가진 JSON Lines 파일을 지원합니다.
+
+    Parameters:
+        file_path (str): 질문 로그 파일 경로
+
+    Returns:
+        list: 질문 리스트
+    """
+    questions = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get('question', "")
+            if line:
+                questions.append(line)
+    if not questions:
+        raise ValueError(f"질문 로그가 비어 있습니다: {file_path}")
+    return questions
+
+def load_documents(file_path, questions):
+    """
+    대역 벡터 저장소에 넣을 문서를 불러옵니다. 파일이 없으면 질문 로그로 문서를 만듭니다.
+
+    Parameters:
+        file_path (str, optional): 한 줄에 문서 하나인 파일 경로 ('text' 키를 가진 JSON Lines 지원)
+        questions (list): 질문 리스트
+
+    Returns:
+        list: 문서 리스트
+    """
+    if not file_path:
+        return [f"Q: {question}\nA: {question}에 대한 안내입니다." for question in dict.fromkeys(questions)]
+    documents = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                documents.append(json.loads(line).get('text', "") if line.startswith("{") else line)
+    return documents
+
+def chain_runner_factory(args, documents):
+    """
+    스레드마다 독립된 RetrievalQAChain을 만들어 질문을 실행하는 함수를 반환합니다.
+
+    Parameters:
+        args (argparse.Namespace): 명령행 인자
+        documents (list): 대역 벡터 저장소 문서 리스트
+
+    Returns:
+        tuple: (실행 함수 생성기, 종료 함수)
+    """
+    llm_latency = LatencyDistribution.parse(args.llm_latency, seed=args.seed)
+    embedding_latency = LatencyDistribution.parse(args.embedding_latency, seed=args.seed)
+    stub_language_model = StubLanguageModel(llm_latency, error_rate=args.error_rate, seed=args.seed)
+    stub_embedding = StubEmbedding(latency=embedding_latency)
+
+    server = None
+    if args.transport == "http":
+        from models.language_model import OpenAILanguageModel
+        from embeddings.embedding import OpenAIEmbedding
+
+        server = StubOpenAIServer(stub_language_model, stub_embedding).start()
+        # 클라이언트의 숨은 재시도는 지연을 부풀리고, 오류를 안내 문구로 바꾸면 오류율이 항상 0이 되므로
+        # 재시도 없이 예외를 그대로 발생시켜 요청 오류로 집계합니다.
+        embedding_model = OpenAIEmbedding(
+            "stub", model=stub_embedding.model, base_url=server.base_url, max_retries=0, raise_errors=True
+        )
+        make_language_model = lambda: OpenAILanguageModel("stub", base_url=server.base_url, max_retries=0, raise_errors=True)
+    else:
+        embedding_model = stub_embedding
+        make_language_model = lambda: stub_language_model
+
+    vector_store = StubVectorStore(documents, embedding_model)
+    response_cache = SemanticCache(threshold=args.cache_threshold) if args.cache else None
+
+    def make_runner():
+        chain = RetrievalQAChain(
+            VectorStoreRetriever(vector_store, k=RETRIEVAL_TOP_K, threshold=args.threshold),
+            language_model=make_language_model(),
+            response_cache=response_cache
+        )
+
+        def run(question):
+            # 질문 로그의 각 줄은 독립된 질문으로 재생합니다.
+            chain.conversation_history = []
+            chain.run(question)
+            return dict(chain.stage_timings)
+        return run
+
+    return make_runner, (server.stop if server else lambda: None)
+
+def endpoint_runner_factory(args):
+    """
+    서빙 중인 엔드포인트에 {"question": ...}을 POST하는 실행 함수 생성기를 반환합니다.
+    """
+    def make_runner():
+        def run(question):
+            request = urllib.request.Request(
+                args.endpoint,
+                data=json.dumps({'question': question}).encode('utf-8'),
+                headers={"Content-Type": "application/json"}
+            )
+            with urllib.request.urlopen(request, timeout=args.timeout) as response:
+                response.read()
+            return {}
+        return run
+    return make_runner, lambda: None
+
+def _execute(run, question, scheduled_at):
+    """
+    질문 하나를 실행하고 예정 시각부터 완료까지의 지연을 측정합니다.
+    """
+    try:
+        stages = run(question)
+        error = None
+    except Exception as e:
+        stages, error = {}, type(e).__name__
+    finished_at = time.perf_counter()
+    return {'latency': finished_at - scheduled_at, 'finished_at': finished_at, 'stages': stages, 'error': error}
+
+def run_closed_loop(make_runner, questions, concurrency, duration, max_requests=None):
+    """
+    고정된 수의 작업자가 응답을 받는 즉시 다음 질문을 보내는 폐쇄 루프 부하를 실행합니다.
+
+    Parameters:
+        make_runner (callable): 실행 함수 생성기
+        questions (list): 질문 리스트
+        concurrency (int): 동시 작업자 수
+        duration (float): 실행 시간(초)
+        max_requests (int, optional): 최대 요청 수
+
+    Returns:
+        tuple: (요청별 결과 리스트, 시작 시각)
+    """
+    samples = []
+    counter = itertools.count()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker():
+        run = make_runner()
+        while time.perf_counter() < deadline:
+            index = next(counter)
+            if max_requests and index >= max_requests:
+                break
+            samples.append(_execute(run, questions[index % len(questions)], time.perf_counter()))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, start
+
+def run_open_loop(make_runner, questions, rate, duration, max_in_flight=256, seed=None):
+    """
+    고정된 도착률(포아송 과정)로 질문을 보내는 개방 루프 부하를 실행합니다.
+    지연은 예정된 도착 시각부터 측정하므로 대기열 지연이 결과에 포함됩니다.
+
+    Parameters:
+        make_runner (callable): 실행 함수 생성기
+        questions (list): 질문 리스트
+        rate (float): 초당 도착 요청 수
+        duration (float): 실행 시간(초)
+        max_in_flight (int): 동시에 처리할 최대 요청 수 (기본값: 256)
+        seed (int, optional): 난수 시드
+
+    Returns:
+        tuple: (요청별 결과 리스트, 시작 시각)
+    """
+    rng = random.Random(seed)
+    local = threading.local()
+
+    def execute(question, scheduled_at):
+        if not hasattr(local, 'run'):
+            local.run = make_runner()
+        return _execute(local.run, question, scheduled_at)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        start = time.perf_counter()
+        scheduled_at = start
+        for index in itertools.count():
+            scheduled_at += rng.expovariate(rate)
+            if scheduled_at >= start + duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(execute, questions[index % len(questions)], scheduled_at))
+        wait(futures)
+    return [future.result() for future in futures], start
+
+def _percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2)}
+
+def summarize(samples, start, level):
+    """
+    요청별 결과를 처리량, 오류율, 지연 백분위수로 요약합니다.
+
+    Parameters:
+        samples (list): 요청별 결과 리스트
+        start (float): 부하 시작 시각
+        level (float): 동시성 또는 도착률
+
+    Returns:
+        dict: 요약 결과
+    """
+    elapsed = max((sample['finished_at'] for sample in samples), default=start) - start
+    succeeded = [sample for sample in samples if sample['error'] is None]
+    errors = {}
+    for sample in samples:
+        if sample['error']:
+            errors[sample['error']] = errors.get(sample['error'], 0) + 1
+
+    stage_names = sorted({stage for sample in succeeded for stage in sample['stages']})
+    return {
+        'level': level,
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(1 - len(succeeded) / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(succeeded) / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency': _percentiles([sample['latency'] for sample in succeeded]),
+        'stages': {
+            stage: _percentiles([sample['stages'][stage] for sample in succeeded if stage in sample['stages']])
+            for stage in stage_names
+        }
+    }
+
+def find_saturation(levels, slo_ms, max_error_rate, min_gain=0.05):
+    """
+    처리량이 더 이상 늘지 않거나 p99 지연 또는 오류율이 기준을 넘는 첫 부하 수준을 찾습니다.
+
+    Parameters:
+        levels (list): 부하 수준별 요약 결과
+        slo_ms (float): p99 지연 목표(밀리초)
+        max_error_rate (float): 허용 오류율
+        min_gain (float): 포화로 보지 않을 최소 처리량 증가율 (기본값: 0.05)
+
+    Returns:
+        dict: 포화 지점 (level, reason) 또는 None
+    """
+    previous = None
+    for summary in levels:
+        if summary['error_rate'] > max_error_rate:
+            return {'level': summary['level'], 'reason': "error_rate"}
+        if summary['latency'] and summary['latency']['p99_ms'] > slo_ms:
+            return {'level': summary['level'], 'reason': "p99_latency"}
+        if previous and summary['throughput_rps'] < previous['throughput_rps'] * (1 + min_gain):
+            return {'level': summary['level'], 'reason': "throughput_plateau"}
+        previous = summary
+    return None
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="질문 로그를 재생하여 QA 챗봇에 부하를 주고 지연 백분위수를 보고합니다.")
+    parser.add_argument("questions", help="질문 로그 파일 (텍스트 또는 JSON Lines)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="closed: 고정 동시성, open: 고정 도착률")
+    parser.add_argument("--levels", default="1,2,4,8", help="쉼표로 구분한 동시성(closed) 또는 초당 도착률(open) 목록")
+    parser.add_argument("--duration", type=float, default=30.0, help="부하 수준별 실행 시간(초)")
+    parser.add_argument("--max-requests", type=int, default=None, help="부하 수준별 최대 요청 수 (closed)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="동시에 처리할 최대 요청 수 (open)")
+    parser.add_argument("--endpoint", default=None, help="체인 대신 부하를 줄 HTTP 엔드포인트")
+    parser.add_argument("--transport", choices=["inproc", "http"], default="inproc", help="대역 모델 호출 방식 (http: 로컬 OpenAI 호환 서버)")
+    parser.add_argument("--documents", default=None, help="대역 벡터 저장소 문서 파일 (없으면 질문 로그로 생성)")
+    parser.add_argument("--llm-latency", default="lognormal:800:0.4", help="대역 LLM 지연 분포 (종류:평균ms[:폭])")
+    parser.add_argument("--embedding-latency", default="lognormal:60:0.3", help="대역 임베딩 지연 분포 (종류:평균ms[:폭])")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="대역 LLM 오류 확률")
+    parser.add_argument("--threshold", type=float, default=RETRIEVAL_THRESHOLD, help="검색 유사도 임계값")
+    parser.add_argument("--cache", action="store_true", help="시맨틱 응답 캐시 사용")
+    parser.add_argument("--cache-threshold", type=float, default=0.95, help="시맨틱 응답 캐시 임계값")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="포화 판단 기준 p99 지연(밀리초)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="포화 판단 기준 오류율")
+    parser.add_argument("--timeout", type=float, default=60.0, help="엔드포인트 요청 제한 시간(초)")
+    parser.add_argument("--seed", type=int, default=0, help="난수 시드")
+    parser.add_argument("--output", default="load_report.json", help="JSON 보고서 경로")
+    return parser.parse_args()
+
+def main():
+    """
+    부하 수준별로 부하를 실행하고 JSON 보고서를 저장합니다.
+    """
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    questions = load_questions(args.questions)
+    if args.endpoint:
+        make_runner, shutdown = endpoint_runner_factory(args)
+    else:
+        make_runner, shutdown = chain_runner_factory(args, load_documents(args.documents, questions))
+
+    levels = []
+    try:
+        for level in [float(value) for value in args.levels.split(",")]:
+            if args.mode == "closed":
+                samples, start = run_closed_loop(make_runner, questions, int(level), args.duration, args.max_requests)
+            else:
+                samples, start = run_open_loop(make_runner, questions, level, args.duration, args.max_in_flight, args.seed)
+            summary = summarize(samples, start, level)
+            levels.append(summary)
+            print(
+                f"[{args.mode} {level:g}] 처리량: {summary['throughput_rps']} rps, "
+                f"p99: {summary['latency']['p99_ms'] if summary['latency'] else '-'} ms, 오류율: {summary['error_rate']}"
+            )
+    finally:
+        shutdown()
+
+    report = {
+        'build': _git_revision(),
+        'config': {
+            'mode': args.mode,
+            'target': args.endpoint or f"chain/{args.transport}",
+            'duration_s': args.duration,
+            'questions': len(questions),
+            'llm_latency': LatencyDistribution.parse(args.llm_latency).to_dict(),
+            'embedding_latency': LatencyDistribution.parse(args.embedding_latency).to_dict(),
+            'error_rate': args.error_rate,
+            'cache': args.cache,
+            'slo_ms': args.slo_ms
+        },
+        'levels': levels,
+        'saturation': find_saturation(levels, args.slo_ms, args.max_error_rate)
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"보고서를 저장했습니다: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import itertools
+import json
+import logging
+import time
+
+import chromadb
+import numpy as np
+
+from benchmarks.load_generator import _git_revision, _percentiles
+from config.settings import OPENAI_API_KEY, EMBEDDING_BACKEND, RETRIEVAL_THRESHOLD
+from stores.chroma_vector_store import ChromaVectorStore
+from stores.factory import create_vector_store
+from utils.deduplicate import merged_questions
+
+def load_labeled_questions(file_path):
+    """
+    레이블이 붙은 질문 세트를 불러옵니다. 한 줄에 JSON 객체 하나이며, 관련 문서는 FAQ 질문
+    ('relevant_questions') 또는 문서 ID('relevant_ids')로 지정합니다. 둘 다 비어 있으면 주제를 벗어난 질문입니다.
+
+    예) {"question": "정산은 언제 되나요", "relevant_questions": ["정산 일정 확인"]}
+        {"question": "오늘 날씨 어때", "relevant_questions": []}
+
+    Parameters:
+        file_path (str): 질문 세트 파일 경로 (JSON Lines)
+
+    Returns:
+        list: 질문 딕셔너리(question, relevant_questions, relevant_ids) 리스트
+    """
+    labeled = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            labeled.append({
+                'question': item['question'],
+                'relevant_questions': set(item.get('relevant_questions') or []),
+                'relevant_ids': set(item.get('relevant_ids') or [])
+            })
+    if not labeled:
+        raise ValueError(f"질문 세트가 비어 있습니다: {file_path}")
+    return labeled
+
+def is_relevant(item, record):
+    """
+    검색된 문서가 질문의 관련 문서인지 확인합니다. 중복 제거로 합쳐진 질문도 확인합니다.
+    """
+    if record['id'] in item['relevant_ids']:
+        return True
+    metadata = record.get('metadata') or {}
+    questions = {metadata.get('question')} | set(merged_questions(metadata))
+    return bool(questions & item['relevant_questions'])
+
+def best_threshold(scores, labels):
+    """
+    관련 문서와 관련 없는 문서의 점수를 가장 잘 가르는 임계값을 찾습니다 (TPR - FPR 최대).
+
+    Parameters:
+        scores (list): 검색 결과 점수 리스트
+        labels (list): 각 결과가 관련 문서인지 여부
+
+    Returns:
+        dict: 임계값, TPR, FPR, 정밀도 또는 계산할 수 없으면 None
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    positives, negatives = labels.sum(), (~labels).sum()
+    if not positives or not negatives:
+        return None
+
+    # 점수 내림차순으로 정렬하여 각 점수를 임계값으로 쓸 때 남는 관련/무관 결과 수를 누적합으로 구합니다.
+    order = np.argsort(-scores, kind='stable')
+    scores, labels = scores[order], labels[order]
+    true_positives = np.cumsum(labels)
+    false_positives = np.cumsum(~labels)
+    # 같은 점수가 여러 개면 마지막 위치에서만 임계값을 평가합니다.
+    boundaries = np.flatnonzero(np.append(scores[1:] != scores[:-1], True))
+    tpr = true_positives[boundaries] / positives
+    fpr = false_positives[boundaries] / negatives
+    best = int(np.argmax(tpr - fpr))
+    position = boundaries[best]
+    return {
+        'threshold': round(float(scores[position]), 4),
+        'tpr': round(float(tpr[best]), 4),
+        'fpr': round(float(fpr[best]), 4),
+        'precision': round(float(true_positives[position] / (position + 1)), 4)
+    }
+
+def exact_neighbors(embeddings, query_embeddings, k):
+    """
+    전수 검색으로 질의별 정확한 상위 k개 문서 번호를 구합니다.
+    """
+    norms = np.einsum('ij,ij->i', embeddings, embeddings)
+    distances = norms[None, :] - 2 * (query_embeddings @ embeddings.T)
+    k = min(k, embeddings.shape[0])
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+def evaluate(store, records, labeled, query_embeddings, exact, ks):
+    """
+    컬렉션 하나에 대해 질문 세트를 실행하고 재현율, 지연, 임계값을 계산합니다.
+
+    Returns:
+        dict: 평가 결과
+    """
+    max_k = max(ks)
+    index_of = {record['id']: index for index, record in enumerate(records)}
+    latencies, scores, labels = [], [], []
+    hits = {k: 0 for k in ks}
+    ann_overlap = 0
+    in_domain = 0
+
+    for item, query_embedding, expected in zip(labeled, query_embeddings, exact):
+        started = time.perf_counter()
+        results = store.similarity_search(item['question'], max_k, threshold=0.0, query_embedding=query_embedding.tolist())
+        latencies.append(time.perf_counter() - started)
+
+        ann_overlap += len({index_of[result['id']] for result in results} & expected)
+        relevant = [is_relevant(item, result) for result in results]
+        scores.extend(result['score'] for result in results)
+        labels.extend(relevant)
+        if item['relevant_questions'] or item['relevant_ids']:
+            in_domain += 1
+            for k in ks:
+                hits[k] += any(relevant[:k])
+
+    return {
+        **{f'recall@{k}': round(hits[k] / in_domain, 4) if in_domain else None for k in ks},
+        f'ann_recall@{max_k}': round(ann_overlap / sum(len(expected) for expected in exact), 4),
+        'latency': _percentiles(latencies),
+        'threshold': best_threshold(scores, labels)
+    }
+
+def build_collection(client, name, records, embedding_model, hnsw_config, batch_size=1000):
+    """
+    HNSW 설정으로 임시 컬렉션을 만들고 저장된 임베딩을 그대로 넣습니다.
+
+    Returns:
+        tuple: (ChromaVectorStore, 생성 시간(초))
+    """
+    store = ChromaVectorStore(
+        OPENAI_API_KEY,
+        collection_name=name,
+        client=client,
+        embedding_backend=EMBEDDING_BACKEND,
+        embedder=embedding_model,
+        hnsw_config=hnsw_config
+    )
+    started = time.perf_counter()
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        store.collection.add(
+            ids=[record['id'] for record in batch],
+            embeddings=[record['embedding'] for record in batch],
+            documents=[record['text'] for record in batch],
+            metadatas=[record['metadata'] or None for record in batch]
+        )
+    return store, time.perf_counter() - started
+
+def recommend(results, recall_key, min_recall):
+    """
+    재현율 기준을 만족하는 설정 중 p95 지연이 가장 짧은 설정을 고릅니다.
+    """
+    passing = [result for result in results if (result[recall_key] or 0) >= min_recall]
+    if not passing:
+        return None
+    return min(passing, key=lambda result: result['latency']['p95_ms'])
+
+def _int_list(value):
+    return [int(item) for item in value.split(",")]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HNSW 설정과 거리 공간을 바꿔 가며 검색 재현율, 지연, 임계값을 측정합니다.")
+    parser.add_argument("questions", help="레이블이 붙은 질문 세트 (JSON Lines)")
+    parser.add_argument("--spaces", default="l2,cosine", help="쉼표로 구분한 거리 공간 목록 (l2, cosine, ip)")
+    parser.add_argument("--m", default="16", help="쉼표로 구분한 HNSW M 목록")
+    parser.add_argument("--construction-ef", default="100", help="쉼표로 구분한 HNSW construction_ef 목록")
+    parser.add_argument("--search-ef", default="10,50,100", help="쉼표로 구분한 HNSW search_ef 목록")
+    parser.add_argument("--k", default="1,3,5", help="쉼표로 구분한 재현율 계산 결과 수 목록")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="추천 설정이 만족해야 할 최대 k의 재현율")
+    parser.add_argument("--output", default="retrieval_tuning_report.json", help="JSON 보고서 경로")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    ks = _int_list(args.k)
+    recall_key = f'recall@{max(ks)}'
+
+    labeled = load_labeled_questions(args.questions)
+    source = create_vector_store(OPENAI_API_KEY)
+    records = source.load_records(include_embeddings=True)
+    if not records:
+        raise ValueError("Chroma DB에 저장된 임베딩 데이터가 없습니다. 먼저 embed_and_store.py를 실행하세요.")
+    embeddings = np.asarray([record['embedding'] for record in records], dtype=np.float32)
+    query_embeddings = np.asarray([source.embed_query(item['question']) for item in labeled], dtype=np.float32)
+    exact = exact_neighbors(embeddings, query_embeddings, max(ks))
+    print(f"문서 {len(records)}개, 질문 {len(labeled)}개 (주제 밖 질문 {sum(1 for item in labeled if not (item['relevant_questions'] or item['relevant_ids']))}개)")
+
+    client = chromadb.EphemeralClient()
+    grid = itertools.product(
+        args.spaces.split(","), _int_list(args.m), _int_list(args.construction_ef), _int_list(args.search_ef)
+    )
+    results = []
+    for number, (space, m, construction_ef, search_ef) in enumerate(grid):
+        hnsw_config = {'space': space, 'M': m, 'construction_ef': construction_ef, 'search_ef': search_ef}
+        name = f"tuning_{number}"
+        store, build_seconds = build_collection(client, name, records, source.embedding_model, hnsw_config)
+        try:
+            result = dict(hnsw_config, build_seconds=round(build_seconds, 2))
+            result.update(evaluate(store, records, labeled, query_embeddings, exact, ks))
+        finally:
+            client.delete_collection(name)
+        results.append(result)
+
+        threshold = result['threshold']
+        print(
+            f"[{space} M={m} construction_ef={construction_ef} search_ef={search_ef}] "
+            + ", ".join(f"recall@{k}: {result[f'recall@{k}']}" for k in ks)
+            + f", ann_recall@{max(ks)}: {result[f'ann_recall@{max(ks)}']}, p95: {result['latency']['p95_ms']} ms"
+            + (f", 임계값: {threshold['threshold']} (TPR {threshold['tpr']}, FPR {threshold['fpr']})" if threshold else "")
+        )
+
+    best = recommend(results, recall_key, args.min_recall)
+    if best:
+        print(
+            f"추천 설정: space={best['space']}, M={best['M']}, construction_ef={best['construction_ef']}, "
+            f"search_ef={best['search_ef']}, 임계값={best['threshold']['threshold'] if best['threshold'] else RETRIEVAL_THRESHOLD}"
+        )
+    else:
+        print(f"{recall_key} {args.min_recall} 이상을 만족하는 설정이 없습니다.")
+
+    report = {
+        'build': _git_revision(),
+        'config': {
+            'questions': len(labeled),
+            'documents': len(records),
+            'ks': ks,
+            'min_recall': args.min_recall,
+            'current_threshold': RETRIEVAL_THRESHOLD
+        },
+        'results': results,
+        'recommended': best
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"보고서를 저장했습니다: {args.output}")
+
+if __name__ == "__main__":
+    main()
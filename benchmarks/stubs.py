@@ -0,0 +1,263 @@
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+class LatencyDistribution:
+    def __init__(self, kind="lognormal", mean_ms=100.0, spread=0.5, seed=None):
+        """
+        대역(stand-in) 서버의 응답 지연 분포.
+
+        Parameters:
+            kind (str): 분포 종류 ("constant", "uniform", "exponential", "lognormal")
+            mean_ms (float): 평균 지연(밀리초)
+            spread (float): uniform은 평균 대비 폭 비율, lognormal은 로그 표준편차 (기본값: 0.5)
+            seed (int, optional): 난수 시드
+        """
+        if kind not in ("constant", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"지원하지 않는 지연 분포입니다: {kind}")
+        self.kind = kind
+        self.mean_ms = mean_ms
+        self.spread = spread
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        """
+        "종류:평균ms[:폭]" 형식의 문자열로 분포를 만듭니다. 예) "lognormal:800:0.4"
+
+        Parameters:
+            spec (str): 분포 명세
+            seed (int, optional): 난수 시드
+
+        Returns:
+            LatencyDistribution: 지연 분포
+        """
+        parts = spec.split(":")
+        kind = parts[0]
+        mean_ms = float(parts[1]) if len(parts) > 1 else 0.0
+        spread = float(parts[2]) if len(parts) > 2 else 0.5
+        return cls(kind, mean_ms, spread, seed)
+
+    def sample(self):
+        """
+        지연 시간 하나를 추출합니다.
+
+        Returns:
+            float: 지연 시간(초)
+        """
+        with self._lock:
+            if self.kind == "constant":
+                value = self.mean_ms
+            elif self.kind == "uniform":
+                value = self.random.uniform(self.mean_ms * (1 - self.spread), self.mean_ms * (1 + self.spread))
+            elif self.kind == "exponential":
+                value = self.random.expovariate(1 / self.mean_ms) if self.mean_ms > 0 else 0.0
+            else:
+                # 평균이 mean_ms가 되도록 로그 평균을 보정합니다.
+                mu = np.log(max(self.mean_ms, 1e-9)) - self.spread ** 2 / 2
+                value = self.random.lognormvariate(mu, self.spread)
+        return max(value, 0.0) / 1000
+
+    def to_dict(self):
+        return {'kind': self.kind, 'mean_ms': self.mean_ms, 'spread': self.spread}
+
+class StubLanguageModel:
+    def __init__(self, latency=None, error_rate=0.0, seed=None):
+        """
+        OpenAILanguageModel을 대신하는 대역 언어 모델.
+        챗봇 흐름이 사용자 입력을 기다리지 않도록 카테고리와 의도는 항상 하나만 응답합니다.
+
+        Parameters:
+            latency (LatencyDistribution, optional): 응답 지연 분포
+            error_rate (float): 오류를 발생시킬 확률 (기본값: 0.0)
+            seed (int, optional): 난수 시드
+        """
+        self.latency = latency or LatencyDistribution("constant", 0.0)
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def generate(self, messages):
+        """
+        메시지 목록에 대한 고정된 형태의 응답을 생성합니다.
+
+        Parameters:
+            messages (list): 대화 메시지 목록
+
+        Returns:
+            str: 생성된 응답 텍스트
+        """
+        time.sleep(self.latency.sample())
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise RuntimeError("대역 언어 모델 오류")
+
+        system_prompt = messages[0]['content']
+        question = messages[-1]['content']
+        if "identifies the relevant category" in system_prompt:
+            return "공통/기타 (Common/Others)"
+        if "generates multiple interpretations" in system_prompt:
+            # 질문 내용을 되돌려주면 "-"가 여러 개인 질문에서 체인이 선택지로 보고 input()을 기다리므로 고정된 한 줄로 응답합니다.
+            return "질문한 내용의 절차와 조건을 알고 싶어 합니다."
+        return f"'{question[:50]}'에 대한 대역 답변입니다."
+
+class StubEmbedding:
+    def __init__(self, dimension=256, latency=None, model="stub-embedding"):
+        """
+        OpenAIEmbedding을 대신하는 대역 임베딩 모델.
+        문자 바이그램을 해싱하여 비슷한 텍스트가 비슷한 벡터를 갖도록 합니다.
+
+        Parameters:
+            dimension (int): 임베딩 차원 (기본값: 256)
+            latency (LatencyDistribution, optional): 요청당 응답 지연 분포
+            model (str): 모델 이름
+        """
+        self.dimension = dimension
+        self.latency = latency or LatencyDistribution("constant", 0.0)
+        self.model = model
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        compact = text.replace(" ", "")
+        for i in range(max(len(compact) - 1, 1)):
+            vector[zlib.crc32(compact[i:i + 2].encode('utf-8')) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_embedding(self, text):
+        time.sleep(self.latency.sample())
+        return self._embed(text)
+
+    def get_embeddings(self, texts):
+        time.sleep(self.latency.sample())
+        return [self._embed(text) for text in texts]
+
+class StubVectorStore:
+    def __init__(self, documents, embedding_model):
+        """
+        메모리에서 전수 검색하는 대역 벡터 저장소. ChromaVectorStore와 같은 similarity_search 규약을 따릅니다.
+
+        Parameters:
+            documents (list): 문서 리스트
+            embedding_model: 임베딩 모델 객체 (get_embedding, get_embeddings 지원)
+        """
+        self.documents = list(documents)
+        self.embedding_model = embedding_model
+        self.embeddings = np.asarray(embedding_model.get_embeddings(self.documents), dtype=np.float32)
+        self.norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+
+    def load_documents(self):
+        return list(self.documents)
+
+    def embed_query(self, query):
+        return self.embedding_model.get_embedding(query)
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, include_embeddings=False):
+        if query_embedding is None or len(query_embedding) == 0:
+            query_embedding = self.embed_query(query)
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        distances = self.norms - 2 * (self.embeddings @ vector) + vector @ vector
+        top = np.argsort(distances)[:n_results]
+        results = []
+        for index in top:
+            score = 1 / (1 + max(float(distances[index]), 0.0))
+            if score >= threshold:
+                result = {'id': str(index), 'text': self.documents[index], 'score': score, 'metadata': {}}
+                if include_embeddings:
+                    result['embedding'] = self.embeddings[index].tolist()
+                results.append(result)
+        return results
+
+class StubOpenAIServer:
+    def __init__(self, language_model, embedding_model, host="127.0.0.1", port=0):
+        """
+        OpenAI 호환 API(/v1/chat/completions, /v1/embeddings)를 제공하는 로컬 대역 HTTP 서버.
+        OpenAILanguageModel, OpenAIEmbedding의 base_url을 이 서버로 지정하면 실제 클라이언트 경로를 그대로 측정할 수 있습니다.
+
+        Parameters:
+            language_model (StubLanguageModel): 응답을 생성할 대역 언어 모델
+            embedding_model (StubEmbedding): 임베딩을 생성할 대역 임베딩 모델
+            host (str): 바인딩 주소 (기본값: "127.0.0.1")
+            port (int): 포트, 0이면 임의의 빈 포트 (기본값: 0)
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                try:
+                    if self.path.endswith("/chat/completions"):
+                        self._send(200, server._chat_completion(request))
+                    elif self.path.endswith("/embeddings"):
+                        self._send(200, server._embeddings(request))
+                    else:
+                        self._send(404, {'error': {'message': "not found"}})
+                except Exception as e:
+                    self._send(500, {'error': {'message': str(e), 'type': "server_error"}})
+
+        self.language_model = language_model
+        self.embedding_model = embedding_model
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _chat_completion(self, request):
+        content = self.language_model.generate(request['messages'])
+        return {
+            'id': "chatcmpl-stub",
+            'object': "chat.completion",
+            'created': int(time.time()),
+            'model': request.get('model', "stub"),
+            'choices': [{'index': 0, 'message': {'role': "assistant", 'content': content}, 'finish_reason': "stop"}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
+
+    def _embeddings(self, request):
+        texts = request['input'] if isinstance(request['input'], list) else [request['input']]
+        embeddings = self.embedding_model.get_embeddings(texts)
+        return {
+            'object': "list",
+            'data': [{'object': "embedding", 'index': i, 'embedding': embedding} for i, embedding in enumerate(embeddings)],
+            'model': request.get('model', self.embedding_model.model),
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+        }
+
+    def start(self):
+        """
+        백그라운드 스레드에서 서버를 시작합니다.
+
+        Returns:
+            StubOpenAIServer: 자기 자신
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        서버를 종료합니다.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,39 @@
+from config.settings import (
+    OPENAI_API_KEY,
+    ANSWER_BANK_PATH,
+    ANSWER_BANK_THRESHOLD,
+    ANSWER_BANK_CONCURRENCY
+)
+from stores.factory import create_vector_store
+from embeddings.embedding import embedding_model_version
+from models.language_model import OpenAILanguageModel
+from caches.answer_bank import AnswerBank
+
+def build_answer_bank(max_workers=ANSWER_BANK_CONCURRENCY):
+    """
+    저장된 FAQ의 대표 질문에 대한 답변을 일괄 생성하여 저장합니다.
+
+    Parameters:
+        max_workers (int): 동시에 생성할 최대 답변 수
+    """
+    if not OPENAI_API_KEY:
+        raise ValueError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 'OPENAI_API_KEY'를 설정하세요.")
+
+    vector_store = create_vector_store(OPENAI_API_KEY)
+    language_model = OpenAILanguageModel(api_key=OPENAI_API_KEY)
+
+    answer_bank = AnswerBank(
+        threshold=ANSWER_BANK_THRESHOLD,
+        persist_path=ANSWER_BANK_PATH,
+        embedding_model=embedding_model_version(vector_store.embedding_model)
+    )
+    stats = answer_bank.build(vector_store, language_model, max_workers=max_workers)
+    answer_bank.save()
+
+    print(
+        f"사전 생성 답변 저장이 완료되었습니다. 생성: {stats['generated']}개, 재사용: {stats['reused']}개, "
+        f"실패: {stats['failed']}개, 제거: {stats['removed']}개"
+    )
+
+if __name__ == "__main__":
+    build_answer_bank()
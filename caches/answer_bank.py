@@ -0,0 +1,383 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+from caches.semantic_cache import normalize_embedding
+from prompts.prompt_templates import CATEGORY_IDENTIFICATION_PROMPT, DEFAULT_SYSTEM_PROMPT
+from utils.hashing import content_hash
+from utils.deduplicate import merged_questions, source_questions
+
+LLM_ERROR_MESSAGE = "알 수 없는 오류가 발생했습니다."
+
+def group_by_question(records):
+    """
+    저장된 청크를 원래 FAQ 질문별로 묶습니다. 중복 제거로 합쳐진 청크는 합쳐진 모든 질문에 포함됩니다.
+
+    Parameters:
+        records (list): 문서 딕셔너리(id, text, metadata) 리스트
+
+    Returns:
+        dict: 질문별 청크 딕셔너리 리스트
+    """
+    groups = {}
+    for record in records:
+        metadata = record.get('metadata') or {}
+        questions = [metadata.get('question')] + merged_questions(metadata)
+        for question in dict.fromkeys(questions):
+            if question:
+                groups.setdefault(question, []).append(record)
+    for chunks in groups.values():
+        chunks.sort(key=lambda chunk: chunk['id'])
+    return groups
+
+def question_sources(records):
+    """
+    저장된 청크 메타데이터에서 전처리된 대표 질문별 원래 질문 문장을 모읍니다.
+
+    Parameters:
+        records (list): 문서 딕셔너리(id, text, metadata) 리스트
+
+    Returns:
+        dict: 전처리된 질문을 키로 하는 원래 질문 딕셔너리
+    """
+    sources = {}
+    for record in records:
+        for question, source in source_questions(record.get('metadata')).items():
+            sources.setdefault(question, source)
+    return sources
+
+def generate_canonical_answer(language_model, question, chunks):
+    """
+    대표 FAQ 질문에 대한 답변을 생성합니다.
+
+    Parameters:
+        language_model: 언어 모델 객체
+        question (str): 대표 질문
+        chunks (list): 질문에 해당하는 청크 딕셔너리 리스트
+
+    Returns:
+        tuple: (카테고리, 답변), 답변할 수 없으면 (None, None)
+    """
+    context = "\n\n".join(chunk['text'] for chunk in chunks)
+
+    category = language_model.generate([
+        {"role": "system", "content": CATEGORY_IDENTIFICATION_PROMPT.format(context=context)},
+        {"role": "user", "content": question}
+    ]).strip()
+    if not category or category == LLM_ERROR_MESSAGE or "챗봇입니다" in category:
+        return None, None
+    # 여러 카테고리가 제시되면 첫 번째 카테고리를 사용합니다.
+    category = category.splitlines()[0].strip(" -•'")
+
+    answer = language_model.generate([
+        {"role": "system", "content": DEFAULT_SYSTEM_PROMPT.format(
+            context=context, category=category, intent=question, history=""
+        )},
+        {"role": "user", "content": question}
+    ]).strip()
+    if not answer or answer == LLM_ERROR_MESSAGE:
+        return None, None
+
+    return category, f"카테고리: {category}\n의도: {question}\n\n{answer}"
+
+class AnswerBank:
+    def __init__(self, threshold=0.92, persist_path=None, embedding_model=None):
+        """
+        대표 FAQ 질문에 대한 사전 생성 답변 저장소 초기화.
+
+        Parameters:
+            threshold (float): 대표 질문과 일치한다고 판단할 코사인 유사도 임계값 (기본값: 0.92)
+            persist_path (str, optional): 답변 저장소 파일 경로
+            embedding_model (str, optional): 대표 질문 임베딩을 만든 모델 버전, 저장된 답변과 다르면 불러오지 않음
+        """
+        self.threshold = threshold
+        self.persist_path = persist_path
+        self.embedding_model = embedding_model
+        self.entries = {}
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def _invalidate_matrix(self):
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _get_matrix(self):
+        if self._matrix is None and self.entries:
+            self._matrix_keys = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[key]['embedding'] for key in self._matrix_keys])
+        return self._matrix
+
+    def lookup(self, query_embedding):
+        """
+        질문과 일치하는 대표 질문의 답변을 찾습니다.
+
+        Parameters:
+            query_embedding (list): 질문 임베딩
+
+        Returns:
+            dict: 저장된 항목(question, answer, category, version, score) 또는 None
+        """
+        vector = normalize_embedding(query_embedding)
+        if vector is None:
+            return None
+
+        with self._lock:
+            matrix = self._get_matrix()
+            if matrix is None or matrix.shape[1] != vector.shape[0]:
+                return None
+
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                return None
+
+            entry = self.entries[self._matrix_keys[best]]
+            logging.info("대표 질문 일치. 유사도: %.4f, 대표 질문: %s", score, entry['question'])
+            return {
+                'question': entry['question'],
+                'answer': entry['answer'],
+                'category': entry['category'],
+                'version': entry['version'],
+                'score': score
+            }
+
+    def is_current(self, question, source_hash):
+        """
+        저장된 답변이 현재 원본 내용으로 생성되었는지 확인합니다.
+
+        Parameters:
+            question (str): 대표 질문
+            source_hash (str): 현재 원본 내용 해시
+
+        Returns:
+            bool: 최신 여부
+        """
+        entry = self.entries.get(question)
+        return entry is not None and entry['source_hash'] == source_hash
+
+    def put(self, question, embedding, answer, category, source_hash, documents):
+        """
+        대표 질문의 답변을 저장합니다. 기존 항목이 있으면 버전을 올립니다.
+
+        Parameters:
+            question (str): 대표 질문
+            embedding (list): 대표 질문 임베딩
+            answer (str): 생성된 답변
+            category (str): 식별된 카테고리
+            source_hash (str): 원본 내용 해시
+            documents (dict): 원본 문서 ID와 내용 해시
+
+        Returns:
+            bool: 저장 여부
+        """
+        vector = normalize_embedding(embedding)
+        if vector is None:
+            logging.warning("대표 질문의 임베딩이 유효하지 않아 저장하지 않습니다: %s", question)
+            return False
+
+        with self._lock:
+            previous = self.entries.get(question)
+            self.entries[question] = {
+                'question': question,
+                'embedding': vector,
+                'answer': answer,
+                'category': category,
+                'source_hash': source_hash,
+                'documents': dict(documents),
+                'version': previous['version'] + 1 if previous else 1
+            }
+            self._invalidate_matrix()
+        return True
+
+    def retain(self, questions):
+        """
+        주어진 대표 질문 외의 항목을 제거합니다.
+
+        Parameters:
+            questions (iterable): 유지할 대표 질문 목록
+
+        Returns:
+            int: 제거된 항목 수
+        """
+        questions = set(questions)
+        with self._lock:
+            stale = [question for question in self.entries if question not in questions]
+            for question in stale:
+                del self.entries[question]
+            if stale:
+                self._invalidate_matrix()
+        return len(stale)
+
+    def invalidate_changed(self, current_hashes):
+        """
+        재적재 후 원본 문서가 바뀌었거나 사라진 항목을 제거합니다.
+
+        Parameters:
+            current_hashes (dict): 문서 ID별 현재 내용 해시
+
+        Returns:
+            int: 제거된 항목 수
+        """
+        with self._lock:
+            stale = [
+                question for question, entry in self.entries.items()
+                if any(current_hashes.get(doc_id) != doc_hash for doc_id, doc_hash in entry['documents'].items())
+            ]
+            for question in stale:
+                del self.entries[question]
+            if stale:
+                self._invalidate_matrix()
+        if stale:
+            logging.info("원본이 변경된 사전 생성 답변 %d개를 제거했습니다.", len(stale))
+        return len(stale)
+
+    def export_entries(self):
+        """
+        항목을 임베딩 행렬과 나머지 필드로 분리하여 반환합니다.
+
+        Returns:
+            tuple: (임베딩을 제외한 항목 리스트, 임베딩 행렬 또는 None)
+        """
+        with self._lock:
+            entries = list(self.entries.values())
+        if not entries:
+            return [], None
+        embeddings = np.stack([entry['embedding'] for entry in entries])
+        return [{key: value for key, value in entry.items() if key != 'embedding'} for entry in entries], embeddings
+
+    def import_entries(self, entries, embeddings):
+        """
+        export_entries로 분리된 항목을 다시 불러옵니다. 임베딩 행렬이 메모리 맵이면 복사하지 않고 참조하며,
+        항목이 바뀔 때까지 검색에도 그 행렬을 그대로 사용하여 여러 작업자 프로세스가 같은 페이지를 공유합니다.
+
+        Parameters:
+            entries (list): 임베딩을 제외한 항목 리스트
+            embeddings (numpy.ndarray): 항목별 임베딩 행렬
+        """
+        with self._lock:
+            self.entries.clear()
+            for entry, embedding in zip(entries, embeddings):
+                entry = dict(entry, embedding=embedding)
+                self.entries[entry['question']] = entry
+            self._invalidate_matrix()
+            if self.entries and len(self.entries) == len(embeddings):
+                self._matrix = embeddings
+                self._matrix_keys = list(self.entries.keys())
+
+    def load(self):
+        """
+        저장된 답변을 불러옵니다.
+        """
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.error("답변 저장소 파일을 불러오지 못했습니다: %s", e)
+            return
+
+        saved_model = data.get('embedding_model')
+        if self.embedding_model and saved_model and saved_model != self.embedding_model:
+            logging.warning("임베딩 모델이 바뀌어 저장된 답변을 사용하지 않습니다: %s -> %s", saved_model, self.embedding_model)
+            return
+
+        with self._lock:
+            self.entries = {}
+            for item in data.get('entries', []):
+                item['embedding'] = np.asarray(item['embedding'], dtype=np.float32)
+                self.entries[item['question']] = item
+            self._invalidate_matrix()
+        logging.info("사전 생성 답변 %d개를 불러왔습니다.", len(self.entries))
+
+    def save(self):
+        """
+        답변을 파일에 저장합니다. 임시 파일에 쓴 뒤 교체합니다.
+        """
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            entries = [dict(entry, embedding=entry['embedding'].tolist()) for entry in self.entries.values()]
+
+        # 여러 작업자가 같은 경로에 저장해도 서로의 임시 파일을 덮어쓰지 않도록 고유한 임시 파일을 사용합니다.
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.persist_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                json.dump({'embedding_model': self.embedding_model, 'entries': entries}, file, ensure_ascii=False)
+            os.replace(temp_path, self.persist_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        logging.info("사전 생성 답변 %d개를 저장했습니다.", len(entries))
+
+    def build(self, vector_store, language_model, max_workers=4):
+        """
+        저장된 FAQ의 모든 대표 질문에 대한 답변을 생성합니다.
+        원본 내용 해시가 바뀌지 않은 질문은 다시 생성하지 않습니다.
+
+        Parameters:
+            vector_store: 벡터 저장소 객체
+            language_model: 언어 모델 객체
+            max_workers (int): 동시에 생성할 최대 답변 수 (기본값: 4)
+
+        Returns:
+            dict: 생성, 재사용, 실패, 제거된 항목 수
+        """
+        records = vector_store.load_records()
+        groups = group_by_question(records)
+        # 사용자 질문은 형태소 분석 없이 그대로 임베딩되므로, 대표 질문도 전처리 전의 원래 문장으로 임베딩해야
+        # 같은 질문의 유사도가 임계값을 넘습니다. 원래 문장이 없는 항목은 저장된 질문을 사용합니다.
+        sources = question_sources(records)
+        removed = self.retain(groups.keys())
+
+        pending = {}
+        for question, chunks in groups.items():
+            source = sources.get(question, question)
+            source_hash = content_hash(source + "\n" + "\n".join(chunk['text'] for chunk in chunks))
+            if not self.is_current(question, source_hash):
+                pending[question] = (chunks, source, source_hash)
+
+        def generate(question, chunks, source, source_hash):
+            category, answer = generate_canonical_answer(language_model, question, chunks)
+            if answer is None:
+                return False
+            embedding = vector_store.embed_query(source)
+            documents = {chunk['id']: content_hash(chunk['text']) for chunk in chunks}
+            return self.put(question, embedding, answer, category, source_hash, documents)
+
+        generated, failed = 0, 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(generate, question, chunks, source, source_hash)
+                for question, (chunks, source, source_hash) in pending.items()
+            ]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="답변 생성 중"):
+                try:
+                    succeeded = future.result()
+                except Exception as e:
+                    logging.error("답변 생성 중 오류 발생: %s", e)
+                    succeeded = False
+                if succeeded:
+                    generated += 1
+                else:
+                    failed += 1
+
+        return {
+            'generated': generated,
+            'reused': len(groups) - len(pending),
+            'failed': failed,
+            'removed': removed
+        }
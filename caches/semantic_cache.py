@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+def normalize_embedding(embedding):
+    """
+    임베딩을 단위 벡터로 정규화합니다.
+
+    Parameters:
+        embedding (list): 임베딩 벡터
+
+    Returns:
+        numpy.ndarray: 정규화된 벡터, 유효하지 않으면 None
+    """
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    if vector.ndim != 1 or vector.size == 0:
+        return None
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return vector / norm
+
+class SemanticCache:
+    def __init__(self, threshold=0.95, max_entries=1000, ttl_seconds=86400, persist_path=None, embedding_model=None):
+        """
+        시맨틱 응답 캐시 초기화.
+
+        질문 임베딩과 코사인 유사도가 임계값 이상인 이전 질문이 있으면
+        검색과 LLM 호출 없이 저장된 답변을 반환합니다.
+
+        Parameters:
+            threshold (float): 캐시 적중으로 판단할 코사인 유사도 임계값 (기본값: 0.95)
+            max_entries (int): 최대 저장 항목 수, 초과 시 가장 오래 사용되지 않은 항목을 제거 (기본값: 1000)
+            ttl_seconds (int): 항목 유효 시간(초), None이면 만료되지 않음 (기본값: 86400)
+            persist_path (str, optional): 캐시를 저장할 파일 경로
+            embedding_model (str, optional): 질문 임베딩을 만든 모델 버전, 저장된 캐시와 다르면 불러오지 않음
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.embedding_model = embedding_model
+        self.entries = OrderedDict()
+        self._next_id = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._shared_matrix = False
+        self._excluded_rows = []
+        self._lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def _is_expired(self, entry, now):
+        return self.ttl_seconds is not None and now - entry['created_at'] > self.ttl_seconds
+
+    def _invalidate_matrix(self):
+        self._matrix = None
+        self._matrix_keys = []
+        self._shared_matrix = False
+        self._excluded_rows = []
+
+    def _remove(self, keys):
+        for key in keys:
+            self.entries.pop(key, None)
+        if not keys:
+            return
+        if self._shared_matrix:
+            # 스냅샷에서 불러온 공유 행렬은 복사하지 않고 지운 항목의 행만 검색에서 제외합니다.
+            removed = set(keys)
+            self._excluded_rows.extend(row for row, key in enumerate(self._matrix_keys) if key in removed)
+        else:
+            self._invalidate_matrix()
+
+    def _get_matrix(self):
+        """
+        저장된 임베딩 행렬을 반환합니다. 항목이 바뀐 경우에만 다시 만듭니다.
+        스냅샷에서 불러온 메모리 맵 행렬은 항목이 추가되기 전까지 그대로 사용합니다.
+        """
+        if self._matrix is None and self.entries:
+            self._matrix_keys = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[key]['embedding'] for key in self._matrix_keys])
+        return self._matrix
+
+    def lookup(self, query_embedding):
+        """
+        유사한 질문에 대한 캐시된 답변을 찾습니다.
+
+        Parameters:
+            query_embedding (list): 질문 임베딩
+
+        Returns:
+            dict: 캐시 항목(answer, category, intent, document_ids, score) 또는 None
+        """
+        vector = normalize_embedding(query_embedding)
+        if vector is None:
+            return None
+
+        with self._lock:
+            now = time.time()
+            self._remove([key for key, entry in self.entries.items() if self._is_expired(entry, now)])
+
+            matrix = self._get_matrix()
+            if matrix is None or matrix.shape[1] != vector.shape[0]:
+                return None
+
+            scores = matrix @ vector
+            if self._excluded_rows:
+                scores[self._excluded_rows] = -np.inf
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                logging.debug("캐시 미적중. 최고 유사도: %.4f", score)
+                return None
+
+            key = self._matrix_keys[best]
+            self.entries.move_to_end(key)
+            entry = self.entries[key]
+            logging.info("캐시 적중. 유사도: %.4f, 원래 질문: %s", score, entry['query'])
+            return {
+                'answer': entry['answer'],
+                'category': entry['category'],
+                'intent': entry['intent'],
+                'document_ids': list(entry['documents'].keys()),
+                'score': score
+            }
+
+    def add(self, query, query_embedding, answer, category, intent, documents=None):
+        """
+        답변을 캐시에 추가합니다.
+
+        Parameters:
+            query (str): 사용자 질문
+            query_embedding (list): 질문 임베딩
+            answer (str): 생성된 답변
+            category (str): 식별된 카테고리
+            intent (str): 식별된 의도
+            documents (dict, optional): 답변에 사용된 문서 ID와 내용 해시
+        """
+        vector = normalize_embedding(query_embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            self.entries[self._next_id] = {
+                'query': query,
+                'embedding': vector,
+                'answer': answer,
+                'category': category,
+                'intent': intent,
+                'documents': dict(documents or {}),
+                'created_at': time.time()
+            }
+            self._next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._invalidate_matrix()
+
+    def invalidate_documents(self, document_ids):
+        """
+        주어진 문서를 참조하는 캐시 항목을 제거합니다.
+
+        Parameters:
+            document_ids (iterable): 변경된 문서 ID 목록
+
+        Returns:
+            int: 제거된 항목 수
+        """
+        document_ids = set(document_ids)
+        with self._lock:
+            stale = [key for key, entry in self.entries.items() if document_ids & entry['documents'].keys()]
+            self._remove(stale)
+        return len(stale)
+
+    def invalidate_changed(self, current_hashes):
+        """
+        재적재 후 내용이 바뀌었거나 사라진 문서를 참조하는 캐시 항목을 제거합니다.
+
+        Parameters:
+            current_hashes (dict): 문서 ID별 현재 내용 해시
+
+        Returns:
+            int: 제거된 항목 수
+        """
+        with self._lock:
+            stale = [
+                key for key, entry in self.entries.items()
+                if any(current_hashes.get(doc_id) != doc_hash for doc_id, doc_hash in entry['documents'].items())
+            ]
+            self._remove(stale)
+        if stale:
+            logging.info("변경된 문서를 참조하는 캐시 항목 %d개를 제거했습니다.", len(stale))
+        return len(stale)
+
+    def clear(self):
+        """
+        모든 캐시 항목을 제거합니다.
+        """
+        with self._lock:
+            self.entries.clear()
+            self._invalidate_matrix()
+
+    def export_entries(self):
+        """
+        항목을 임베딩 행렬과 나머지 필드로 분리하여 반환합니다.
+
+        Returns:
+            tuple: (임베딩을 제외한 항목 리스트, 임베딩 행렬 또는 None)
+        """
+        with self._lock:
+            entries = list(self.entries.values())
+        if not entries:
+            return [], None
+        embeddings = np.stack([entry['embedding'] for entry in entries])
+        return [{key: value for key, value in entry.items() if key != 'embedding'} for entry in entries], embeddings
+
+    def import_entries(self, entries, embeddings):
+        """
+        export_entries로 분리된 항목을 다시 불러옵니다. 임베딩 행렬이 메모리 맵이면 복사하지 않고 참조하며,
+        항목이 추가될 때까지 검색에도 그 행렬을 그대로 사용하여 여러 작업자 프로세스가 같은 페이지를 공유합니다.
+
+        Parameters:
+            entries (list): 임베딩을 제외한 항목 리스트
+            embeddings (numpy.ndarray): 항목별 임베딩 행렬
+        """
+        with self._lock:
+            self.entries.clear()
+            for entry, embedding in zip(entries, embeddings):
+                entry = dict(entry, embedding=embedding)
+                self.entries[self._next_id] = entry
+                self._next_id += 1
+            self._invalidate_matrix()
+            if self.entries:
+                self._matrix = embeddings
+                self._matrix_keys = list(self.entries.keys())
+                self._shared_matrix = True
+
+    def load(self):
+        """
+        저장된 캐시를 불러옵니다. 만료된 항목은 건너뜁니다.
+        """
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.error("캐시 파일을 불러오지 못했습니다: %s", e)
+            return
+
+        saved_model = data.get('embedding_model')
+        if self.embedding_model and saved_model and saved_model != self.embedding_model:
+            logging.warning("임베딩 모델이 바뀌어 저장된 캐시를 사용하지 않습니다: %s -> %s", saved_model, self.embedding_model)
+            return
+
+        now = time.time()
+        with self._lock:
+            self.entries.clear()
+            for item in data.get('entries', []):
+                item['embedding'] = np.asarray(item['embedding'], dtype=np.float32)
+                if not self._is_expired(item, now):
+                    self.entries[self._next_id] = item
+                    self._next_id += 1
+            self._invalidate_matrix()
+        logging.info("캐시 항목 %d개를 불러왔습니다.", len(self.entries))
+
+    def save(self):
+        """
+        캐시를 파일에 저장합니다. 임시 파일에 쓴 뒤 교체하여 저장 중 중단되어도 기존 파일이 손상되지 않습니다.
+        """
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            entries = [dict(entry, embedding=entry['embedding'].tolist()) for entry in self.entries.values()]
+
+        # 여러 작업자가 같은 경로에 저장해도 서로의 임시 파일을 덮어쓰지 않도록 고유한 임시 파일을 사용합니다.
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.persist_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                json.dump({'embedding_model': self.embedding_model, 'entries': entries}, file, ensure_ascii=False)
+            os.replace(temp_path, self.persist_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        logging.info("캐시 항목 %d개를 저장했습니다.", len(entries))
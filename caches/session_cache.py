@@ -0,0 +1,143 @@
+import logging
+import re
+
+import numpy as np
+
+# 앞 질문을 이어받는 질문의 시작 표현 (접속어, 지시어)
+FOLLOW_UP_PREFIXES = (
+    "그럼", "그러면", "그렇다면", "그리고", "그런데", "근데", "그래서", "그거", "그건", "그게", "그걸",
+    "이거", "이건", "이게", "저거", "거기", "그때", "그 다음", "그다음", "또", "추가로", "아까", "방금"
+)
+# "기한은요?", "취소하면요?"처럼 주어나 주제를 생략한 짧은 질문의 끝 표현
+_ELLIPTICAL_ENDING = re.compile(r"(은요|는요|이요|면요|고요|도요)\s*\??$")
+
+def is_follow_up(query, max_elliptical_words=2):
+    """
+    질문이 앞 질문을 이어받는 후속 질문인지 확인합니다. 접속어나 지시어로 시작하거나,
+    어절 수가 적고 "~은요?"처럼 주제를 생략한 질문을 후속 질문으로 봅니다.
+
+    Parameters:
+        query (str): 사용자 질문
+        max_elliptical_words (int): 주제를 생략한 질문으로 볼 최대 어절 수 (기본값: 2)
+
+    Returns:
+        bool: 후속 질문 여부
+    """
+    query = (query or "").strip()
+    if query.startswith(FOLLOW_UP_PREFIXES):
+        return True
+    return len(query.split()) <= max_elliptical_words and bool(_ELLIPTICAL_ENDING.search(query))
+
+class SessionCandidateCache:
+    def __init__(self, overfetch=4, fallback_threshold=0.8, category_threshold=0.85):
+        """
+        대화 세션의 후보 문서 캐시 초기화.
+
+        전체 검색 때 필요한 문서 수의 overfetch배를 임베딩과 함께 가져와 보관하고, 바로 다음 질문이
+        후속 질문("그럼 기한은요?" 등)이면 보관한 후보만 새 질문 임베딩으로 다시 정렬합니다.
+        후속 질문이 아니면 항상 전체 검색으로 후보를 새로 채우고, 후속 질문이라도 후보 중 최고 점수가
+        fallback_threshold보다 낮으면 주제가 바뀐 것으로 보고 전체 검색을 사용합니다.
+
+        점수는 저장소와 같이 1/(1+제곱 L2 거리)로 계산합니다. 임베딩이 단위 벡터이면 cosine, ip 공간의
+        저장소 점수와도 같으며, 기본값 0.8은 코사인 유사도 0.875에 해당합니다. 같은 도메인의 질문은
+        대부분 코사인 0.5를 넘으므로 임계값을 낮추면 다른 주제의 질문이 이전 후보로 답변될 수 있습니다.
+
+        Parameters:
+            overfetch (int): 전체 검색 때 가져올 후보 수 배율 (기본값: 4)
+            fallback_threshold (float): 후보 재정렬 결과를 사용할 최소 최고 점수 (기본값: 0.8)
+            category_threshold (float): 이전 질문의 카테고리를 그대로 쓸 최소 최고 점수 (기본값: 0.85)
+        """
+        self.overfetch = max(1, overfetch)
+        self.fallback_threshold = fallback_threshold
+        self.category_threshold = category_threshold
+        self.hits = 0
+        self.misses = 0
+        self.category_reuses = 0
+        self.clear()
+
+    def clear(self):
+        """
+        보관한 후보와 카테고리를 비웁니다. 새 대화를 시작하거나 검색 없이 끝난 질문 뒤에 호출합니다.
+        """
+        self.candidates = []
+        self.embeddings = None
+        self.previous_ids = set()
+        self.category = None
+
+    def update(self, results, k):
+        """
+        전체 검색 결과를 새 후보로 보관하고 상위 k개를 반환합니다.
+
+        Parameters:
+            results (list): 임베딩('embedding')을 포함한 검색 결과 딕셔너리 리스트
+            k (int): 반환할 결과 수
+
+        Returns:
+            list: 임베딩을 제외한 상위 k개 검색 결과
+        """
+        results = sorted(results or [], key=lambda result: result['score'], reverse=True)
+        candidates, embeddings = [], []
+        for result in results:
+            candidates.append({key: value for key, value in result.items() if key != 'embedding'})
+            if result.get('embedding') is not None:
+                embeddings.append(result['embedding'])
+
+        if candidates and len(embeddings) == len(candidates):
+            self.candidates = candidates
+            self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        else:
+            # 임베딩을 돌려주지 않는 저장소에서는 후보를 보관하지 않고 매번 전체 검색합니다.
+            self.candidates, self.embeddings = [], None
+        self.category = None
+        top = candidates[:k]
+        self.previous_ids = {result['id'] for result in top}
+        return top
+
+    def rerank(self, query, query_embedding, k, threshold):
+        """
+        후속 질문이면 보관한 후보를 새 질문 임베딩으로 다시 정렬합니다.
+
+        Parameters:
+            query (str): 사용자 질문
+            query_embedding (list): 질문 임베딩
+            k (int): 반환할 결과 수
+            threshold (float): 결과에 포함할 최소 유사도 점수
+
+        Returns:
+            tuple: (검색 결과 리스트, 이어서 쓸 카테고리 또는 None), 전체 검색이 필요하면 None
+        """
+        if self.embeddings is None or query_embedding is None or not len(query_embedding):
+            return None
+        if not is_follow_up(query):
+            return None
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        if vector.shape[0] != self.embeddings.shape[1]:
+            return None
+
+        difference = self.embeddings - vector
+        scores = 1 / (1 + np.maximum(np.einsum('ij,ij->i', difference, difference), 0.0))
+        order = np.argsort(-scores)[:k]
+        best = float(scores[order[0]])
+        if best < self.fallback_threshold:
+            self.misses += 1
+            logging.info("이전 후보의 최고 점수 %.4f가 기준보다 낮아 전체 검색을 사용합니다.", best)
+            return None
+
+        results = [dict(self.candidates[index], score=float(scores[index])) for index in order if scores[index] >= threshold]
+        # 가장 가까운 후보가 이전 질문의 상위 결과였고 점수도 충분히 높으면 같은 주제로 보고 카테고리를 이어서 씁니다.
+        category = None
+        if self.category and best >= self.category_threshold and self.candidates[order[0]]['id'] in self.previous_ids:
+            category = self.category
+            self.category_reuses += 1
+        self.previous_ids = {result['id'] for result in results}
+        self.hits += 1
+        return results, category
+
+    def remember_category(self, category):
+        """
+        이번 질문에서 정한 카테고리를 다음 질문을 위해 보관합니다.
+
+        Parameters:
+            category (str): 카테고리
+        """
+        self.category = category
@@ -0,0 +1,222 @@
+import logging
+import math
+import os
+import pickle
+import re
+from collections import Counter
+
+import numpy as np
+
+from constants import OUT_OF_DOMAIN_MESSAGE
+
+CLASSIFIER_FORMAT_VERSION = 1
+
+def is_out_of_domain_response(text):
+    """
+    LLM 응답이 주제 밖 질문에 대한 안내 문구인지 확인합니다. 띄어쓰기나 따옴표가 달라도 같은 문구로 봅니다.
+
+    Parameters:
+        text (str): LLM 응답
+
+    Returns:
+        bool: 안내 문구 여부
+    """
+    compact = re.sub(r"\s+", "", text or "").strip("'\"")
+    return compact == re.sub(r"\s+", "", OUT_OF_DOMAIN_MESSAGE)
+
+def char_bigrams(text):
+    """
+    어절별 글자 2-gram 집합을 만듭니다. 형태소 분석 없이 한국어 어휘를 비교하기 위해 사용하며,
+    어절 경계를 넘는 2-gram은 만들지 않습니다.
+
+    Parameters:
+        text (str): 입력 텍스트
+
+    Returns:
+        set: 글자 2-gram 집합 (한 글자 어절은 그 글자)
+    """
+    bigrams = set()
+    for word in re.sub(r"[^\w\s]+|_", "", text.lower()).split():
+        if len(word) < 2:
+            bigrams.add(word)
+        else:
+            bigrams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return bigrams
+
+def train_domain_classifier(embeddings, labels, embedding_model=None, C=1.0):
+    """
+    질문 임베딩으로 FAQ 주제 여부를 판별하는 로지스틱 회귀 분류기를 학습합니다.
+
+    Parameters:
+        embeddings (numpy.ndarray): (질문 수, 차원) 질문 임베딩
+        labels (list): 각 질문이 FAQ 주제인지 여부
+        embedding_model (str, optional): 임베딩을 만든 모델 버전
+        C (float): 규제 강도의 역수 (기본값: 1.0)
+
+    Returns:
+        dict: 분류기와 모델 버전
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    classifier = LogisticRegression(C=C, class_weight='balanced', max_iter=1000)
+    classifier.fit(np.asarray(embeddings, dtype=np.float32), np.asarray(labels, dtype=bool))
+    return {'format_version': CLASSIFIER_FORMAT_VERSION, 'embedding_model': embedding_model, 'classifier': classifier}
+
+def save_domain_classifier(model, path):
+    """
+    학습된 분류기를 파일에 저장합니다. 임시 파일에 쓴 뒤 교체합니다.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    logging.info("주제 판별 분류기를 저장했습니다: %s", path)
+
+def load_domain_classifier(path, embedding_model=None):
+    """
+    저장된 분류기를 불러옵니다. 파일이 없거나 다른 임베딩 모델로 학습된 분류기면 None을 반환합니다.
+
+    Parameters:
+        path (str): 분류기 파일 경로
+        embedding_model (str, optional): 현재 임베딩 모델 버전
+
+    Returns:
+        dict: 분류기와 모델 버전 또는 None
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as file:
+            model = pickle.load(file)
+    except Exception as e:
+        logging.error("주제 판별 분류기를 불러오는 중 오류 발생: %s", e)
+        return None
+    if model.get('format_version') != CLASSIFIER_FORMAT_VERSION:
+        logging.warning("지원하지 않는 주제 판별 분류기 형식입니다: %s", model.get('format_version'))
+        return None
+    saved_model = model.get('embedding_model')
+    if embedding_model and saved_model and saved_model != embedding_model:
+        logging.warning("임베딩 모델이 바뀌어 주제 판별 분류기를 사용하지 않습니다: %s -> %s", saved_model, embedding_model)
+        return None
+    return model
+
+class DomainGate:
+    def __init__(self, document_frequencies, document_count, score_threshold=0.45, lexical_threshold=0.3,
+                 classifier=None, classifier_threshold=0.5):
+        """
+        LLM 호출 전에 FAQ 주제 밖 질문을 걸러내는 판별기 초기화.
+
+        세 가지 신호를 사용합니다.
+        - 검색 점수: 검색된 문서의 최고 유사도 점수 (검색 결과가 없으면 0)
+        - 어휘 겹침: 질문의 글자 2-gram 중 FAQ 문서에 나오는 비율 (IDF 가중치, 드문 2-gram일수록 크게 반영)
+        - 분류기(선택): 질문 임베딩으로 학습한 로지스틱 회귀의 FAQ 주제 확률
+
+        잘못 거절하는 것이 LLM 호출 한 번보다 비싸므로 모든 신호가 주제 밖을 가리킬 때만 거절합니다.
+
+        Parameters:
+            document_frequencies (dict): 2-gram별 문서 빈도
+            document_count (int): 문서 수
+            score_threshold (float): 이보다 낮은 최고 검색 점수를 주제 밖 신호로 봄 (기본값: 0.45)
+            lexical_threshold (float): 이보다 낮은 어휘 겹침을 주제 밖 신호로 봄 (기본값: 0.3)
+            classifier (dict, optional): load_domain_classifier로 불러온 분류기
+            classifier_threshold (float): 이보다 낮은 주제 확률을 주제 밖 신호로 봄 (기본값: 0.5)
+        """
+        self.document_frequencies = document_frequencies
+        self.document_count = document_count
+        self.score_threshold = score_threshold
+        self.lexical_threshold = lexical_threshold
+        self.classifier = classifier
+        self.classifier_threshold = classifier_threshold
+        self._unseen_idf = math.log(document_count + 1) + 1
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        """
+        저장된 FAQ 문서로 어휘(2-gram 문서 빈도)를 만들어 판별기를 생성합니다.
+
+        Parameters:
+            documents (list): FAQ 문서 리스트
+            **kwargs: DomainGate 초기화 인자
+
+        Returns:
+            DomainGate: 판별기
+        """
+        frequencies = Counter()
+        for document in documents:
+            # 저장된 문서는 형태소 단위로 띄어 써 있으므로 공백을 지워 "등록은"처럼 조사가 붙은 2-gram도 어휘에 넣습니다.
+            frequencies.update(char_bigrams(re.sub(r"\s+", "", document)))
+        return cls(dict(frequencies), len(documents), **kwargs)
+
+    @property
+    def needs_embedding(self):
+        return self.classifier is not None
+
+    def lexical_overlap(self, query):
+        """
+        질문의 글자 2-gram 중 FAQ 문서에 나오는 것의 IDF 가중 비율을 계산합니다.
+        "니다", "있는" 같은 흔한 2-gram은 가중치가 작아 주제 판단에 거의 영향을 주지 않습니다.
+
+        Parameters:
+            query (str): 사용자 질문
+
+        Returns:
+            float: 0~1 사이의 어휘 겹침 (2-gram이 없으면 0)
+        """
+        total = seen = 0.0
+        for bigram in char_bigrams(query):
+            frequency = self.document_frequencies.get(bigram, 0)
+            if frequency:
+                weight = math.log((self.document_count + 1) / (frequency + 1)) + 1
+                seen += weight
+            else:
+                weight = self._unseen_idf
+            total += weight
+        return seen / total if total else 0.0
+
+    def domain_probability(self, query_embedding):
+        """
+        분류기로 질문이 FAQ 주제일 확률을 계산합니다. 분류기나 임베딩이 없으면 None을 반환합니다.
+        """
+        if self.classifier is None or query_embedding is None or not len(query_embedding):
+            return None
+        vector = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return float(self.classifier['classifier'].predict_proba(vector)[0, 1])
+
+    def check(self, query, results, query_embedding=None):
+        """
+        질문이 FAQ 주제인지 판별합니다.
+
+        Parameters:
+            query (str): 사용자 질문
+            results (list): 검색 결과 딕셔너리(id, text, score, metadata) 리스트
+            query_embedding (list, optional): 질문 임베딩 (분류기 사용 시 필요)
+
+        Returns:
+            dict: 판별 결과(in_domain, top_score, lexical, probability)
+        """
+        top_score = max((result['score'] for result in results or []), default=0.0)
+        lexical = self.lexical_overlap(query)
+        probability = self.domain_probability(query_embedding)
+        return {
+            'in_domain': self.decide(top_score, lexical, probability),
+            'top_score': top_score,
+            'lexical': lexical,
+            'probability': probability
+        }
+
+    def decide(self, top_score, lexical, probability=None):
+        """
+        신호 값으로 FAQ 주제 여부를 정합니다. 모든 신호가 임계값보다 낮을 때만 주제 밖으로 판단합니다.
+
+        Parameters:
+            top_score (float): 최고 검색 점수
+            lexical (float): 어휘 겹침
+            probability (float, optional): 분류기의 FAQ 주제 확률
+
+        Returns:
+            bool: FAQ 주제 여부
+        """
+        off_topic = top_score < self.score_threshold and lexical < self.lexical_threshold
+        if probability is not None:
+            off_topic = off_topic and probability < self.classifier_threshold
+        return not off_topic
@@ -3,23 +3,18 @@ from prompts.prompt_templates import (
     CATEGORY_IDENTIFICATION_PROMPT,
     INTENT_UNDERSTANDING_PROMPT
 )
+from prompts.prompt_assembler import CompiledPrompt
 from models.language_model import OpenAILanguageModel
-from config.settings import OPENAI_API_KEY
-import tiktoken
+from config.settings import OPENAI_API_KEY, PROMPT_TOKEN_BUDGET
+from constants import OUT_OF_DOMAIN_MESSAGE
+from chains.domain_gate import is_out_of_domain_response
+from utils.hashing import content_hash
+from utils.tokenizer import cached_count_tokens
+from contextlib import contextmanager, nullcontext
+import logging
+import time
 
-def count_tokens(text, encoding_name='cl100k_base'):
-    """
-    텍스트의 토큰 수를 계산합니다.
-
-    Parameters:
-        text (str): 입력 텍스트
-        encoding_name (str): 사용될 인코딩 이름 (기본값: 'cl100k_base')
-
-    Returns:
-        int: 토큰 수
-    """
-    encoding = tiktoken.get_encoding(encoding_name)
-    return len(encoding.encode(text))
+NO_DOCUMENTS_TEXT = "해당 카테고리에 대한 추가 정보는 제공되지 않습니다."
 
 def truncate_history(history, max_tokens=2048, encoding_name='cl100k_base'):
     """
@@ -33,36 +28,96 @@ def truncate_history(history, max_tokens=2048, encoding_name='cl100k_base'):
     Returns:
         str: 자른 대화 이력
     """
-    current_tokens = count_tokens(history, encoding_name)
-
-    if current_tokens > max_tokens:
-        messages = history.split("\n")
-        truncated_history = ""
+    # 줄별 토큰 수를 보관해 두므로 매번 전체 이력을 다시 인코딩하지 않고 이번에 추가된 줄만 계산합니다.
+    messages = history.split("\n")
+    line_tokens = [cached_count_tokens(message + "\n", encoding_name) for message in messages]
+    if sum(line_tokens) <= max_tokens:
+        return history
+
+    kept, current_tokens = [], 0
+    for message, tokens in zip(reversed(messages), reversed(line_tokens)):
+        current_tokens += tokens
+        if current_tokens > max_tokens:
+            break
+        kept.append(message)
+    return "\n".join(reversed(kept)).strip()
+
+def join_documents(documents):
+    """
+    검색 문서를 검색 순서대로 중복 없이 이어 붙입니다.
 
-        for message in reversed(messages):
-            truncated_history = message + "\n" + truncated_history
-            current_tokens = count_tokens(truncated_history, encoding_name)
-            if current_tokens > max_tokens:
-                break
-        return truncated_history.strip()
+    Parameters:
+        documents (list): 검색된 문서 리스트
 
-    return history
+    Returns:
+        str: 프롬프트에 넣을 문서 텍스트
+    """
+    return "\n\n".join(dict.fromkeys(documents)) if documents else NO_DOCUMENTS_TEXT
 
 class RetrievalQAChain:
-    def __init__(self, retriever, language_model=None):
+    def __init__(self, retriever, language_model=None, response_cache=None, answer_bank=None, profiler=None, domain_gate=None,
+                 session_cache=None, prompt_token_budget=PROMPT_TOKEN_BUDGET):
         """
         RetrievalQAChain 초기화 메서드.
 
         Parameters:
             retriever: 문서 검색을 위한 검색기 객체
             language_model: 언어 모델 객체 (기본값: OpenAILanguageModel)
+            response_cache: 시맨틱 응답 캐시 객체 (기본값: None, 캐시 사용 안 함)
+            answer_bank: 대표 질문 사전 생성 답변 저장소 (기본값: None, 사용 안 함)
+            profiler: 단계별 CPU/메모리 프로파일러 (기본값: None, 프로파일링 안 함)
+            domain_gate: LLM 호출 전 주제 밖 질문 판별기 (기본값: None, 사용 안 함)
+            session_cache: 이전 질문의 후보 문서를 다시 쓰는 세션 캐시 (기본값: None, 사용 안 함)
+            prompt_token_budget (int): 시스템 프롬프트 최대 토큰 수, 넘으면 하위 검색 문서부터 제외 (기본값: PROMPT_TOKEN_BUDGET)
         """
         self.retriever = retriever
-        self.category_prompt = CATEGORY_IDENTIFICATION_PROMPT
-        self.intent_prompt = INTENT_UNDERSTANDING_PROMPT
-        self.answer_prompt = DEFAULT_SYSTEM_PROMPT
+        self.response_cache = response_cache
+        self.answer_bank = answer_bank
+        self.category_prompt = CompiledPrompt(CATEGORY_IDENTIFICATION_PROMPT)
+        self.intent_prompt = CompiledPrompt(INTENT_UNDERSTANDING_PROMPT)
+        self.answer_prompt = CompiledPrompt(DEFAULT_SYSTEM_PROMPT)
+        self.prompt_token_budget = prompt_token_budget
         self.language_model = language_model or OpenAILanguageModel(api_key=OPENAI_API_KEY)
         self.conversation_history = []
+        self.stage_timings = {}
+        self.profiler = profiler
+        self.domain_gate = domain_gate
+        self.session_cache = session_cache
+        self.last_gate_decision = None
+
+    @contextmanager
+    def _timed(self, stage):
+        """
+        단계별 소요 시간(초)을 stage_timings에 누적합니다.
+
+        Parameters:
+            stage (str): 단계 이름
+        """
+        start = time.perf_counter()
+        try:
+            with self._profiled(stage):
+                yield
+        finally:
+            self.stage_timings[stage] = self.stage_timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def _profiled(self, stage):
+        """
+        프로파일러가 있을 때만 단계 구간을 표시합니다. stage_timings에는 기록하지 않으므로
+        다른 단계 안의 세부 구간(프롬프트 구성 등)을 나눌 때 사용합니다.
+
+        Parameters:
+            stage (str): 단계 이름
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.stage(stage)
+
+    def _clear_session_candidates(self):
+        """
+        검색 없이 끝난 질문 뒤에는 보관한 후보가 직전 질문의 것이 아니므로 세션 후보를 비웁니다.
+        """
+        if self.session_cache is not None:
+            self.session_cache.clear()
 
     def run(self, query):
         """
@@ -73,33 +128,110 @@ class RetrievalQAChain:
 
         Returns:
             str: 생성된 답변
-        """
-        # 1단계: 문서 검색
-        retrieved_documents = self.retrieve_documents(query, 5)
 
-        # 2단계: 카테고리 식별
-        category = self.identify_category(query, retrieved_documents)
-        if category == '저는 스마트 스토어 FAQ를 위한 챗봇입니다. 스마트 스토어에 대한 질문을 부탁드립니다.':
-            return category
-        elif ('•' in category or '-' in category) and (category.count('•') > 1 or category.count('-') > 1):
-            print("\n카테고리가 불명확합니다. 아래의 옵션 중에서 선택해 주세요:\n")
-            print(category)
-            category = input("답변: ").strip()
+        Note:
+            실행 후 stage_timings에 단계별 소요 시간(초)이 기록됩니다.
+        """
+        if self.profiler is None:
+            return self._run(query)
+        with self.profiler.query(query):
+            return self._run(query)
+
+    def _run(self, query):
+        self.stage_timings = {}
+
+        # 0단계: 대표 질문의 사전 생성 답변 및 유사한 질문에 대한 캐시된 답변 확인
+        query_embedding = None
+        self.last_gate_decision = None
+        needs_embedding = self.session_cache is not None or (self.domain_gate is not None and self.domain_gate.needs_embedding)
+        # 응답 캐시는 질문 임베딩만으로 찾으므로 대화 이력 없이 만든 답변만 저장하고 사용합니다.
+        # 이력이 있는 후속 질문("그럼 비용은?")의 답변은 다른 대화에서 의미가 달라집니다.
+        use_response_cache = self.response_cache is not None and not self.conversation_history
+        if self.answer_bank is not None or use_response_cache or needs_embedding:
+            with self._timed('embedding'):
+                query_embedding = self.retriever.embed_query(query)
+
+        if self.answer_bank is not None:
+            with self._timed('answer_bank'):
+                canonical = self.answer_bank.lookup(query_embedding)
+            if canonical:
+                with self._timed('history'):
+                    self.update_conversation_history(query, canonical['answer'], None)
+                self._clear_session_candidates()
+                return canonical['answer']
+
+        if use_response_cache:
+            with self._timed('response_cache'):
+                cached = self.response_cache.lookup(query_embedding)
+            if cached:
+                with self._timed('history'):
+                    self.update_conversation_history(query, cached['answer'], None)
+                self._clear_session_candidates()
+                return cached['answer']
+
+        # 1단계: 문서 검색 (후속 질문은 이전 질문의 후보 문서를 다시 정렬하여 사용)
+        results, carried_category = None, None
+        if self.session_cache is not None:
+            with self._timed('session_cache'):
+                reranked = self.session_cache.rerank(query, query_embedding, self.retriever.k, self.retriever.threshold)
+            if reranked is not None:
+                results, carried_category = reranked
+
+        if results is None:
+            with self._timed('retrieval'):
+                if self.session_cache is None:
+                    results = self.retrieve_results(query, self.retriever.k, query_embedding)
+                else:
+                    candidates = self.retrieve_results(
+                        query, self.retriever.k * self.session_cache.overfetch, query_embedding, include_embeddings=True
+                    )
+                    results = self.session_cache.update(candidates, self.retriever.k)
+        retrieved_documents = [result['text'] for result in results] if results else None
+
+        # 검색 점수, 어휘 겹침, 분류기가 모두 주제 밖을 가리키면 LLM 호출 없이 안내 문구로 응답
+        if self.domain_gate is not None:
+            with self._timed('domain_gate'):
+                self.last_gate_decision = self.domain_gate.check(query, results, query_embedding)
+            if not self.last_gate_decision['in_domain']:
+                self._clear_session_candidates()
+                return OUT_OF_DOMAIN_MESSAGE
+
+        # 2단계: 카테고리 식별 (같은 주제의 후속 질문이면 이전 카테고리를 그대로 사용)
+        if carried_category is not None:
+            category = carried_category
+        else:
+            with self._timed('category'):
+                category = self.identify_category(query, retrieved_documents)
+            if is_out_of_domain_response(category):
+                return OUT_OF_DOMAIN_MESSAGE
+            elif ('•' in category or '-' in category) and (category.count('•') > 1 or category.count('-') > 1):
+                print("\n카테고리가 불명확합니다. 아래의 옵션 중에서 선택해 주세요:\n")
+                print(category)
+                category = input("답변: ").strip()
+        if self.session_cache is not None:
+            self.session_cache.remember_category(category)
 
         # 3단계: 질문의 의도 파악
-        intent = self.understand_intent(query, category, retrieved_documents)
-        if intent == '저는 스마트 스토어 FAQ를 위한 챗봇입니다. 스마트 스토어에 대한 질문을 부탁드립니다.':
-            return intent
+        with self._timed('intent'):
+            intent = self.understand_intent(query, category, retrieved_documents)
+        if is_out_of_domain_response(intent):
+            return OUT_OF_DOMAIN_MESSAGE
         elif ('•' in intent or '-' in intent) and (intent.count('•') > 1 or intent.count('-') > 1):
             print("\n의도가 불명확합니다. 아래의 옵션 중에서 선택해 주세요:\n")
             print(intent)
             intent = input("답변: ").strip()
 
         # 4단계: 답변 생성
-        answer = self.generate_answer(query, category, intent, retrieved_documents)
+        with self._timed('answer'):
+            answer = self.generate_answer(query, category, intent, retrieved_documents)
 
         # 대화 이력 업데이트
-        self.update_conversation_history(query, answer, retrieved_documents)
+        with self._timed('history'):
+            self.update_conversation_history(query, answer, retrieved_documents)
+
+        if use_response_cache:
+            documents = {result['id']: content_hash(result['text']) for result in results}
+            self.response_cache.add(query, query_embedding, answer, category, intent, documents)
         return answer
 
     def build_context(self, query, category, intent, retrieved_documents):
@@ -115,8 +247,8 @@ class RetrievalQAChain:
         Returns:
             str: 구축된 컨텍스트
         """
-        history = "\n".join(set(self.conversation_history))
-        retrieved_text = "\n\n".join(set(retrieved_documents)) if retrieved_documents else "해당 카테고리에 대한 추가 정보는 제공되지 않습니다."
+        history = "\n".join(dict.fromkeys(self.conversation_history))
+        retrieved_text = join_documents(retrieved_documents)
         context = f"대화 기록:\n{history}\n질문: {query}\n카테고리: {category}\n의도: {intent}\n\n{retrieved_text}"
         return context
 
@@ -132,7 +264,7 @@ class RetrievalQAChain:
         self.conversation_history.append(f"질문: {query}")
         self.conversation_history.append(f"답변: {answer}")
         if retrieved_documents:
-            documents_text = "\n".join(set(retrieved_documents))
+            documents_text = "\n".join(dict.fromkeys(retrieved_documents))
             self.conversation_history.append(f"조회된 문서:\n{documents_text}")
 
         history_text = "\n".join(self.conversation_history)
@@ -141,22 +273,47 @@ class RetrievalQAChain:
 
         self.conversation_history = truncated_history.split("\n")
 
+    def assemble_prompt(self, prompt, retrieved_documents, **values):
+        """
+        컴파일된 프롬프트에 검색 문서와 값을 채웁니다. 토큰 수가 예산을 넘으면 점수가 낮은 문서부터 뺍니다.
+
+        Parameters:
+            prompt (CompiledPrompt): 컴파일된 프롬프트
+            retrieved_documents (list): 검색된 문서 리스트 (점수 순)
+            **values: 문서 외의 템플릿 필드 값
+
+        Returns:
+            str: 시스템 프롬프트
+        """
+        documents = list(dict.fromkeys(retrieved_documents or []))
+        system_prompt, tokens = prompt.build(context=join_documents(documents), **values)
+        while tokens > self.prompt_token_budget and documents:
+            documents.pop()
+            system_prompt, tokens = prompt.build(context=join_documents(documents), **values)
+        if len(documents) < len(retrieved_documents or []):
+            logging.warning(
+                "프롬프트가 토큰 예산(%d)을 넘어 검색 문서 %d개 중 %d개만 사용합니다.",
+                self.prompt_token_budget, len(retrieved_documents), len(documents)
+            )
+        return system_prompt
+
     def identify_category(self, query, faqs_context=None):
         """
         질문에 대한 카테고리를 식별합니다.
 
         Parameters:
             query (str): 사용자 질문
-            faqs_context (str, optional): FAQ 컨텍스트
+            faqs_context (list, optional): 검색된 FAQ 문서 리스트
 
         Returns:
             str: 식별된 카테고리
         """
-        system_prompt = self.category_prompt.format(context=faqs_context)
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
+        with self._profiled('prompt'):
+            system_prompt = self.assemble_prompt(self.category_prompt, faqs_context)
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query}
+            ]
         response = self.language_model.generate(messages).strip()
         return response
 
@@ -167,18 +324,19 @@ class RetrievalQAChain:
         Parameters:
             query (str): 사용자 질문
             category (str): 식별된 카테고리
-            faqs_context (str, optional): FAQ 컨텍스트
+            faqs_context (list, optional): 검색된 FAQ 문서 리스트
 
         Returns:
             str: 파악된 의도
         """
-        system_prompt = self.intent_prompt.format(context=faqs_context, category=category)
-        prompt = f"질문: '{query}'\n카테고리: '{category}'"
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ]
+        with self._profiled('prompt'):
+            system_prompt = self.assemble_prompt(self.intent_prompt, faqs_context, category=category)
+            prompt = f"질문: '{query}'\n카테고리: '{category}'"
+
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
         response = self.language_model.generate(messages).strip()
         return response
 
@@ -196,6 +354,23 @@ class RetrievalQAChain:
         results = self.retriever.retrieve(query, n_results)
         return results
 
+    def retrieve_results(self, query, n_results, query_embedding=None, include_embeddings=False):
+        """
+        문서를 ID, 유사도 점수와 함께 검색합니다.
+
+        Parameters:
+            query (str): 사용자 질문
+            n_results (int): 검색할 문서 수
+            query_embedding (list, optional): 미리 계산된 질문 임베딩
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부 (기본값: False)
+
+        Returns:
+            list: 검색 결과 딕셔너리(id, text, score, metadata) 리스트
+        """
+        return self.retriever.retrieve_with_scores(
+            query, n_results, query_embedding=query_embedding, include_embeddings=include_embeddings
+        )
+
     def generate_answer(self, query, category, intent, retrieved_documents):
         """
         최종 답변을 생성합니다.
@@ -209,24 +384,25 @@ class RetrievalQAChain:
         Returns:
             str: 생성된 답변
         """
-        if intent == '저는 스마트 스토어 FAQ를 위한 챗봇입니다. 스마트스토어에 대한 질문을 부탁드립니다.':
-            return intent
-
-        history = "\n".join(set(self.conversation_history))
-        retrieved_text = "\n\n".join(set(retrieved_documents)) if retrieved_documents else "해당 카테고리에 대한 추가 정보는 제공되지 않습니다."
-
-        system_prompt = self.answer_prompt.format(
-            context=retrieved_text,
-            category=category,
-            intent=intent,
-            history=history
-        )
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
+        if is_out_of_domain_response(intent):
+            return OUT_OF_DOMAIN_MESSAGE
+
+        with self._profiled('prompt'):
+            history = "\n".join(dict.fromkeys(self.conversation_history))
+            system_prompt = self.assemble_prompt(
+                self.answer_prompt,
+                retrieved_documents,
+                category=category,
+                intent=intent,
+                history=history
+            )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query}
+            ]
 
         answer = self.language_model.generate(messages).strip()
 
-        self.update_conversation_history(query, answer, retrieved_documents)
+        with self._profiled('history'):
+            self.update_conversation_history(query, answer, retrieved_documents)
         return f"카테고리: {category}\n의도: {intent}\n\n{answer}"
@@ -6,4 +6,79 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # API 키 가져오기
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
\ No newline at end of file
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+# 시맨틱 응답 캐시 설정
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.json")
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+# 사전 생성 답변 저장소 설정
+ANSWER_BANK_PATH = os.environ.get("ANSWER_BANK_PATH", "answer_bank.json")
+ANSWER_BANK_THRESHOLD = float(os.environ.get("ANSWER_BANK_THRESHOLD", "0.92"))
+ANSWER_BANK_CONCURRENCY = int(os.environ.get("ANSWER_BANK_CONCURRENCY", "4"))
+
+# 서빙 상태 스냅샷 경로
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+
+# 카테고리별 컬렉션 분할 사용 여부
+PARTITION_BY_CATEGORY = os.environ.get("PARTITION_BY_CATEGORY", "false").lower() in ("1", "true", "yes")
+# 예측된 샤드의 최고 점수가 이보다 낮거나 일치한 키워드가 이보다 적으면 나머지 샤드도 검색
+# 점수 0.5는 단위 벡터 임베딩의 l2 공간에서 코사인 유사도 0.5에 해당하며, benchmarks/retrieval_tuning.py의 질문 세트로 조정합니다.
+PARTITION_FALLBACK_SCORE = float(os.environ.get("PARTITION_FALLBACK_SCORE", "0.5"))
+PARTITION_MIN_KEYWORD_MATCHES = int(os.environ.get("PARTITION_MIN_KEYWORD_MATCHES", "2"))
+
+# 임베딩 백엔드 설정 ("openai" 또는 네트워크 없이 동작하는 "local")
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL_PATH = os.environ.get("LOCAL_EMBEDDING_MODEL_PATH", "local_embedding.pkl")
+
+# 적재 시 한 번의 임베딩 요청(및 적재 저널 배치)에 넣을 문서 수
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+
+# 청크 분할 설정 (토큰 수 기준, 짧은 FAQ 항목은 CHUNK_PACK_TOKENS 이하일 때 묶음)
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_PACK_TOKENS = int(os.environ.get("CHUNK_PACK_TOKENS", "64"))
+
+# 적재 전 중복 제거 설정 (Jaccard 유사도 임계값)
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+# IVF-PQ 근사 색인 설정
+IVFPQ_INDEX_DIR = os.environ.get("IVFPQ_INDEX_DIR", "ivfpq_index")
+IVFPQ_NPROBE = int(os.environ.get("IVFPQ_NPROBE", "8"))
+IVFPQ_RERANK = int(os.environ.get("IVFPQ_RERANK", "256"))
+
+# 검색 설정 (검색할 문서 수와 유사도 점수 임계값)
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_THRESHOLD = float(os.environ.get("RETRIEVAL_THRESHOLD", "0.35"))
+
+# 주제 밖 질문 판별 설정 (모든 신호가 주제 밖을 가리킬 때만 LLM 호출 없이 안내 문구로 응답)
+# 임계값을 benchmarks/domain_gate_eval.py로 질문 세트에서 검증하기 전까지 기본값은 사용 안 함
+DOMAIN_GATE_ENABLED = os.environ.get("DOMAIN_GATE_ENABLED", "false").lower() in ("1", "true", "yes")
+DOMAIN_GATE_SCORE_THRESHOLD = float(os.environ.get("DOMAIN_GATE_SCORE_THRESHOLD", "0.45"))
+DOMAIN_GATE_LEXICAL_THRESHOLD = float(os.environ.get("DOMAIN_GATE_LEXICAL_THRESHOLD", "0.3"))
+DOMAIN_CLASSIFIER_PATH = os.environ.get("DOMAIN_CLASSIFIER_PATH", "domain_classifier.pkl")
+DOMAIN_CLASSIFIER_THRESHOLD = float(os.environ.get("DOMAIN_CLASSIFIER_THRESHOLD", "0.5"))
+
+# 후속 질문 세션 캐시 설정 (후속 질문만 이전 질문 후보 문서 재정렬, 점수가 기준보다 낮으면 전체 검색)
+# 임계값을 질문 세트로 검증하기 전까지 기본값은 사용 안 함
+SESSION_CACHE_ENABLED = os.environ.get("SESSION_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SESSION_CACHE_OVERFETCH = int(os.environ.get("SESSION_CACHE_OVERFETCH", "4"))
+SESSION_CACHE_THRESHOLD = float(os.environ.get("SESSION_CACHE_THRESHOLD", "0.8"))
+SESSION_CATEGORY_THRESHOLD = float(os.environ.get("SESSION_CATEGORY_THRESHOLD", "0.85"))
+
+# 시스템 프롬프트 토큰 예산 (넘으면 점수가 낮은 검색 문서부터 제외)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "6000"))
+
+# 프로파일링 설정 (main.py --profile 사용 시)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Chroma 컬렉션의 HNSW 설정 (space, M, construction_ef는 컬렉션을 새로 만들 때만 적용)
+CHROMA_HNSW_CONFIG = {
+    'space': os.environ.get("CHROMA_HNSW_SPACE", "l2"),
+    'M': int(os.environ.get("CHROMA_HNSW_M", "16")),
+    'construction_ef': int(os.environ.get("CHROMA_HNSW_CONSTRUCTION_EF", "100")),
+    'search_ef': int(os.environ.get("CHROMA_HNSW_SEARCH_EF", "10"))
+}
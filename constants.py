@@ -13,4 +13,52 @@ STOPWORDS = [
 # 질문 관련 불용어 리스트
 QUESTION_RELATED_STOPWORDS = [
     "어떻", "어때", "가요", "인가요", "죠", "지", "나요", "습니까", "요", "죠", "하", "되", "있", "없"
-]
\ No newline at end of file
+]
+
+# FAQ 카테고리별 컬렉션 이름 접미사 (Chroma 컬렉션 이름에는 한글을 쓸 수 없습니다)
+FAQ_CATEGORY_SLUGS = {
+    "회원가입": "membership",
+    "상품관리": "product",
+    "쇼핑윈도관리": "shopping_window",
+    "판매관리": "sales",
+    "정산관리": "settlement",
+    "문의/리뷰관리": "inquiry_review",
+    "스토어관리": "store",
+    "혜택/마케팅": "marketing",
+    "브랜드 혜택/마케팅": "brand_marketing",
+    "커머스솔루션": "commerce_solution",
+    "통계": "statistics",
+    "광고관리": "advertising",
+    "프로모션 관리": "promotion",
+    "물류 관리": "logistics",
+    "판매자 정보": "seller_info",
+    "공지사항": "announcements",
+    "공통/기타": "common"
+}
+
+# 기본 카테고리 (키워드가 일치하지 않는 경우)
+DEFAULT_FAQ_CATEGORY = "공통/기타"
+
+# 카테고리 분류를 위한 키워드 리스트
+FAQ_CATEGORY_KEYWORDS = {
+    "회원가입": ["가입", "회원", "탈퇴", "사업자", "개인판매자", "명의", "본인인증", "심사"],
+    "상품관리": ["상품", "등록", "옵션", "재고", "카탈로그", "상세페이지", "이미지", "원산지"],
+    "쇼핑윈도관리": ["쇼핑윈도", "윈도", "백화점윈도", "아울렛윈도", "스타일윈도"],
+    "판매관리": ["주문", "발송", "배송", "취소", "반품", "교환", "구매확정", "송장", "미발송"],
+    "정산관리": ["정산", "수수료", "부가세", "세금계산서", "지급", "충전금", "대금"],
+    "문의/리뷰관리": ["문의", "리뷰", "후기", "톡톡", "답변", "평점"],
+    "스토어관리": ["스토어", "스토어이름", "도메인", "전시", "판매자등급", "굿서비스"],
+    "혜택/마케팅": ["쿠폰", "포인트", "혜택", "마케팅", "알림받기", "적립"],
+    "브랜드 혜택/마케팅": ["브랜드"],
+    "커머스솔루션": ["솔루션", "API", "커머스솔루션", "연동"],
+    "통계": ["통계", "비즈어드바이저", "분석", "유입"],
+    "광고관리": ["광고", "검색광고", "쇼핑검색광고", "광고비"],
+    "프로모션 관리": ["프로모션", "기획전", "럭키투데이", "타임특가"],
+    "물류 관리": ["물류", "풀필먼트", "택배", "배송비", "출고", "창고"],
+    "판매자 정보": ["판매자정보", "정보변경", "계좌", "담당자", "연락처", "대표자"],
+    "공지사항": ["공지", "안내", "변경사항"],
+    "공통/기타": []
+}
+
+# FAQ 주제와 관련 없는 질문에 대한 안내 문구
+OUT_OF_DOMAIN_MESSAGE = "저는 스마트 스토어 FAQ를 위한 챗봇입니다. 스마트스토어에 대한 질문을 부탁드립니다."
@@ -0,0 +1,28 @@
+import argparse
+from config.settings import OPENAI_API_KEY, IVFPQ_INDEX_DIR, EMBEDDING_BACKEND
+from stores.factory import create_vector_store
+from stores.ivfpq_vector_store import write_ivfpq_index
+
+def create_ivfpq_index(directory=IVFPQ_INDEX_DIR, nlist=None, m=None):
+    """
+    Chroma DB의 문서와 임베딩으로 IVF-PQ 근사 색인을 만들어 저장합니다.
+
+    Parameters:
+        directory (str): 색인 경로
+        nlist (int, optional): 리스트 수
+        m (int, optional): 하위 양자화기 수
+    """
+    if EMBEDDING_BACKEND == "openai" and not OPENAI_API_KEY:
+        raise ValueError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 'OPENAI_API_KEY'를 설정하세요.")
+
+    vector_store = create_vector_store(OPENAI_API_KEY)
+    write_ivfpq_index(vector_store, directory, nlist=nlist, m=m)
+    print(f"IVF-PQ 색인 저장이 완료되었습니다. 경로: {directory}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="저장된 임베딩으로 IVF-PQ 근사 색인을 만듭니다.")
+    parser.add_argument("--directory", default=IVFPQ_INDEX_DIR, help="색인 경로")
+    parser.add_argument("--nlist", type=int, default=None, help="리스트 수 (기본값: 문서 수의 제곱근의 4배)")
+    parser.add_argument("--m", type=int, default=None, help="하위 양자화기 수 (기본값: 하위 벡터 차원 16)")
+    args = parser.parse_args()
+    create_ivfpq_index(args.directory, nlist=args.nlist, m=args.m)
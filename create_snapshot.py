@@ -0,0 +1,33 @@
+from config.settings import (
+    OPENAI_API_KEY,
+    SNAPSHOT_DIR,
+    RESPONSE_CACHE_PATH,
+    ANSWER_BANK_PATH,
+    EMBEDDING_BACKEND
+)
+from stores.factory import create_vector_store
+from stores.snapshot import write_snapshot
+from embeddings.embedding import embedding_model_version
+from caches.semantic_cache import SemanticCache
+from caches.answer_bank import AnswerBank
+
+def create_snapshot(root_directory=SNAPSHOT_DIR):
+    """
+    Chroma DB의 문서와 캐시 내용을 메모리 맵 스냅샷으로 저장합니다.
+
+    Parameters:
+        root_directory (str): 스냅샷 루트 경로
+    """
+    if EMBEDDING_BACKEND == "openai" and not OPENAI_API_KEY:
+        raise ValueError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 'OPENAI_API_KEY'를 설정하세요.")
+
+    vector_store = create_vector_store(OPENAI_API_KEY)
+    model_version = embedding_model_version(vector_store.embedding_model)
+    response_cache = SemanticCache(persist_path=RESPONSE_CACHE_PATH, embedding_model=model_version)
+    answer_bank = AnswerBank(persist_path=ANSWER_BANK_PATH, embedding_model=model_version)
+
+    snapshot_directory = write_snapshot(vector_store, root_directory, response_cache=response_cache, answer_bank=answer_bank)
+    print(f"스냅샷 저장이 완료되었습니다. 경로: {snapshot_directory}")
+
+if __name__ == "__main__":
+    create_snapshot()
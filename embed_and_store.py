@@ -1,16 +1,53 @@
-from config.settings import OPENAI_API_KEY
+import argparse
+import os
+from config.settings import (
+    OPENAI_API_KEY,
+    RESPONSE_CACHE_PATH,
+    ANSWER_BANK_PATH,
+    EMBEDDING_BACKEND,
+    LOCAL_EMBEDDING_MODEL_PATH,
+    NEAR_DUPLICATE_THRESHOLD,
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_PACK_TOKENS
+)
 from utils.extracter import extract_questions_and_answers
-from utils.splitter import FAQTextSplitter
-from stores.chroma_vector_store import ChromaVectorStore
+from utils.splitter import TokenTextSplitter
+from utils.deduplicate import NearDuplicateFilter
+from stores.factory import create_vector_store
+from stores.ingestion_journal import FAILED
+from caches.semantic_cache import SemanticCache
+from caches.answer_bank import AnswerBank
+from embeddings.embedding import embedding_model_version
+from utils.hashing import content_hash
+from utils.categorizer import assign_category
 
-def embed_and_store(file_path):
+def fit_local_embedding(documents, path, refit=False):
+    """
+    로컬 임베딩 모델을 FAQ 문서로 학습하여 저장합니다. 이미 학습된 모델이 있으면 그대로 사용합니다.
+    다시 학습하면 임베딩 공간이 바뀌므로 저장된 모든 문서가 다시 임베딩됩니다.
+
+    Parameters:
+        documents (list): 학습할 문서 리스트
+        path (str): 모델 파일 경로
+        refit (bool): 기존 모델이 있어도 다시 학습할지 여부 (기본값: False)
+    """
+    if os.path.exists(path) and not refit:
+        return
+    from embeddings.local_embedding import LocalEmbedding
+    LocalEmbedding().fit(documents).save(path)
+
+def embed_and_store(file_path, workers=1, refit_embedding=False, deduplicate=True):
     """
     데이터를 임베딩하고 벡터 스토어에 저장합니다.
 
     Parameters:
         file_path (str): 데이터 파일 경로
+        workers (int): 임베딩 작업자 프로세스 수 (기본값: 1)
+        refit_embedding (bool): local 임베딩 백엔드에서 임베딩 모델을 다시 학습할지 여부 (기본값: False)
+        deduplicate (bool): 거의 같은 청크를 합쳐서 저장할지 여부 (기본값: True)
     """
-    if not OPENAI_API_KEY:
+    if EMBEDDING_BACKEND == "openai" and not OPENAI_API_KEY:
         raise ValueError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 'OPENAI_API_KEY'를 설정하세요.")
 
     qa_pairs = extract_questions_and_answers(file_path)
@@ -19,15 +56,60 @@ def embed_and_store(file_path):
         print("질문과 답변 데이터가 없습니다.")
         return
 
-    text_splitter = FAQTextSplitter(chunk_size=256, chunk_overlap=0)
+    # 카테고리별 샤드 분할과 같은 카테고리끼리의 짧은 항목 묶음을 위해 각 FAQ 항목에 카테고리 지정
+    for item in qa_pairs:
+        item['category'] = assign_category(item['question'], item['answer'])
+
+    text_splitter = TokenTextSplitter(
+        chunk_tokens=CHUNK_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        pack_tokens=CHUNK_PACK_TOKENS
+    )
     documents, metadatas = text_splitter.split(qa_pairs)
 
-    vector_store = ChromaVectorStore(api_key=OPENAI_API_KEY)
+    if deduplicate:
+        duplicate_filter = NearDuplicateFilter(threshold=NEAR_DUPLICATE_THRESHOLD)
+        documents, metadatas, report = duplicate_filter.deduplicate(documents, metadatas)
+        print(
+            f"중복 청크 {report['embeddings_saved']}개를 대표 청크 {report['merged_groups']}개로 합쳐 "
+            f"텍스트 {report['bytes_saved']:,}바이트를 절약했습니다. (저장할 청크: {report['kept']}개)"
+        )
+
+    if EMBEDDING_BACKEND == "local":
+        fit_local_embedding(documents, LOCAL_EMBEDDING_MODEL_PATH, refit=refit_embedding)
+
+    vector_store = create_vector_store(OPENAI_API_KEY)
 
     ids = [str(i) for i in range(len(documents))]
-    vector_store.add_documents(documents, metadatas, ids)
+    summary = vector_store.add_documents(documents, metadatas, ids, workers=workers)
+    # 입력 문서 수가 줄어든 경우(예: 중복 제거) 이전 실행에서 남은 문서 삭제
+    if summary and not summary.get(FAILED):
+        vector_store.prune(ids, metadatas)
+
+    # 내용이 바뀐 문서를 참조하는 캐시된 답변 및 사전 생성 답변 무효화
+    current_hashes = {doc_id: content_hash(doc) for doc_id, doc in zip(ids, documents)}
+    model_version = embedding_model_version(vector_store.embedding_model)
+    if os.path.exists(RESPONSE_CACHE_PATH):
+        response_cache = SemanticCache(ttl_seconds=None, persist_path=RESPONSE_CACHE_PATH, embedding_model=model_version)
+        response_cache.invalidate_changed(current_hashes)
+        response_cache.save()
+    if os.path.exists(ANSWER_BANK_PATH):
+        answer_bank = AnswerBank(persist_path=ANSWER_BANK_PATH, embedding_model=model_version)
+        answer_bank.invalidate_changed(current_hashes)
+        answer_bank.save()
 
     print("데이터 임베딩 및 저장이 완료되었습니다. Chroma DB에 문서가 저장되었습니다.")
 
 if __name__ == "__main__":
-    embed_and_store('datasets/final_result.pkl')
+    parser = argparse.ArgumentParser(description="FAQ 데이터를 임베딩하여 Chroma DB에 저장합니다.")
+    parser.add_argument("file_path", nargs="?", default="datasets/final_result.pkl", help="FAQ 데이터 파일 경로")
+    parser.add_argument("--workers", type=int, default=1, help="임베딩 작업자 프로세스 수 (기본값: 1)")
+    parser.add_argument("--refit-embedding", action="store_true", help="local 임베딩 백엔드의 모델을 다시 학습합니다.")
+    parser.add_argument("--no-dedup", action="store_true", help="거의 같은 청크를 합치지 않고 모두 저장합니다.")
+    args = parser.parse_args()
+    embed_and_store(
+        args.file_path,
+        workers=args.workers,
+        refit_embedding=args.refit_embedding,
+        deduplicate=not args.no_dedup
+    )
@@ -1,17 +1,21 @@
 from openai import OpenAI
 
 class OpenAIEmbedding:
-    def __init__(self, api_key, model="text-embedding-3-small"):
+    def __init__(self, api_key, model="text-embedding-3-small", base_url=None, max_retries=2, raise_errors=False):
         """
         OpenAI 임베딩 모델 초기화.
 
         Parameters:
             api_key (str): OpenAI API 키
             model (str): 사용할 임베딩 모델 (기본값: "text-embedding-3-small")
+            base_url (str, optional): OpenAI 호환 API 서버 주소 (기본값: OpenAI API)
+            max_retries (int): 클라이언트의 자동 재시도 횟수 (기본값: 2)
+            raise_errors (bool): 요청 실패 시 빈 리스트 대신 예외를 그대로 발생시킬지 여부 (기본값: False, 부하 측정용)
         """
         self.api_key = api_key
         self.model = model
-        self.client = OpenAI(api_key=self.api_key)
+        self.raise_errors = raise_errors
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url, max_retries=max_retries)
 
     def get_embedding(self, text):
         """
@@ -31,5 +35,61 @@ class OpenAIEmbedding:
             embedding = response.data[0].embedding
             return embedding
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"[오류] 임베딩 생성 실패: {e}")
             return []
+
+    def get_embeddings(self, texts):
+        """
+        여러 텍스트의 임베딩을 한 번의 요청으로 생성합니다.
+
+        Parameters:
+            texts (list): 임베딩할 텍스트 리스트
+
+        Returns:
+            list: 입력 순서대로 정렬된 임베딩 벡터 리스트 (실패 시 빈 리스트)
+        """
+        try:
+            response = self.client.embeddings.create(
+                input=list(texts),
+                model=self.model
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"[오류] 임베딩 생성 실패: {e}")
+            return []
+
+def create_embedding_model(backend="openai", api_key=None, model="text-embedding-3-small", local_model_path="local_embedding.pkl"):
+    """
+    설정된 백엔드의 임베딩 모델을 생성합니다.
+
+    Parameters:
+        backend (str): "openai" 또는 "local" (기본값: "openai")
+        api_key (str, optional): OpenAI API 키 (openai 백엔드에서 필요)
+        model (str): OpenAI 임베딩 모델 이름
+        local_model_path (str): 학습된 로컬 임베딩 모델 파일 경로
+
+    Returns:
+        임베딩 모델 객체 (get_embedding, get_embeddings 지원)
+    """
+    if backend == "openai":
+        return OpenAIEmbedding(api_key, model=model)
+    if backend == "local":
+        from embeddings.local_embedding import LocalEmbedding
+        return LocalEmbedding.load(local_model_path)
+    raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {backend}")
+
+def embedding_model_version(embedding_model):
+    """
+    임베딩 공간을 식별하는 모델 버전을 반환합니다. 로컬 모델은 학습 결과마다 버전이 다릅니다.
+
+    Parameters:
+        embedding_model: 임베딩 모델 객체
+
+    Returns:
+        str: 모델 버전 또는 None
+    """
+    return getattr(embedding_model, 'version', None) or getattr(embedding_model, 'model', None)
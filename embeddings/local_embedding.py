@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import pickle
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.decomposition import TruncatedSVD
+
+MODEL_FORMAT_VERSION = 1
+
+class LocalEmbedding:
+    def __init__(self, n_components=256, ngram_range=(2, 4), n_features=2 ** 15, model="local-char-tfidf-svd"):
+        """
+        네트워크 없이 CPU에서 동작하는 로컬 임베딩 모델 초기화.
+
+        문자 n-gram 해싱과 TF-IDF로 만든 희소 벡터를 FAQ 말뭉치에 맞춘 TruncatedSVD로 축소합니다.
+        사용하기 전에 fit으로 학습하거나 load로 저장된 모델을 불러와야 합니다.
+
+        Parameters:
+            n_components (int): 임베딩 차원 (기본값: 256)
+            ngram_range (tuple): 문자 n-gram 범위 (기본값: (2, 4))
+            n_features (int): 해싱 공간 크기 (기본값: 2 ** 15)
+            model (str): 모델 이름
+        """
+        self.n_components = n_components
+        self.ngram_range = tuple(ngram_range)
+        self.n_features = n_features
+        self.model = model
+        self.vectorizer = self._build_vectorizer()
+        self.idf = None
+        self.projection = None
+        self.version = None
+
+    def _build_vectorizer(self):
+        return HashingVectorizer(
+            analyzer='char_wb',
+            ngram_range=self.ngram_range,
+            n_features=self.n_features,
+            alternate_sign=False,
+            norm=None
+        )
+
+    @property
+    def is_fitted(self):
+        return self.projection is not None
+
+    def _compute_version(self):
+        """
+        학습된 가중치의 해시로 모델 버전을 정합니다. 다시 학습하면 임베딩 공간이 바뀌므로 버전도 바뀝니다.
+        """
+        digest = hashlib.sha256(self.idf.tobytes())
+        digest.update(self.projection.tobytes())
+        self.version = f"{self.model}-{digest.hexdigest()[:16]}"
+
+    def fit(self, texts):
+        """
+        말뭉치로 IDF 가중치와 SVD 투영 행렬을 학습합니다.
+
+        Parameters:
+            texts (list): 학습할 텍스트 리스트
+
+        Returns:
+            LocalEmbedding: 자기 자신
+        """
+        counts = self.vectorizer.transform(texts)
+        transformer = TfidfTransformer(sublinear_tf=True).fit(counts)
+        tfidf = transformer.transform(counts)
+
+        n_components = min(self.n_components, tfidf.shape[0] - 1, tfidf.shape[1] - 1)
+        svd = TruncatedSVD(n_components=n_components, random_state=0).fit(tfidf)
+
+        self.idf = transformer.idf_.astype(np.float32)
+        # (n_features, n_components) 형태로 저장하여 질의의 0이 아닌 n-gram 행만 골라 곱할 수 있게 합니다.
+        self.projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        self._compute_version()
+        logging.info(
+            "로컬 임베딩 모델을 학습했습니다. 문서 수: %d, 차원: %d, 설명된 분산: %.3f",
+            tfidf.shape[0], n_components, svd.explained_variance_ratio_.sum()
+        )
+        return self
+
+    def _encode_sparse(self, counts):
+        """
+        n-gram 빈도 희소 행렬을 정규화된 임베딩 행렬로 변환합니다.
+        """
+        if not self.is_fitted:
+            raise ValueError("로컬 임베딩 모델이 학습되지 않았습니다. fit 또는 load를 먼저 호출하세요.")
+
+        # TF-IDF의 L2 정규화는 선형 투영 후 다시 정규화하면 상쇄되므로 생략합니다.
+        counts = counts.tocsr().astype(np.float32)
+        counts.data = (1 + np.log(counts.data)) * self.idf[counts.indices]
+        embeddings = np.asarray(counts @ self.projection, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
+    def encode(self, texts):
+        """
+        여러 텍스트를 한 번에 임베딩합니다.
+
+        Parameters:
+            texts (list): 임베딩할 텍스트 리스트
+
+        Returns:
+            numpy.ndarray: (텍스트 수, 차원) 형태의 단위 벡터 행렬
+        """
+        return self._encode_sparse(self.vectorizer.transform(texts))
+
+    def get_embedding(self, text):
+        """
+        주어진 텍스트의 임베딩을 생성합니다.
+
+        Parameters:
+            text (str): 임베딩할 텍스트
+
+        Returns:
+            list: 임베딩 벡터
+        """
+        counts = self.vectorizer.transform([text])
+        if not counts.nnz:
+            return [0.0] * self.projection.shape[1]
+        # 질의 하나는 0이 아닌 n-gram 행만 모아 곱합니다.
+        weights = (1 + np.log(counts.data.astype(np.float32))) * self.idf[counts.indices]
+        vector = weights @ self.projection[counts.indices]
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_embeddings(self, texts):
+        """
+        여러 텍스트의 임베딩을 생성합니다.
+
+        Parameters:
+            texts (list): 임베딩할 텍스트 리스트
+
+        Returns:
+            list: 임베딩 벡터 리스트
+        """
+        return self.encode(list(texts)).tolist()
+
+    def __call__(self, input):
+        """
+        Chroma의 EmbeddingFunction 규약을 따르는 호출 메서드입니다.
+
+        Parameters:
+            input (list): 임베딩할 문서 리스트
+
+        Returns:
+            list: 임베딩 벡터 리스트
+        """
+        return self.get_embeddings(input)
+
+    def save(self, path):
+        """
+        학습된 모델을 파일에 저장합니다. 임시 파일에 쓴 뒤 교체합니다.
+
+        Parameters:
+            path (str): 저장 경로
+        """
+        if not self.is_fitted:
+            raise ValueError("학습되지 않은 로컬 임베딩 모델은 저장할 수 없습니다.")
+        state = {
+            'format_version': MODEL_FORMAT_VERSION,
+            'model': self.model,
+            'n_components': self.n_components,
+            'ngram_range': self.ngram_range,
+            'n_features': self.n_features,
+            'idf': self.idf,
+            'projection': self.projection
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        logging.info("로컬 임베딩 모델을 저장했습니다: %s", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        저장된 모델을 불러옵니다.
+
+        Parameters:
+            path (str): 모델 파일 경로
+
+        Returns:
+            LocalEmbedding: 불러온 모델
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"로컬 임베딩 모델 파일이 없습니다: {path}. 먼저 embed_and_store.py를 실행하세요.")
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state.get('format_version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 로컬 임베딩 모델 형식입니다: {state.get('format_version')}")
+
+        embedding = cls(state['n_components'], state['ngram_range'], state['n_features'], state['model'])
+        embedding.idf = state['idf']
+        embedding.projection = state['projection']
+        embedding._compute_version()
+        return embedding
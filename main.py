@@ -1,35 +1,173 @@
-from config.settings import OPENAI_API_KEY
-from stores.chroma_vector_store import ChromaVectorStore
+import argparse
+from config.settings import (
+    OPENAI_API_KEY,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    ANSWER_BANK_PATH,
+    ANSWER_BANK_THRESHOLD,
+    SNAPSHOT_DIR,
+    EMBEDDING_BACKEND,
+    LOCAL_EMBEDDING_MODEL_PATH,
+    IVFPQ_INDEX_DIR,
+    IVFPQ_NPROBE,
+    IVFPQ_RERANK,
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_THRESHOLD,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL,
+    DOMAIN_GATE_ENABLED,
+    DOMAIN_GATE_SCORE_THRESHOLD,
+    DOMAIN_GATE_LEXICAL_THRESHOLD,
+    DOMAIN_CLASSIFIER_PATH,
+    DOMAIN_CLASSIFIER_THRESHOLD,
+    SESSION_CACHE_ENABLED,
+    SESSION_CACHE_OVERFETCH,
+    SESSION_CACHE_THRESHOLD,
+    SESSION_CATEGORY_THRESHOLD
+)
+from stores.factory import create_vector_store
+from stores.snapshot import SnapshotVectorStore
+from stores.ivfpq_vector_store import IVFPQVectorStore
+from embeddings.embedding import create_embedding_model, embedding_model_version
 from retrievers.vector_store_retriever import VectorStoreRetriever
 from chains.retrieval_qa_chain import RetrievalQAChain
+from chains.domain_gate import DomainGate, load_domain_classifier
+from caches.semantic_cache import SemanticCache
+from caches.answer_bank import AnswerBank
+from caches.session_cache import SessionCandidateCache
+from utils.profiler import QueryProfiler, PROFILE_MODES
+
+def parse_args():
+    """
+    명령행 인자를 파싱합니다.
+
+    Returns:
+        argparse.Namespace: 파싱된 인자
+    """
+    parser = argparse.ArgumentParser(description="스마트스토어 FAQ 챗봇")
+    parser.add_argument(
+        "--snapshot", nargs="?", const=SNAPSHOT_DIR, default=None,
+        help="Chroma DB 대신 메모리 맵 스냅샷에서 서빙 상태를 불러옵니다. (기본 경로: %(const)s)"
+    )
+    parser.add_argument(
+        "--ivfpq", nargs="?", const=IVFPQ_INDEX_DIR, default=None,
+        help="Chroma DB 대신 IVF-PQ 근사 색인으로 검색합니다. (기본 경로: %(const)s)"
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const=PROFILE_DIR, default=None,
+        help="질문별 단계 CPU 프로파일과 메모리 할당 보고서를 저장합니다. (기본 경로: %(const)s)"
+    )
+    parser.add_argument(
+        "--profile-mode", choices=PROFILE_MODES, default="sample",
+        help="sample: 스택 샘플링(접힌 스택 출력), deterministic: 단계별 cProfile (기본값: %(default)s)"
+    )
+    return parser.parse_args()
 
 def main():
     """
     메인 함수: 사용자 질의에 대한 응답을 제공합니다.
     """
+    args = parse_args()
+
     if not OPENAI_API_KEY:
         raise ValueError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 'OPENAI_API_KEY'를 설정하세요.")
 
-    vector_store = ChromaVectorStore(api_key=OPENAI_API_KEY)
+    if args.snapshot or args.ivfpq:
+        embedding_model = create_embedding_model(
+            EMBEDDING_BACKEND, api_key=OPENAI_API_KEY, local_model_path=LOCAL_EMBEDDING_MODEL_PATH
+        )
+
+    saved_documents = None
+    if args.snapshot:
+        vector_store = SnapshotVectorStore(args.snapshot, embedding_model)
+        if not len(vector_store.texts):
+            raise ValueError("스냅샷에 저장된 문서가 없습니다. 먼저 create_snapshot.py를 실행하세요.")
+    elif args.ivfpq:
+        vector_store = IVFPQVectorStore(args.ivfpq, embedding_model, nprobe=IVFPQ_NPROBE, rerank=IVFPQ_RERANK)
+        if not len(vector_store.texts):
+            raise ValueError("IVF-PQ 색인에 저장된 문서가 없습니다. 먼저 create_ivfpq_index.py를 실행하세요.")
+    else:
+        vector_store = create_vector_store(OPENAI_API_KEY)
+
+        saved_documents = vector_store.load_documents()
+        if not saved_documents:
+            raise ValueError("Chroma DB에 저장된 임베딩 데이터가 없습니다. 먼저 embed_and_store.py를 실행하세요.")
 
-    saved_documents = vector_store.load_documents()
-    if not saved_documents:
-        raise ValueError("Chroma DB에 저장된 임베딩 데이터가 없습니다. 먼저 embed_and_store.py를 실행하세요.")
+    retriever = VectorStoreRetriever(vector_store, k=RETRIEVAL_TOP_K, threshold=RETRIEVAL_THRESHOLD)
 
-    retriever = VectorStoreRetriever(vector_store, k=3, threshold=0.35)
+    # 스냅샷으로 서빙할 때는 캐시를 스냅샷에서 불러오므로 파일에서 읽거나 파일에 저장하지 않습니다.
+    # 저장하면 스냅샷의 캐시 항목이 원래 응답 캐시 파일을 덮어씁니다.
+    response_cache = SemanticCache(
+        threshold=RESPONSE_CACHE_THRESHOLD,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=RESPONSE_CACHE_TTL,
+        persist_path=None if args.snapshot else RESPONSE_CACHE_PATH,
+        embedding_model=embedding_model_version(vector_store.embedding_model)
+    )
 
-    qa_chain = RetrievalQAChain(retriever)
+    answer_bank = AnswerBank(
+        threshold=ANSWER_BANK_THRESHOLD,
+        persist_path=None if args.snapshot else ANSWER_BANK_PATH,
+        embedding_model=embedding_model_version(vector_store.embedding_model)
+    )
+
+    if args.snapshot:
+        vector_store.load_cache("response_cache", response_cache)
+        vector_store.load_cache("answer_bank", answer_bank)
+
+    domain_gate = None
+    if DOMAIN_GATE_ENABLED:
+        domain_gate = DomainGate.from_documents(
+            saved_documents if saved_documents is not None else vector_store.load_documents(),
+            score_threshold=DOMAIN_GATE_SCORE_THRESHOLD,
+            lexical_threshold=DOMAIN_GATE_LEXICAL_THRESHOLD,
+            classifier=load_domain_classifier(DOMAIN_CLASSIFIER_PATH, embedding_model_version(vector_store.embedding_model)),
+            classifier_threshold=DOMAIN_CLASSIFIER_THRESHOLD
+        )
+
+    session_cache = None
+    if SESSION_CACHE_ENABLED:
+        session_cache = SessionCandidateCache(
+            overfetch=SESSION_CACHE_OVERFETCH,
+            fallback_threshold=SESSION_CACHE_THRESHOLD,
+            category_threshold=SESSION_CATEGORY_THRESHOLD
+        )
+
+    profiler = None
+    if args.profile:
+        profiler = QueryProfiler(args.profile, mode=args.profile_mode, interval=PROFILE_SAMPLE_INTERVAL)
+        profiler.start()
+
+    qa_chain = RetrievalQAChain(
+        retriever,
+        response_cache=response_cache,
+        answer_bank=answer_bank,
+        profiler=profiler,
+        domain_gate=domain_gate,
+        session_cache=session_cache
+    )
 
     print("안녕하세요.\n\n궁금한 내용을 간단히 입력해 주시면 도움을 드릴게요!\n\n예) 스마트스토어센터 가입 절차, 상품등록 방법, 발송 처리 기한 등")
-    while True:
-        query = input("질문: ")
-        if query.lower() == 'exit':
-            break
-
-        answer = qa_chain.run(query)
-        print("\n답변:")
-        print(answer)
-        print("\n")
+    try:
+        while True:
+            query = input("질문: ")
+            if query.lower() == 'exit':
+                break
+
+            answer = qa_chain.run(query)
+            print("\n답변:")
+            print(answer)
+            print("\n")
+    finally:
+        response_cache.save()
+        close = getattr(vector_store, "close", None)
+        if close is not None:
+            close()
+        if profiler is not None:
+            profiler.stop()
+            print(f"프로파일링 결과를 저장했습니다: {args.profile}")
 
 if __name__ == "__main__":
     main()
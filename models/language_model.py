@@ -1,7 +1,7 @@
 from openai import OpenAI
 
 class OpenAILanguageModel:
-    def __init__(self, api_key, model="gpt-3.5-turbo", temperature=0.125, max_tokens=500):
+    def __init__(self, api_key, model="gpt-3.5-turbo", temperature=0.125, max_tokens=500, base_url=None, max_retries=2, raise_errors=False):
         """
         OpenAI 언어 모델 초기화.
 
@@ -10,12 +10,16 @@ class OpenAILanguageModel:
             model (str): 사용할 모델 이름 (기본값: "gpt-3.5-turbo")
             temperature (float): 생성 텍스트의 다양성 (기본값: 0.125)
             max_tokens (int): 생성할 최대 토큰 수 (기본값: 500)
+            base_url (str, optional): OpenAI 호환 API 서버 주소 (기본값: OpenAI API)
+            max_retries (int): 클라이언트의 자동 재시도 횟수 (기본값: 2)
+            raise_errors (bool): 요청 실패 시 안내 문구 대신 예외를 그대로 발생시킬지 여부 (기본값: False, 부하 측정용)
         """
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = OpenAI(api_key=self.api_key)
+        self.raise_errors = raise_errors
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url, max_retries=max_retries)
 
     def generate(self, messages):
         """
@@ -36,5 +40,7 @@ class OpenAILanguageModel:
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"오류가 발생했습니다: {e}")
             return "알 수 없는 오류가 발생했습니다."
@@ -0,0 +1,103 @@
+from string import Formatter
+
+from utils.tokenizer import DEFAULT_ENCODING, count_tokens, cached_count_tokens
+
+_FORMATTER = Formatter()
+
+def _split_sections(template):
+    """
+    템플릿을 마크다운 제목("#")이나 굵은 제목("**")으로 시작하는 줄 기준의 구역으로 나눕니다.
+    """
+    sections, current = [], []
+    for line in template.splitlines(keepends=True):
+        if current and line.startswith(("#", "**")):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+class CompiledPrompt:
+    def __init__(self, template, encoding_name=DEFAULT_ENCODING, stable_prefix=True):
+        """
+        프롬프트 템플릿을 고정 구역과 가변 구역으로 미리 나눠 둔 프롬프트 초기화.
+
+        값이 들어가지 않는 구역(역할, 규칙, 카테고리 목록 등)은 한 번만 이어 붙이고 토큰 수도 한 번만 계산합니다.
+        질문마다 달라지는 값은 렌더링할 때 이어 붙이고 그 값의 토큰 수만 계산합니다.
+        stable_prefix가 켜져 있으면 가변 구역을 원래 순서대로 프롬프트 끝으로 옮겨, 고정 구역이
+        질문과 관계없이 바이트 단위로 같은 접두어가 되도록 합니다 (API의 프롬프트 접두어 캐시 적중).
+
+        토큰 수는 구역별 토큰 수의 합이므로 프롬프트 전체를 한 번에 인코딩한 값과 경계에서 몇 토큰 다를 수 있습니다.
+
+        Parameters:
+            template (PromptTemplate 또는 str): 프롬프트 템플릿
+            encoding_name (str): 토큰 수 계산에 사용할 인코딩 이름 (기본값: 'cl100k_base')
+            stable_prefix (bool): 가변 구역을 끝으로 옮길지 여부 (기본값: True)
+        """
+        template = getattr(template, 'template', template)
+        self.encoding_name = encoding_name
+
+        static, pieces = [], []
+        for section in _split_sections(template):
+            parsed = list(_FORMATTER.parse(section))
+            if stable_prefix and all(field is None for _, field, _, _ in parsed):
+                # 가변 구역 뒤에 나온 고정 구역도 접두어로 옮깁니다.
+                static.append("".join(literal for literal, _, _, _ in parsed))
+                continue
+            for literal, field, spec, conversion in parsed:
+                if literal:
+                    pieces.append((literal, None, None, None))
+                if field is not None:
+                    pieces.append((None, field, spec, conversion))
+
+        self.static_prefix = "".join(static)
+        self.static_tokens = count_tokens(self.static_prefix, encoding_name) if self.static_prefix else 0
+        # 가변 구역 안의 제목 같은 고정 문자열도 컴파일 때 토큰 수를 계산해 둡니다.
+        self._pieces = tuple(
+            (literal, count_tokens(literal, encoding_name) if literal else 0, field, spec, conversion)
+            for literal, field, spec, conversion in pieces
+        )
+        self.fields = tuple(dict.fromkeys(field for _, _, field, _, _ in self._pieces if field is not None))
+
+    def build(self, **values):
+        """
+        값을 채운 프롬프트와 토큰 수를 함께 반환합니다.
+
+        Parameters:
+            **values: 템플릿 필드 값 (템플릿에 없는 값은 무시)
+
+        Returns:
+            tuple: (프롬프트 문자열, 토큰 수)
+        """
+        parts = [self.static_prefix]
+        tokens = self.static_tokens
+        for literal, literal_tokens, field, spec, conversion in self._pieces:
+            if field is None:
+                parts.append(literal)
+                tokens += literal_tokens
+                continue
+            value, _ = _FORMATTER.get_field(field, (), values)
+            text = _FORMATTER.format_field(_FORMATTER.convert_field(value, conversion), spec or "")
+            parts.append(text)
+            if text:
+                tokens += cached_count_tokens(text, self.encoding_name)
+        return "".join(parts), tokens
+
+    def format(self, **values):
+        """
+        값을 채운 프롬프트를 반환합니다. PromptTemplate.format과 같은 방식으로 사용할 수 있습니다.
+
+        Returns:
+            str: 프롬프트 문자열
+        """
+        return self.build(**values)[0]
+
+    def count_tokens(self, **values):
+        """
+        값을 채운 프롬프트의 토큰 수를 계산합니다. 고정 구역은 다시 인코딩하지 않습니다.
+
+        Returns:
+            int: 토큰 수
+        """
+        return self.build(**values)[1]
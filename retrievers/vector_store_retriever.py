@@ -1,5 +1,5 @@
 class VectorStoreRetriever:
-    def __init__(self, vector_store, k=4, threshold=0.35):
+    def __init__(self, vector_store, k=5, threshold=0.35):
         """
         초기화 메서드입니다.
 
@@ -12,6 +12,39 @@ class VectorStoreRetriever:
         self.k = k
         self.threshold = threshold
 
+    def embed_query(self, query):
+        """
+        질의의 임베딩을 생성합니다.
+
+        Parameters:
+            query (str): 임베딩할 질의.
+
+        Returns:
+            list: 임베딩 벡터 (실패 시 빈 리스트).
+        """
+        return self.vector_store.embed_query(query)
+
+    def retrieve_with_scores(self, query, n_results, query_embedding=None, categories=None, include_embeddings=False):
+        """
+        주어진 질의에 대한 유사한 문서를 점수, ID와 함께 검색합니다.
+
+        Parameters:
+            query (str): 검색할 질의.
+            n_results (int): 검색할 문서 수.
+            query_embedding (list, optional): 미리 계산된 질의 임베딩.
+            categories (list, optional): 검색할 카테고리 (카테고리별로 분할된 저장소에서만 사용).
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부.
+
+        Returns:
+            list: 검색 결과 딕셔너리(id, text, score, metadata) 리스트.
+        """
+        kwargs = {'categories': categories} if categories else {}
+        if include_embeddings:
+            kwargs['include_embeddings'] = True
+        return self.vector_store.similarity_search(
+            query, n_results, threshold=self.threshold, query_embedding=query_embedding, **kwargs
+        ) or []
+
     def retrieve(self, query, n_results):
         """
         주어진 질의에 대한 유사한 문서를 검색합니다.
@@ -22,7 +55,7 @@ class VectorStoreRetriever:
         Returns:
             list: 검색된 문서 리스트 또는 None.
         """
-        results = self.vector_store.similarity_search(query, n_results, threshold=self.threshold)
+        results = self.retrieve_with_scores(query, n_results)
         
         # 필터링된 결과 반환
         return [result['text'] for result in results] if results else None
@@ -1,169 +1,300 @@
 import chromadb
 from chromadb.utils import embedding_functions
-from embeddings.embedding import OpenAIEmbedding
+from embeddings.embedding import create_embedding_model, embedding_model_version
+from stores.ingestion_journal import IngestionJournal, EMBEDDED, COMMITTED, FAILED, default_worker_id
+from stores.scoring import similarity_from_distance
 import traceback
 import logging
-import os
-import json
+import multiprocessing
+import time
 from tqdm import tqdm
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 컬렉션 생성 후에는 바꿀 수 없는 HNSW 설정과 Chroma 기본값
+HNSW_BUILD_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100}
+
+def hnsw_metadata(hnsw_config):
+    """
+    HNSW 설정을 Chroma 컬렉션 메타데이터 형식("hnsw:<이름>")으로 변환합니다.
+
+    Parameters:
+        hnsw_config (dict): space, M, construction_ef, search_ef 중 지정할 값
+
+    Returns:
+        dict: 컬렉션 메타데이터
+    """
+    return {f"hnsw:{key}": value for key, value in (hnsw_config or {}).items() if value is not None}
+
+def _embed_claimed_batches(journal, embedding_model, documents, on_embedded=None):
+    """
+    저널에서 배치를 가져와 임베딩하고 커밋 전까지 디스크에 보관합니다. 가져갈 배치가 없을 때까지 반복합니다.
+
+    Parameters:
+        journal (IngestionJournal): 적재 저널
+        embedding_model: 임베딩 모델 객체 (get_embeddings 지원)
+        documents (list): 전체 입력 문서 리스트
+        on_embedded (callable, optional): 배치 임베딩 직후 배치 번호로 호출할 함수 (예: 즉시 커밋)
+    """
+    worker_id = default_worker_id()
+    while True:
+        claim = journal.claim(worker_id)
+        if claim is None:
+            break
+
+        batch, start, end = claim
+        try:
+            embeddings = embedding_model.get_embeddings(documents[start:end])
+            if len(embeddings) != end - start or not all(embeddings):
+                raise RuntimeError("임베딩 생성 실패")
+            if any(len(embedding) != len(embeddings[0]) for embedding in embeddings):
+                raise RuntimeError("임베딩 크기 불일치")
+            journal.write_spool(batch, embeddings)
+            journal.mark(batch, EMBEDDED, worker_id)
+        except Exception as e:
+            logging.error("배치 %d(문서 %d~%d) 임베딩 중 오류 발생: %s", batch, start, end - 1, e)
+            logging.debug("예외 정보: %s", traceback.format_exc())
+            journal.mark(batch, FAILED, worker_id, error=str(e))
+            continue
+
+        if on_embedded:
+            on_embedded(batch)
+
+def _embedding_worker(journal_path, batch_size, backend, api_key, model, local_model_path, documents, ids):
+    """
+    별도 프로세스에서 실행되는 임베딩 작업자입니다. Chroma DB에는 쓰지 않습니다.
+    """
+    embedding_model = create_embedding_model(backend, api_key=api_key, model=model, local_model_path=local_model_path)
+    journal = IngestionJournal(journal_path, batch_size=batch_size)
+    journal.begin(ids, documents, embedding_model_version(embedding_model), retry_failed=False)
+    _embed_claimed_batches(journal, embedding_model, documents)
+
 class ChromaVectorStore:
-    def __init__(self, api_key, persist_directory="chroma_db", embedding_model="text-embedding-3-small", batch_size=1, progress_file="progress.json"):
+    def __init__(self, api_key, persist_directory="chroma_db", embedding_model="text-embedding-3-small", batch_size=64, journal_file=None, collection_name=None, client=None, embedding_backend="openai", local_model_path="local_embedding.pkl", embedder=None, hnsw_config=None, commit_batches=8):
         """
         ChromaVectorStore 초기화.
 
         Parameters:
-            api_key (str): OpenAI API 키
+            api_key (str): OpenAI API 키 (local 백엔드에서는 필요 없음)
             persist_directory (str): 데이터 저장 경로
-            embedding_model (str): 임베딩 모델 이름
-            batch_size (int): 한 번에 처리할 문서 수 (기본값: 1)
-            progress_file (str): 진행 상태 파일 이름
+            embedding_model (str): OpenAI 임베딩 모델 이름
+            batch_size (int): 한 번에 임베딩할 문서 수 (기본값: 64)
+            journal_file (str, optional): 적재 저널 파일 이름 (기본값: "ingestion_journal_<컬렉션 이름>.jsonl")
+            collection_name (str, optional): 컬렉션 이름 (기본값: openai 백엔드는 "faq_collection", local 백엔드는 "faq_collection_local")
+            client (chromadb.ClientAPI, optional): 공유할 Chroma 클라이언트, 없으면 새로 생성
+            embedding_backend (str): 임베딩 백엔드, "openai" 또는 "local" (기본값: "openai")
+            local_model_path (str): 학습된 로컬 임베딩 모델 파일 경로
+            embedder (optional): 미리 생성한 임베딩 모델 객체, 주어지면 백엔드 설정 대신 사용
+            hnsw_config (dict, optional): 컬렉션의 HNSW 설정 (space, M, construction_ef, search_ef),
+                space, M, construction_ef는 컬렉션을 새로 만들 때만 적용됨
+            commit_batches (int): 임베딩이 끝난 배치를 이 수만큼 모아 Chroma DB에 한 번에 반영 (기본값: 8)
         """
         self.api_key = api_key
-        self.embedding_model = OpenAIEmbedding(api_key, model=embedding_model)
-        self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=api_key,
-            model_name=embedding_model
+        self.embedding_backend = embedding_backend
+        self.local_model_path = local_model_path
+        self.embedding_model = embedder or create_embedding_model(
+            embedding_backend, api_key=api_key, model=embedding_model, local_model_path=local_model_path
         )
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_collection(name="faq_collection", embedding_function=self.embedding_function)
-        self.batch_size = batch_size
-        self.progress_file = progress_file
-        self.load_progress()
-        logging.info("ChromaVectorStore가 초기화되었습니다. 임베딩 모델: %s", embedding_model)
-
-    def load_progress(self):
-        """
-        이전 진행 상태를 불러옵니다.
-        """
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, "r") as file:
-                self.progress = json.load(file)
-            logging.info("진행 상태를 불러왔습니다. 마지막 인덱스: %d", self.progress.get("last_index", 0))
+        if embedding_backend == "openai":
+            self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
+                api_key=api_key,
+                model_name=embedding_model
+            )
         else:
-            self.progress = {"last_index": 0}
-            logging.info("새로운 진행 상태를 시작합니다.")
+            # 로컬 임베딩 모델은 Chroma의 EmbeddingFunction 규약을 따르므로 그대로 사용합니다.
+            self.embedding_function = self.embedding_model
+        self.client = client or chromadb.PersistentClient(path=persist_directory)
+        self.collection_name = collection_name or ("faq_collection" if embedding_backend == "openai" else f"faq_collection_{embedding_backend}")
+        self.hnsw_config = dict(hnsw_config or {})
+        self.collection = self._open_collection()
+        self.batch_size = batch_size
+        self.commit_batches = max(1, commit_batches)
+        self.journal_file = journal_file or f"ingestion_journal_{self.collection_name}.jsonl"
+        logging.info("ChromaVectorStore가 초기화되었습니다. 임베딩 모델: %s, 거리 공간: %s", self.embedding_model.model, self.space)
 
-    def save_progress(self, last_index):
+    def _open_collection(self):
         """
-        진행 상태를 저장합니다.
+        HNSW 설정으로 컬렉션을 열거나 만듭니다. 기존 컬렉션의 생성 시 설정이 다르면 경고하고,
+        검색 시 설정(search_ef)은 기존 컬렉션에도 반영합니다.
 
-        Parameters:
-            last_index (int): 마지막으로 저장된 인덱스
+        Returns:
+            chromadb.Collection: 컬렉션
         """
-        self.progress["last_index"] = last_index
-        with open(self.progress_file, "w") as file:
-            json.dump(self.progress, file)
-        logging.info("진행 상태를 저장했습니다. 마지막 인덱스: %d", last_index)
-
-    def add_documents(self, documents, metadatas=None, ids=None):
+        requested = hnsw_metadata(self.hnsw_config)
+        # 기존 컬렉션에 메타데이터를 넘기면 덮어쓰게 되므로 새로 만들 때만 HNSW 설정을 넘깁니다.
+        try:
+            collection = self.client.get_collection(name=self.collection_name, embedding_function=self.embedding_function)
+        except Exception:
+            try:
+                collection = self.client.create_collection(
+                    name=self.collection_name,
+                    embedding_function=self.embedding_function,
+                    metadata=requested or None
+                )
+            except Exception:
+                # 다른 프로세스가 먼저 만든 경우
+                collection = self.client.get_or_create_collection(name=self.collection_name, embedding_function=self.embedding_function)
+        current = collection.metadata or {}
+        for name, default in HNSW_BUILD_DEFAULTS.items():
+            if name in requested and current.get(name, default) != requested[name]:
+                logging.warning(
+                    "기존 컬렉션 '%s'의 %s(%s)는 바꿀 수 없어 요청한 값(%s)이 적용되지 않았습니다. 적용하려면 컬렉션을 다시 만드세요.",
+                    self.collection_name, name, current.get(name, default), requested[name]
+                )
+
+        # 점수 변환에는 실제 컬렉션의 거리 공간을 사용합니다.
+        self.space = current.get("hnsw:space", "l2")
+
+        search_ef = requested.get("hnsw:search_ef")
+        if search_ef is not None and current.get("hnsw:search_ef") != search_ef:
+            # Chroma는 modify 메타데이터에 hnsw:space가 있으면 거리 공간 변경으로 보고 거부하므로 빼고 넘깁니다.
+            metadata = {name: value for name, value in current.items() if name != "hnsw:space"}
+            metadata["hnsw:search_ef"] = search_ef
+            try:
+                collection.modify(metadata=metadata)
+            except Exception as e:
+                logging.warning("컬렉션 '%s'의 hnsw:search_ef를 바꾸지 못했습니다: %s", self.collection_name, e)
+        return collection
+
+    def add_documents(self, documents, metadatas=None, ids=None, workers=1):
         """
         문서를 벡터 스토어에 추가합니다.
 
+        진행 상태는 배치 단위로 적재 저널에 기록되므로, 중단 후 다시 실행하면 커밋되지 않은 배치부터 이어서 처리하고
+        실패한 배치는 건너뛰지 않고 다시 시도합니다. workers가 2 이상이면 여러 프로세스가 서로 겹치지 않는 배치를
+        나누어 임베딩하고, Chroma DB 쓰기는 이 프로세스에서만 수행합니다.
+
         Parameters:
             documents (list): 문서 리스트
             metadatas (list, optional): 각 문서의 메타데이터
             ids (list, optional): 각 문서의 고유 ID
+            workers (int): 임베딩 작업자 프로세스 수 (기본값: 1)
+
+        Returns:
+            dict: 상태별 배치 수
         """
         if not documents or not all(isinstance(doc, str) for doc in documents):
             logging.error("유효한 문서 리스트를 제공해야 합니다.")
-            return
-
-        try:
-            start_index = self.progress.get("last_index", 0)
-            documents = documents[start_index:]
-            ids = ids[start_index:] if ids else None
-            metadatas = metadatas[start_index:] if metadatas else None
-
-            existing_ids = set(metadata['id'] for metadata in self.collection.get().get('metadatas', []) if 'id' in metadata)
-
-            new_documents, new_ids, new_metadatas = [], [], []
-            for idx, doc in enumerate(documents):
-                doc_id = ids[idx] if ids else str(start_index + idx)
-                if doc_id not in existing_ids:
-                    new_documents.append(doc)
-                    new_ids.append(doc_id)
-                    if metadatas:
-                        new_metadatas.append(metadatas[idx])
-
-                if len(new_documents) >= self.batch_size:
-                    self._try_add_documents(new_documents, new_ids, new_metadatas, start_index + idx)
-                    new_documents, new_ids, new_metadatas = [], [], []
-
-            if new_documents:
-                self._try_add_documents(new_documents, new_ids, new_metadatas, start_index + len(new_documents) - 1)
-            else:
-                logging.info("추가할 새 문서가 없습니다.")
-        except Exception as e:
-            logging.error("문서 추가 중 오류가 발생했습니다: %s", e)
-            logging.debug("예외 정보: %s", traceback.format_exc())
-
-    def _try_add_documents(self, documents, ids, metadatas, last_index):
-        """
-        문서 리스트를 추가하며, 오류 발생 시 다음 배치로 넘어갑니다.
+            return {}
+
+        ids = ids or [str(i) for i in range(len(documents))]
+        journal = IngestionJournal(self.journal_file, batch_size=self.batch_size)
+        plan = journal.begin(ids, documents, embedding_model_version(self.embedding_model))
+        logging.info("적재를 시작합니다. 문서 %d개, 배치 %d개, 작업자 %d개", plan['total'], plan['batches'], workers)
+
+        def commit(min_batches=1):
+            self._commit_embedded(journal, documents, metadatas, ids, min_batches)
+
+        # 이전 실행에서 임베딩까지 끝난 배치를 먼저 커밋합니다.
+        commit()
+
+        if workers > 1:
+            processes = [
+                multiprocessing.Process(
+                    target=_embedding_worker,
+                    args=(
+                        journal.path, self.batch_size, self.embedding_backend, self.api_key,
+                        self.embedding_model.model, self.local_model_path, documents, ids
+                    )
+                )
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            while any(process.is_alive() for process in processes):
+                commit()
+                time.sleep(1)
+            for process in processes:
+                process.join()
+        else:
+            _embed_claimed_batches(
+                journal, self.embedding_model, documents, on_embedded=lambda batch: commit(self.commit_batches)
+            )
+        commit()
 
-        Parameters:
-            documents (list): 문서 리스트
-            ids (list): 문서 ID 리스트
-            metadatas (list, optional): 메타데이터 리스트
-            last_index (int): 마지막 저장된 인덱스
-        """
-        try:
-            self._add_documents(documents, ids, metadatas)
-            self.save_progress(last_index)
-        except Exception as e:
-            logging.error("배치 추가 중 오류 발생. 다음 배치로 진행합니다: %s", e)
-            logging.debug("예외 정보: %s", traceback.format_exc())
+        summary = journal.summary()
+        journal.compact()
+        if summary[FAILED]:
+            logging.warning("실패한 배치 %d개가 남아 있습니다. 다시 실행하면 재시도합니다.", summary[FAILED])
+        logging.info("적재 결과: %s", summary)
+        return summary
 
-    def _add_documents(self, documents, ids, metadatas):
+    def _commit_embedded(self, journal, documents, metadatas, ids, min_batches=1):
         """
-        문서 리스트를 실제로 추가합니다.
+        임베딩이 끝난 배치를 Chroma DB에 반영합니다. upsert를 사용하므로 같은 배치를 다시 커밋해도 안전합니다.
+        여러 배치를 commit_batches개씩 묶어 upsert와 저널 기록을 한 번에 수행합니다.
 
         Parameters:
-            documents (list): 문서 리스트
-            ids (list): 문서 ID 리스트
-            metadatas (list, optional): 메타데이터 리스트
+            journal (IngestionJournal): 적재 저널
+            documents (list): 전체 문서 리스트
+            metadatas (list, optional): 전체 메타데이터 리스트
+            ids (list): 전체 문서 ID 리스트
+            min_batches (int): 임베딩이 끝난 배치가 이 수보다 적으면 반영하지 않음 (기본값: 1)
         """
-        valid_documents = []
-        valid_ids = []
-        valid_metadatas = []
-        embeddings = []
-
-        for idx, doc in enumerate(tqdm(documents, desc="임베딩 생성 중")):
-            embedding = self.embedding_model.get_embedding(doc)
+        worker_id = default_worker_id()
+        embedded = journal.embedded_batches()
+        if len(embedded) < min_batches:
+            return
 
-            if not embedding or not isinstance(embedding, list):
-                logging.warning("문서 %d의 임베딩 생성 실패. 텍스트: %s", idx, doc)
+        groups = [embedded[start:start + self.commit_batches] for start in range(0, len(embedded), self.commit_batches)]
+        for group in tqdm(groups, desc="Chroma DB 반영 중", disable=len(groups) < 2):
+            ready, batch_ids, batch_documents, batch_metadatas, batch_embeddings = [], [], [], [], []
+            for batch in group:
+                embeddings = journal.read_spool(batch)
+                if embeddings is None:
+                    journal.mark(batch, FAILED, worker_id, error="임베딩 보관 파일이 없습니다.")
+                    continue
+                start, end = journal.batch_range(batch)
+                ready.append(batch)
+                batch_ids.extend(ids[start:end])
+                batch_documents.extend(documents[start:end])
+                if metadatas:
+                    batch_metadatas.extend(metadatas[start:end])
+                batch_embeddings.extend(embeddings)
+            if not ready:
                 continue
 
-            if embeddings and len(embedding) != len(embeddings[0]):
-                logging.warning("문서 %d의 임베딩 크기 불일치. 텍스트: %s", idx, doc)
+            try:
+                self.collection.upsert(
+                    documents=batch_documents,
+                    ids=batch_ids,
+                    metadatas=batch_metadatas or None,
+                    embeddings=batch_embeddings
+                )
+            except Exception as e:
+                logging.error("Chroma DB에 배치 %s 반영 중 오류 발생: %s", ready, e)
+                logging.debug("예외 정보: %s", traceback.format_exc())
+                journal.mark_many(ready, FAILED, worker_id, error=str(e))
                 continue
 
-            embeddings.append(embedding)
-            valid_documents.append(doc)
-            valid_ids.append(ids[idx])
-            if metadatas:
-                valid_metadatas.append(metadatas[idx])
+            journal.mark_many(ready, COMMITTED, worker_id)
+            for batch in ready:
+                journal.remove_spool(batch)
+            logging.info("배치 %d개의 문서 %d개가 추가되었습니다.", len(ready), len(batch_ids))
 
-        if not embeddings:
-            logging.error("유효한 임베딩이 없습니다. 문서 추가를 중단합니다.")
-            return
+    def prune(self, keep_ids, metadatas=None):
+        """
+        주어진 ID 외에 저장된 문서를 삭제합니다. 입력 문서 수가 줄어들었을 때 남은 이전 문서를 정리합니다.
+
+        Parameters:
+            keep_ids (iterable): 유지할 문서 ID
+            metadatas (list, optional): 사용하지 않음 (PartitionedVectorStore.prune과 같은 규약)
 
+        Returns:
+            int: 삭제된 문서 수
+        """
+        keep_ids = set(keep_ids)
         try:
-            self.collection.add(
-                documents=valid_documents,
-                ids=valid_ids,
-                metadatas=valid_metadatas,
-                embeddings=embeddings
-            )
-            logging.info("%d개의 문서가 추가되었습니다.", len(valid_documents))
+            stale_ids = [doc_id for doc_id in self.collection.get(include=[])['ids'] if doc_id not in keep_ids]
+            if stale_ids:
+                self.collection.delete(ids=stale_ids)
+                logging.info("이전 문서 %d개를 삭제했습니다.", len(stale_ids))
+            return len(stale_ids)
         except Exception as e:
-            logging.error("Chroma DB에 문서 추가 중 오류 발생: %s", e)
+            logging.error("이전 문서 삭제 중 오류 발생: %s", e)
             logging.debug("예외 정보: %s", traceback.format_exc())
+            return 0
 
     def load_documents(self):
         """
@@ -173,7 +304,7 @@ class ChromaVectorStore:
             list: 저장된 문서 리스트
         """
         try:
-            self.collection = self.client.get_collection(name="faq_collection", embedding_function=self.embedding_function)
+            self.collection = self._open_collection()
             results = self.collection.get(include=["documents", "metadatas"])
             documents = results.get('documents', [])
             if documents:
@@ -186,7 +317,46 @@ class ChromaVectorStore:
             logging.debug("예외 정보: %s", traceback.format_exc())
             return []
 
-    def similarity_search(self, query, n_results=3, threshold=0.42):
+    def load_records(self, include_embeddings=False):
+        """
+        저장된 문서를 ID, 메타데이터와 함께 불러옵니다.
+
+        Parameters:
+            include_embeddings (bool): 임베딩 벡터 포함 여부 (기본값: False)
+
+        Returns:
+            list: 문서 딕셔너리(id, text, metadata[, embedding]) 리스트
+        """
+        try:
+            include = ["documents", "metadatas", "embeddings"] if include_embeddings else ["documents", "metadatas"]
+            results = self.collection.get(include=include)
+            metadatas = results.get('metadatas') or [None] * len(results['ids'])
+            records = [
+                {'id': doc_id, 'text': doc, 'metadata': metadata or {}}
+                for doc_id, doc, metadata in zip(results['ids'], results['documents'], metadatas)
+            ]
+            if include_embeddings:
+                for record, embedding in zip(records, results['embeddings']):
+                    record['embedding'] = embedding
+            return records
+        except Exception as e:
+            logging.error("문서 불러오기 중 오류 발생: %s", e)
+            logging.debug("예외 정보: %s", traceback.format_exc())
+            return []
+
+    def embed_query(self, query):
+        """
+        질의의 임베딩을 생성합니다.
+
+        Parameters:
+            query (str): 검색 질의
+
+        Returns:
+            list: 임베딩 벡터 (실패 시 빈 리스트)
+        """
+        return self.embedding_model.get_embedding(query)
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, include_embeddings=False):
         """
         질의에 대한 유사한 문서를 검색합니다.
 
@@ -194,24 +364,35 @@ class ChromaVectorStore:
             query (str): 검색 질의
             n_results (int): 반환할 결과 수
             threshold (float): 유사도 임계값
+            query_embedding (list, optional): 미리 계산된 질의 임베딩, 주어지면 임베딩을 다시 생성하지 않습니다.
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부 (기본값: False)
 
         Returns:
-            list: 유사도 점수가 임계값을 넘는 문서 리스트
+            list: 유사도 점수가 임계값을 넘는 문서 리스트 (id, text, score, metadata)
         """
         try:
-            results = self.collection.query(query_texts=[query], n_results=n_results)
+            include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+            if query_embedding is not None and len(query_embedding) > 0:
+                results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results, include=include)
+            else:
+                results = self.collection.query(query_texts=[query], n_results=n_results, include=include)
             logging.debug("원시 쿼리 결과: %s", results)
 
             filtered_results = []
             if results and 'documents' in results and results['documents'] and 'distances' in results and results['distances']:
+                ids = results['ids'][0]
+                metadatas = (results.get('metadatas') or [[]])[0] or [None] * len(ids)
+                embeddings = results.get('embeddings') if include_embeddings else None
                 for i, doc in enumerate(results['documents'][0]):
                     distance = results['distances'][0][i]
-                    similarity_score = 1 / (1 + distance)
+                    similarity_score = similarity_from_distance(distance, self.space)
 
                     logging.info("문서: %s, 유사도: %.4f", doc[:100], similarity_score)
 
                     if similarity_score >= threshold:
-                        doc_with_score = {'text': doc, 'score': similarity_score}
+                        doc_with_score = {'id': ids[i], 'text': doc, 'score': similarity_score, 'metadata': metadatas[i]}
+                        if embeddings is not None:
+                            doc_with_score['embedding'] = [float(value) for value in embeddings[0][i]]
                         filtered_results.append(doc_with_score)
 
                 logging.info("임계값 %.2f 이상인 문서 %d개 발견.", threshold, len(filtered_results))
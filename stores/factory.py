@@ -0,0 +1,36 @@
+from config.settings import (
+    PARTITION_BY_CATEGORY,
+    PARTITION_FALLBACK_SCORE,
+    PARTITION_MIN_KEYWORD_MATCHES,
+    EMBEDDING_BACKEND,
+    LOCAL_EMBEDDING_MODEL_PATH,
+    EMBEDDING_BATCH_SIZE,
+    CHROMA_HNSW_CONFIG
+)
+from stores.chroma_vector_store import ChromaVectorStore
+from stores.partitioned_vector_store import PartitionedVectorStore
+
+def create_vector_store(api_key):
+    """
+    설정(카테고리 분할 여부와 샤드 예측 기준, 임베딩 백엔드, 적재 배치 크기, HNSW 설정)에 맞는 벡터 스토어를 생성합니다.
+
+    Parameters:
+        api_key (str): OpenAI API 키 (local 임베딩 백엔드에서는 없어도 됨)
+
+    Returns:
+        ChromaVectorStore 또는 PartitionedVectorStore
+    """
+    options = dict(
+        api_key=api_key,
+        embedding_backend=EMBEDDING_BACKEND,
+        local_model_path=LOCAL_EMBEDDING_MODEL_PATH,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        hnsw_config=CHROMA_HNSW_CONFIG
+    )
+    if not PARTITION_BY_CATEGORY:
+        return ChromaVectorStore(**options)
+    return PartitionedVectorStore(
+        fallback_score=PARTITION_FALLBACK_SCORE,
+        min_keyword_matches=PARTITION_MIN_KEYWORD_MATCHES,
+        **options
+    )
@@ -0,0 +1,388 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+
+from utils.hashing import content_hash
+
+PENDING = "pending"
+EMBEDDED = "embedded"
+COMMITTED = "committed"
+FAILED = "failed"
+
+def default_worker_id():
+    """
+    현재 프로세스를 식별하는 작업자 ID를 반환합니다.
+
+    Returns:
+        str: "호스트이름:PID" 형식의 작업자 ID
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _is_dead_local_worker(worker_id):
+    """
+    같은 호스트에서 이미 종료된 프로세스의 작업자 ID인지 확인합니다.
+    """
+    host, _, pid = (worker_id or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+def _atomic_write(path, text):
+    """
+    임시 파일에 기록하고 fsync한 뒤 교체하여 파일을 원자적으로 씁니다.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+class IngestionJournal:
+    def __init__(self, path, batch_size=64, lease_seconds=600, max_attempts=3):
+        """
+        배치별 적재 상태를 기록하는 추가 전용(append-only) 적재 저널 초기화.
+
+        각 배치의 상태(pending, embedded, committed, failed)를 한 줄씩 추가 기록하고,
+        파일 잠금으로 여러 작업자 프로세스가 서로 겹치지 않는 배치를 가져가도록 합니다.
+        프로세스가 중단되어도 마지막으로 기록된 상태에서 이어서 처리할 수 있습니다.
+
+        Parameters:
+            path (str): 저널 파일 경로 (JSON Lines)
+            batch_size (int): 배치당 문서 수 (기본값: 64)
+            lease_seconds (int): 배치를 가져간 작업자가 응답이 없을 때 다시 할당하기까지의 시간(초) (기본값: 600)
+            max_attempts (int): 실패한 배치의 최대 시도 횟수 (기본값: 3)
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock_path = path + ".lock"
+        self.spool_directory = path + ".spool"
+        self.plan = None
+        self._reset_replay()
+
+    @contextmanager
+    def locked(self):
+        """
+        저널 파일에 대한 프로세스 간 배타적 잠금을 획득합니다.
+        """
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, *records):
+        """
+        기록을 저널에 추가하고 디스크에 반영합니다. 여러 기록은 한 번의 fsync로 반영합니다.
+        잠금을 획득한 상태에서 호출해야 합니다.
+        """
+        now = time.time()
+        with open(self.path, "a", encoding="utf-8") as file:
+            for record in records:
+                record['time'] = now
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _replay(self):
+        """
+        저널을 읽어 실행 계획과 배치별 최신 상태를 복원합니다. 잠금을 획득한 상태에서 호출해야 합니다.
+        이전에 읽은 위치 이후에 추가된 줄만 읽으며, 파일이 교체되었으면 처음부터 다시 읽습니다.
+        중단으로 잘린 마지막 줄은 잘라냅니다.
+
+        Returns:
+            tuple: (실행 계획 딕셔너리 또는 None, 배치 번호별 상태 딕셔너리)
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset_replay()
+            return None, self._batches
+
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset_replay()
+            self._inode = stat.st_ino
+
+        with open(self.path, "rb+") as file:
+            file.seek(self._offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # 잠금을 가진 상태이므로 끝나지 않은 줄은 중단된 기록입니다. 다음 기록이 이어 붙지 않도록 잘라냅니다.
+                    logging.warning("저널 끝의 중단된 기록을 잘라냅니다: %s", line[:100])
+                    file.truncate(self._offset)
+                    break
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning("저널의 손상된 기록을 건너뜁니다: %s", line[:100])
+                    continue
+                if record.get('type') == 'plan':
+                    self._reset_index()
+                    self._plan = record
+                    continue
+                self._index(record)
+        return self._plan, self._batches
+
+    def _index(self, record):
+        """
+        배치의 최신 상태를 반영하고, 가져갈 후보를 찾을 때 전체 배치를 훑지 않도록 상태별 배치 번호를 따로 모아 둡니다.
+        """
+        batch = record['batch']
+        previous = self._batches.get(batch, {})
+        record.setdefault('attempts', previous.get('attempts', 0))
+        self._batches[batch] = record
+        for status, members in self._by_status.items():
+            if status == record['status']:
+                members.add(batch)
+            else:
+                members.discard(batch)
+
+    def _reset_index(self):
+        self._plan, self._batches = None, {}
+        # 처리 중, 임베딩 완료, 실패 상태의 배치 번호. 아직 기록이 없는 배치는 _cursor부터 차례로 찾습니다.
+        self._by_status = {PENDING: set(), EMBEDDED: set(), FAILED: set()}
+        self._cursor = 0
+
+    def _reset_replay(self):
+        self._reset_index()
+        self._offset, self._inode = 0, None
+
+    def begin(self, ids, documents=None, model=None, retry_failed=True):
+        """
+        입력으로 실행 계획을 기록합니다. 같은 입력으로 다시 실행하면 기존 진행 상태를 이어서 사용하고,
+        입력이나 임베딩 모델이 바뀌었으면 기존 저널을 보관한 뒤 새로 시작합니다.
+
+        Parameters:
+            ids (list): 입력 문서 ID 리스트
+            documents (list, optional): 입력 문서 리스트 (내용이 바뀐 경우를 구분하기 위해 사용)
+            model (str, optional): 임베딩 모델 식별자
+            retry_failed (bool): 실패한 배치의 시도 횟수를 초기화하여 이번 실행에서 다시 시도할지 여부 (기본값: True)
+                같은 실행에 합류하는 작업자 프로세스는 False로 호출합니다.
+
+        Returns:
+            dict: 실행 계획 (total, batch_size, batches, fingerprint)
+        """
+        parts = [str(model or "")]
+        parts.extend(ids)
+        if documents is not None:
+            parts.extend(content_hash(doc) for doc in documents)
+        fingerprint = content_hash("\n".join(parts))
+        with self.locked():
+            plan, batches = self._replay()
+            if plan and plan['fingerprint'] == fingerprint and plan['batch_size'] == self.batch_size:
+                self.plan = plan
+                logging.info("기존 적재 저널을 이어서 사용합니다: %s", self.path)
+                if retry_failed:
+                    # 최대 시도 횟수는 실행마다 적용되므로 이전 실행에서 실패한 배치도 다시 가져갈 수 있게 합니다.
+                    failed = sorted(batch for batch in self._by_status[FAILED] if batches[batch]['attempts'])
+                    if failed:
+                        self._append(*(
+                            {'batch': batch, 'status': FAILED, 'worker': default_worker_id(),
+                             'attempts': 0, 'error': batches[batch].get('error')}
+                            for batch in failed
+                        ))
+                        logging.info("이전 실행에서 실패한 배치 %d개를 다시 시도합니다.", len(failed))
+                return plan
+
+            if plan:
+                archive_path = f"{self.path}.{int(time.time())}.bak"
+                os.replace(self.path, archive_path)
+                shutil.rmtree(self.spool_directory, ignore_errors=True)
+                logging.info("입력이 바뀌어 기존 저널을 보관했습니다: %s", archive_path)
+
+            total = len(ids)
+            self.plan = {
+                'type': 'plan',
+                'total': total,
+                'batch_size': self.batch_size,
+                'batches': (total + self.batch_size - 1) // self.batch_size,
+                'fingerprint': fingerprint
+            }
+            self._append(dict(self.plan))
+        return self.plan
+
+    def batch_range(self, batch):
+        """
+        배치 번호에 해당하는 입력 범위를 반환합니다.
+
+        Parameters:
+            batch (int): 배치 번호
+
+        Returns:
+            tuple: (시작 인덱스, 끝 인덱스)
+        """
+        start = batch * self.batch_size
+        return start, min(start + self.batch_size, self.plan['total'])
+
+    def _is_claimable(self, state, now):
+        """
+        진행 중인 배치가 작업자 중단으로 다시 할당 가능한지 확인합니다.
+        """
+        return now - state['time'] > self.lease_seconds or _is_dead_local_worker(state.get('worker'))
+
+    def claim(self, worker_id):
+        """
+        처리할 배치 하나를 가져갑니다. 아직 처리되지 않은 배치, 중단된 작업자의 배치,
+        재시도 가능한 실패 배치 순으로 선택합니다. 전체 배치를 훑지 않고 상태별 배치 번호만 확인합니다.
+
+        Parameters:
+            worker_id (str): 작업자 ID
+
+        Returns:
+            tuple: (배치 번호, 시작 인덱스, 끝 인덱스) 또는 처리할 배치가 없으면 None
+        """
+        with self.locked():
+            _, batches = self._replay()
+            # 기록이 생긴 배치는 다시 기록 없는 상태로 돌아가지 않으므로 커서는 앞으로만 움직입니다.
+            while self._cursor in batches:
+                self._cursor += 1
+            if self._cursor < self.plan['batches']:
+                batch = self._cursor
+            else:
+                now = time.time()
+                stale = [batch for batch in self._by_status[PENDING] if self._is_claimable(batches[batch], now)]
+                retry = [batch for batch in self._by_status[FAILED] if batches[batch]['attempts'] < self.max_attempts]
+                batch = min(stale or retry, default=None)
+                if batch is None:
+                    return None
+
+            self._append({'batch': batch, 'status': PENDING, 'worker': worker_id})
+        start, end = self.batch_range(batch)
+        return batch, start, end
+
+    def mark(self, batch, status, worker_id, error=None):
+        """
+        배치의 상태를 기록합니다.
+
+        Parameters:
+            batch (int): 배치 번호
+            status (str): 새 상태 (embedded, committed, failed)
+            worker_id (str): 작업자 ID
+            error (str, optional): 실패 사유
+        """
+        self.mark_many([batch], status, worker_id, error)
+
+    def mark_many(self, batches, status, worker_id, error=None):
+        """
+        여러 배치의 상태를 한 번의 쓰기로 기록합니다.
+
+        Parameters:
+            batches (list): 배치 번호 리스트
+            status (str): 새 상태 (embedded, committed, failed)
+            worker_id (str): 작업자 ID
+            error (str, optional): 실패 사유
+        """
+        records = []
+        for batch in batches:
+            record = {'batch': batch, 'status': status, 'worker': worker_id}
+            if error:
+                record['error'] = error
+            records.append(record)
+        if not records:
+            return
+        with self.locked():
+            _, states = self._replay()
+            if status == FAILED:
+                for record in records:
+                    record['attempts'] = states.get(record['batch'], {}).get('attempts', 0) + 1
+            self._append(*records)
+
+    def embedded_batches(self):
+        """
+        임베딩까지 끝나고 아직 커밋되지 않은 배치 번호를 반환합니다.
+
+        Returns:
+            list: 정렬된 배치 번호 리스트
+        """
+        with self.locked():
+            self._replay()
+            return sorted(self._by_status[EMBEDDED])
+
+    def states(self):
+        """
+        배치별 최신 상태를 반환합니다.
+
+        Returns:
+            dict: 배치 번호별 상태 딕셔너리
+        """
+        with self.locked():
+            _, batches = self._replay()
+            return dict(batches)
+
+    def summary(self):
+        """
+        상태별 배치 수를 반환합니다.
+
+        Returns:
+            dict: 상태별 배치 수
+        """
+        batches = self.states()
+        counts = {PENDING: 0, EMBEDDED: 0, COMMITTED: 0, FAILED: 0}
+        for batch in range(self.plan['batches']):
+            state = batches.get(batch)
+            counts[state['status'] if state else PENDING] += 1
+        return counts
+
+    def spool_path(self, batch):
+        return os.path.join(self.spool_directory, f"{batch}.json")
+
+    def write_spool(self, batch, embeddings):
+        """
+        임베딩된 배치를 커밋 전까지 디스크에 보관합니다.
+
+        Parameters:
+            batch (int): 배치 번호
+            embeddings (list): 배치의 임베딩 리스트
+        """
+        os.makedirs(self.spool_directory, exist_ok=True)
+        _atomic_write(self.spool_path(batch), json.dumps(embeddings))
+
+    def read_spool(self, batch):
+        """
+        보관된 배치 임베딩을 읽습니다.
+
+        Parameters:
+            batch (int): 배치 번호
+
+        Returns:
+            list: 임베딩 리스트 또는 없으면 None
+        """
+        try:
+            with open(self.spool_path(batch), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def remove_spool(self, batch):
+        try:
+            os.remove(self.spool_path(batch))
+        except FileNotFoundError:
+            pass
+
+    def compact(self):
+        """
+        배치별 최신 상태만 남기도록 저널을 원자적으로 다시 씁니다.
+        """
+        with self.locked():
+            plan, batches = self._replay()
+            if not plan:
+                return
+            lines = [json.dumps(plan, ensure_ascii=False)]
+            lines.extend(json.dumps(batches[batch], ensure_ascii=False) for batch in sorted(batches))
+            _atomic_write(self.path, "\n".join(lines) + "\n")
+            self._reset_replay()
@@ -0,0 +1,479 @@
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from embeddings.embedding import embedding_model_version
+from stores.scoring import similarity_from_distance
+from stores.snapshot import MappedStrings, _write_blob, _write_json
+
+IVFPQ_FORMAT_VERSION = 1
+
+def _squared_distances(vectors, centroids, centroid_norms=None):
+    """
+    각 벡터와 모든 중심점 사이의 제곱 L2 거리에서 벡터 노름 항을 뺀 값을 계산합니다.
+    가장 가까운 중심점을 고르는 데는 벡터 노름이 필요 없습니다.
+    """
+    if centroid_norms is None:
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    return centroid_norms[None, :] - 2 * (vectors @ centroids.T)
+
+def assign(vectors, centroids, chunk_size=16384):
+    """
+    각 벡터를 가장 가까운 중심점에 할당합니다. 메모리를 제한하기 위해 나누어 계산합니다.
+
+    Parameters:
+        vectors (numpy.ndarray): (n, d) 벡터 행렬
+        centroids (numpy.ndarray): (k, d) 중심점 행렬
+        chunk_size (int): 한 번에 계산할 벡터 수
+
+    Returns:
+        numpy.ndarray: (n,) 중심점 번호
+    """
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], chunk_size):
+        block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = _squared_distances(block, centroids, centroid_norms).argmin(axis=1)
+    return labels
+
+def kmeans(vectors, k, iterations=20, seed=0):
+    """
+    Lloyd 알고리즘으로 k-means 중심점을 학습합니다. 빈 군집은 임의의 벡터로 다시 초기화합니다.
+
+    Parameters:
+        vectors (numpy.ndarray): (n, d) 학습 벡터
+        k (int): 군집 수
+        iterations (int): 반복 횟수 (기본값: 20)
+        seed (int): 난수 시드 (기본값: 0)
+
+    Returns:
+        numpy.ndarray: (k, d) 중심점 행렬
+    """
+    generator = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, vectors.shape[0])
+    centroids = vectors[generator.choice(vectors.shape[0], k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=k)
+        nonempty = counts > 0
+        # 군집 순으로 정렬한 뒤 군집 시작 위치마다 구간 합을 구합니다.
+        order = np.argsort(labels, kind='stable')
+        starts = (np.cumsum(counts) - counts)[nonempty]
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            centroids[empty] = vectors[generator.choice(vectors.shape[0], empty.size, replace=False)]
+    return centroids
+
+def default_subquantizers(dimension):
+    """
+    하위 벡터 차원이 16 안팎이 되도록 차원의 약수 중에서 하위 양자화기 수를 고릅니다.
+    """
+    for m in range(max(1, dimension // 16), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+class IVFPQIndex:
+    def __init__(self, nlist, m, ksub=256, seed=0):
+        """
+        IVF(역색인) + PQ(곱 양자화) 근사 최근접 이웃 색인 초기화.
+
+        벡터를 k-means 중심점(리스트)에 할당하고, 중심점과의 잔차를 m개의 하위 벡터로 나누어
+        각각 ksub개 코드북 중 하나의 번호(1바이트)로 저장합니다. 검색 시에는 nprobe개 리스트만
+        비대칭 거리 테이블로 훑고, 마지막 후보만 원본 벡터로 정확히 다시 정렬합니다.
+
+        Parameters:
+            nlist (int): 역색인 리스트(중심점) 수
+            m (int): 하위 양자화기 수 (벡터당 코드 바이트 수)
+            ksub (int): 하위 양자화기당 코드북 크기, 최대 256 (기본값: 256)
+            seed (int): 난수 시드 (기본값: 0)
+        """
+        if not 1 <= ksub <= 256:
+            raise ValueError("ksub는 1 이상 256 이하여야 합니다.")
+        self.nlist = nlist
+        self.m = m
+        self.ksub = ksub
+        self.seed = seed
+        self.centroids = None
+        self.codebooks = None
+        self.codes = None
+        self.list_offsets = None
+        self.vectors = None
+        self.order = None
+        self._codebook_norms = None
+
+    @property
+    def dimension(self):
+        return self.centroids.shape[1]
+
+    @property
+    def count(self):
+        return self.codes.shape[0]
+
+    @property
+    def codebook_norms(self):
+        if self._codebook_norms is None:
+            self._codebook_norms = np.einsum('jkd,jkd->jk', self.codebooks, self.codebooks)
+        return self._codebook_norms
+
+    def _split(self, vectors):
+        return vectors.reshape(vectors.shape[0], self.m, -1)
+
+    def build(self, vectors, train_size=None, iterations=20):
+        """
+        중심점과 코드북을 학습하고 모든 벡터를 부호화합니다.
+        벡터는 리스트 순서로 정렬되어 저장되며, 원래 순서는 order로 확인할 수 있습니다.
+
+        Parameters:
+            vectors (numpy.ndarray): (n, d) 벡터 행렬
+            train_size (int, optional): 중심점 학습에 사용할 표본 수 (기본값: 리스트당 64개와 코드북 항목당 64개 중 큰 값)
+            iterations (int): k-means 반복 횟수 (기본값: 20)
+
+        Returns:
+            IVFPQIndex: 자기 자신
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        count, dimension = vectors.shape
+        if dimension % self.m:
+            raise ValueError(f"차원({dimension})이 하위 양자화기 수({self.m})의 배수가 아닙니다.")
+
+        generator = np.random.default_rng(self.seed)
+        train_size = min(count, train_size or max(64 * self.nlist, 64 * self.ksub))
+        sample = vectors[np.sort(generator.choice(count, train_size, replace=False))]
+
+        self.centroids = kmeans(sample, self.nlist, iterations, self.seed)
+        self.nlist = self.centroids.shape[0]
+        # 코드북은 하위 양자화기마다 ksub개 중심점만 학습하면 되므로 표본 일부만 사용합니다.
+        sample = sample[:64 * self.ksub]
+        residuals = self._split(sample - self.centroids[assign(sample, self.centroids)])
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j, :], self.ksub, iterations, self.seed + j + 1)
+            for j in range(self.m)
+        ])
+        self.ksub = self.codebooks.shape[1]
+        self._codebook_norms = None
+
+        labels = assign(vectors, self.centroids)
+        self.order = np.argsort(labels, kind='stable')
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        self.list_offsets[1:] = np.cumsum(np.bincount(labels, minlength=self.nlist))
+        self.vectors = vectors[self.order]
+        self.codes = self.encode(self.vectors, labels[self.order])
+        logging.info(
+            "IVF-PQ 색인을 만들었습니다. 벡터 수: %d, 리스트 수: %d, 벡터당 코드: %d바이트",
+            count, self.nlist, self.m
+        )
+        return self
+
+    def encode(self, vectors, labels, chunk_size=16384):
+        """
+        벡터와 할당된 중심점의 잔차를 PQ 코드로 변환합니다.
+
+        Parameters:
+            vectors (numpy.ndarray): (n, d) 벡터 행렬
+            labels (numpy.ndarray): (n,) 중심점 번호
+
+        Returns:
+            numpy.ndarray: (n, m) uint8 코드
+        """
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        codebook_norms = self.codebook_norms
+        for start in range(0, vectors.shape[0], chunk_size):
+            end = start + chunk_size
+            residuals = self._split(vectors[start:end] - self.centroids[labels[start:end]])
+            for j in range(self.m):
+                distances = codebook_norms[j][None, :] - 2 * (residuals[:, j, :] @ self.codebooks[j].T)
+                codes[start:end, j] = distances.argmin(axis=1)
+        return codes
+
+    def search(self, query, k, nprobe=8, rerank=64):
+        """
+        질의와 가까운 벡터를 찾습니다.
+
+        Parameters:
+            query (numpy.ndarray): (d,) 질의 벡터
+            k (int): 반환할 결과 수
+            nprobe (int): 검색할 리스트 수 (기본값: 8)
+            rerank (int): 원본 벡터로 다시 정렬할 후보 수, 0이면 근사 거리를 그대로 사용 (기본값: 64)
+
+        Returns:
+            tuple: (리스트 순서 기준 위치 배열, 제곱 L2 거리 배열), 거리 오름차순
+        """
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe, self.nlist)
+        coarse = _squared_distances(query[None, :], self.centroids)[0]
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        starts, ends = self.list_offsets[probes], self.list_offsets[probes + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # 탐색할 리스트들의 위치를 이어 붙이고, 각 위치가 몇 번째 리스트에 속하는지 기록합니다.
+        probe_of = np.repeat(np.arange(nprobe), lengths)
+        positions = np.arange(total) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+
+        # 비대칭 거리 테이블: 리스트별 질의 잔차의 각 하위 벡터와 모든 코드북 항목 사이의 제곱 거리
+        residuals = (query[None, :] - self.centroids[probes]).reshape(nprobe, self.m, -1)
+        tables = (
+            np.einsum('pmd,pmd->pm', residuals, residuals)[:, :, None]
+            - 2 * np.einsum('pmd,mkd->pmk', residuals, self.codebooks)
+            + self.codebook_norms[None, :, :]
+        )
+        lookup = (probe_of[:, None] * self.m + np.arange(self.m)[None, :]) * self.ksub + self.codes[positions]
+        distances = tables.ravel()[lookup].sum(axis=1)
+
+        candidates = min(max(k, rerank), positions.shape[0])
+        top = np.argpartition(distances, candidates - 1)[:candidates]
+        positions, distances = positions[top], distances[top]
+
+        if rerank and self.vectors is not None:
+            # 위치를 정렬해 읽으면 메모리 맵에서 연속된 페이지를 읽게 됩니다.
+            positions = np.sort(positions)
+            difference = np.asarray(self.vectors[positions], dtype=np.float32) - query
+            distances = np.einsum('ij,ij->i', difference, difference)
+
+        top = np.argsort(distances)[:k]
+        return positions[top], distances[top]
+
+    def memory_bytes(self):
+        """
+        검색 시 메모리에 상주하는 색인 크기(코드, 중심점, 코드북, 오프셋)를 반환합니다.
+        재정렬용 원본 벡터는 메모리 맵으로 필요한 행만 읽으므로 포함하지 않습니다.
+        """
+        return self.codes.nbytes + self.centroids.nbytes + self.codebooks.nbytes + self.list_offsets.nbytes
+
+    def save(self, directory):
+        """
+        색인 배열을 디렉터리에 .npy 파일로 저장합니다.
+
+        Parameters:
+            directory (str): 저장 경로
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ("centroids", "codebooks", "codes", "list_offsets", "vectors", "order"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        저장된 색인을 불러옵니다. 원본 벡터는 메모리 맵으로 열어 재정렬할 후보만 디스크에서 읽습니다.
+
+        Parameters:
+            directory (str): 색인 경로
+            mmap_mode (str, optional): 원본 벡터를 여는 메모리 맵 모드 (기본값: 'r')
+
+        Returns:
+            IVFPQIndex: 불러온 색인
+        """
+        def load_array(name, mode=None):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+
+        centroids = load_array("centroids")
+        codebooks = load_array("codebooks")
+        index = cls(centroids.shape[0], codebooks.shape[0], codebooks.shape[1])
+        index.centroids = centroids
+        index.codebooks = codebooks
+        index.codes = load_array("codes")
+        index.list_offsets = load_array("list_offsets")
+        index.vectors = load_array("vectors", mmap_mode)
+        index.order = load_array("order", mmap_mode)
+        return index
+
+def write_ivfpq_index(vector_store, directory="ivfpq_index", nlist=None, m=None):
+    """
+    벡터 저장소의 문서와 임베딩으로 IVF-PQ 색인을 만들어 저장합니다.
+    임시 디렉터리에 모두 기록한 뒤 기존 색인과 교체합니다.
+
+    Parameters:
+        vector_store: 임베딩을 포함한 문서를 제공하는 벡터 저장소 (load_records 지원)
+        directory (str): 색인 경로 (기본값: "ivfpq_index")
+        nlist (int, optional): 리스트 수 (기본값: 문서 수의 제곱근의 4배, 리스트당 최소 39개)
+        m (int, optional): 하위 양자화기 수 (기본값: 하위 벡터 차원이 16 안팎이 되는 값)
+
+    Returns:
+        str: 색인 경로
+    """
+    records = vector_store.load_records(include_embeddings=True)
+    if not records:
+        raise ValueError("색인으로 만들 문서가 없습니다.")
+
+    embeddings = np.asarray([record['embedding'] for record in records], dtype=np.float32)
+    count, dimension = embeddings.shape
+    nlist = nlist or max(1, min(int(4 * np.sqrt(count)), count // 39))
+    index = IVFPQIndex(nlist, m or default_subquantizers(dimension)).build(embeddings)
+
+    temp_directory = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    try:
+        index.save(temp_directory)
+        ordered = [records[position] for position in index.order]
+        _write_blob(temp_directory, "texts", [record['text'] for record in ordered])
+        _write_blob(temp_directory, "ids", [record['id'] for record in ordered])
+        _write_blob(temp_directory, "metadatas", [json.dumps(record['metadata'], ensure_ascii=False) for record in ordered])
+        _write_json(os.path.join(temp_directory, "manifest.json"), {
+            'format_version': IVFPQ_FORMAT_VERSION,
+            'count': count,
+            'dimension': dimension,
+            'nlist': index.nlist,
+            'm': index.m,
+            'ksub': index.ksub,
+            'space': getattr(vector_store, 'space', "l2"),
+            'embedding_model': embedding_model_version(getattr(vector_store, 'embedding_model', None))
+        })
+    except Exception:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        raise
+
+    old_directory = directory.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(temp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+    logging.info("IVF-PQ 색인을 저장했습니다. 경로: %s, 문서 수: %d", directory, count)
+    return directory
+
+class IVFPQVectorStore:
+    def __init__(self, index_path, embedding_model, nprobe=8, rerank=256):
+        """
+        IVF-PQ 근사 색인으로 검색하는 읽기 전용 벡터 저장소.
+        ChromaVectorStore와 같은 similarity_search 규약을 따르므로 VectorStoreRetriever에 그대로 사용할 수 있습니다.
+
+        Parameters:
+            index_path (str): write_ivfpq_index로 만든 색인 경로
+            embedding_model: 질의 임베딩 생성 객체 (get_embedding 지원)
+            nprobe (int): 검색할 리스트 수, 클수록 재현율이 높고 느려짐 (기본값: 8)
+            rerank (int): 원본 벡터로 다시 정렬할 후보 수 (기본값: 256)
+        """
+        with open(os.path.join(index_path, "manifest.json"), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest.get('format_version') != IVFPQ_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 IVF-PQ 색인 형식입니다: {self.manifest.get('format_version')}")
+        expected_model = self.manifest.get('embedding_model')
+        if expected_model and expected_model != embedding_model_version(embedding_model):
+            raise ValueError(
+                f"색인의 임베딩 모델({expected_model})과 질의 임베딩 모델({embedding_model_version(embedding_model)})이 다릅니다."
+            )
+
+        self.embedding_model = embedding_model
+        # 색인은 L2 거리로 검색하고, 점수는 원래 컬렉션의 거리 공간으로 계산합니다.
+        self.space = self.manifest.get('space', "l2")
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.index = IVFPQIndex.load(index_path)
+        self.texts = MappedStrings(index_path, "texts")
+        self.ids = MappedStrings(index_path, "ids")
+        self.metadatas = MappedStrings(index_path, "metadatas")
+        logging.info(
+            "IVF-PQ 색인을 열었습니다. 문서 수: %d, 리스트 수: %d, nprobe: %d",
+            self.manifest['count'], self.index.nlist, nprobe
+        )
+
+    def _record(self, position):
+        return {'id': self.ids[position], 'text': self.texts[position], 'metadata': json.loads(self.metadatas[position])}
+
+    def load_documents(self):
+        """
+        색인에 저장된 문서를 불러옵니다.
+
+        Returns:
+            list: 저장된 문서 리스트
+        """
+        return list(self.texts)
+
+    def load_records(self, include_embeddings=False):
+        """
+        색인에 저장된 문서를 ID, 메타데이터와 함께 불러옵니다.
+
+        Parameters:
+            include_embeddings (bool): 임베딩 벡터 포함 여부 (기본값: False)
+
+        Returns:
+            list: 문서 딕셔너리(id, text, metadata[, embedding]) 리스트
+        """
+        records = [self._record(position) for position in range(len(self.texts))]
+        if include_embeddings:
+            for position, record in enumerate(records):
+                record['embedding'] = self.index.vectors[position].tolist()
+        return records
+
+    def embed_query(self, query):
+        """
+        질의의 임베딩을 생성합니다.
+
+        Parameters:
+            query (str): 검색 질의
+
+        Returns:
+            list: 임베딩 벡터 (실패 시 빈 리스트)
+        """
+        return self.embedding_model.get_embedding(query)
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, include_embeddings=False):
+        """
+        질의에 대한 유사한 문서를 근사 검색합니다. 점수는 원래 컬렉션의 거리 공간에서
+        ChromaVectorStore와 같은 방식으로 계산하므로 같은 임계값을 사용할 수 있습니다.
+
+        Parameters:
+            query (str): 검색 질의
+            n_results (int): 반환할 결과 수
+            threshold (float): 유사도 임계값
+            query_embedding (list, optional): 미리 계산된 질의 임베딩
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부 (원본 벡터가 있을 때만, 기본값: False)
+
+        Returns:
+            list: 유사도 점수가 임계값을 넘는 문서 리스트 (id, text, score, metadata)
+        """
+        if query_embedding is None or len(query_embedding) == 0:
+            query_embedding = self.embed_query(query)
+        if query_embedding is None or len(query_embedding) == 0:
+            logging.error("질의 임베딩을 생성하지 못했습니다.")
+            return []
+
+        if self.space in ("cosine", "ip"):
+            # L2 순위와 원래 거리 공간의 순위가 다를 수 있으므로 재정렬 후보 전체를 변환한 뒤 다시 고릅니다.
+            positions, distances = self.index.search(query_embedding, max(n_results, self.rerank), self.nprobe, self.rerank)
+            distances = self._space_distances(positions, distances, query_embedding)
+            top = np.argsort(distances, kind='stable')[:n_results]
+            positions, distances = positions[top], distances[top]
+        else:
+            positions, distances = self.index.search(query_embedding, n_results, self.nprobe, self.rerank)
+        filtered_results = []
+        for position, distance in zip(positions, distances):
+            similarity_score = similarity_from_distance(float(distance), self.space)
+            if similarity_score >= threshold:
+                record = dict(self._record(int(position)), score=similarity_score)
+                if include_embeddings and self.index.vectors is not None:
+                    record['embedding'] = np.asarray(self.index.vectors[position], dtype=np.float32).tolist()
+                filtered_results.append(record)
+        logging.info("임계값 %.2f 이상인 문서 %d개 발견.", threshold, len(filtered_results))
+        return filtered_results
+
+    def _space_distances(self, positions, distances, query_embedding):
+        """
+        색인이 반환한 제곱 L2 거리를 원래 컬렉션의 거리 공간(Chroma와 같은 정의)으로 바꿉니다.
+        원본 벡터가 있으면 후보의 거리를 정확히 다시 계산하고, 없으면 단위 벡터로 보고 제곱 L2 거리의 절반을 사용합니다.
+        """
+        if not len(positions):
+            return distances
+        if self.index.vectors is None:
+            return distances / 2
+        query = np.asarray(query_embedding, dtype=np.float32)
+        vectors = np.asarray(self.index.vectors[positions], dtype=np.float32)
+        products = vectors @ query
+        if self.space == "ip":
+            return 1 - products
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        return 1 - products / np.where(norms > 0, norms, 1.0)
+
+    def close(self):
+        for strings in (self.texts, self.ids, self.metadatas):
+            strings.close()
@@ -0,0 +1,248 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+
+from constants import FAQ_CATEGORY_SLUGS, DEFAULT_FAQ_CATEGORY
+from stores.chroma_vector_store import ChromaVectorStore
+from embeddings.embedding import create_embedding_model
+from utils.categorizer import category_scores
+
+class PartitionedVectorStore:
+    def __init__(self, api_key, persist_directory="chroma_db", embedding_model="text-embedding-3-small", batch_size=64, collection_prefix=None, max_workers=8, embedding_backend="openai", local_model_path="local_embedding.pkl", hnsw_config=None, min_routed_results=1, fallback_score=0.5, min_keyword_matches=2):
+        """
+        카테고리별 컬렉션(샤드)으로 나뉜 벡터 스토어 초기화.
+
+        검색 비용이 전체 말뭉치가 아니라 검색하는 샤드 크기에 비례하도록,
+        문서를 메타데이터의 카테고리에 따라 별도 컬렉션에 저장합니다.
+
+        Parameters:
+            api_key (str): OpenAI API 키
+            persist_directory (str): 데이터 저장 경로
+            embedding_model (str): 임베딩 모델 이름
+            batch_size (int): 한 번에 임베딩할 문서 수 (기본값: 64)
+            collection_prefix (str, optional): 샤드 컬렉션 이름 접두사 (기본값: openai 백엔드는 "faq", local 백엔드는 "faq_local")
+            max_workers (int): 병렬 검색에 사용할 최대 스레드 수 (기본값: 8)
+            embedding_backend (str): 임베딩 백엔드, "openai" 또는 "local" (기본값: "openai")
+            local_model_path (str): 학습된 로컬 임베딩 모델 파일 경로
+            hnsw_config (dict, optional): 샤드 컬렉션의 HNSW 설정 (space, M, construction_ef, search_ef)
+            min_routed_results (int): 예측된 샤드의 결과가 이보다 적으면 나머지 샤드로 보충 (기본값: 1)
+            fallback_score (float): 예측된 샤드의 최고 점수가 이보다 낮으면 나머지 샤드도 검색 (기본값: 0.5)
+            min_keyword_matches (int): 샤드 예측을 확신하는 데 필요한 최소 일치 키워드 수 (기본값: 2)
+        """
+        client = chromadb.PersistentClient(path=persist_directory)
+        collection_prefix = collection_prefix or ("faq" if embedding_backend == "openai" else f"faq_{embedding_backend}")
+        # 모든 샤드가 하나의 임베딩 모델을 공유합니다.
+        embedder = create_embedding_model(
+            embedding_backend, api_key=api_key, model=embedding_model, local_model_path=local_model_path
+        )
+        self.shards = {
+            category: ChromaVectorStore(
+                api_key,
+                persist_directory=persist_directory,
+                embedding_model=embedding_model,
+                batch_size=batch_size,
+                collection_name=f"{collection_prefix}_{slug}",
+                client=client,
+                embedding_backend=embedding_backend,
+                local_model_path=local_model_path,
+                embedder=embedder,
+                hnsw_config=hnsw_config
+            )
+            for category, slug in FAQ_CATEGORY_SLUGS.items()
+        }
+        self.embedding_model = embedder
+        spaces = {shard.space for shard in self.shards.values()}
+        if len(spaces) > 1:
+            logging.warning("샤드의 거리 공간이 서로 다릅니다: %s. 점수 척도가 샤드마다 다를 수 있습니다.", sorted(spaces))
+        self.space = next(iter(self.shards.values())).space
+        self.min_routed_results = min_routed_results
+        self.fallback_score = fallback_score
+        self.min_keyword_matches = min_keyword_matches
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _partition(self, documents, metadatas, ids):
+        """
+        문서를 메타데이터의 카테고리별로 나눕니다.
+
+        Returns:
+            dict: 카테고리별 (문서 리스트, 메타데이터 리스트, ID 리스트)
+        """
+        partitions = {}
+        for doc, metadata, doc_id in zip(documents, metadatas, ids):
+            category = metadata.get('category')
+            if category not in self.shards:
+                category = DEFAULT_FAQ_CATEGORY
+            shard_documents, shard_metadatas, shard_ids = partitions.setdefault(category, ([], [], []))
+            shard_documents.append(doc)
+            shard_metadatas.append(metadata)
+            shard_ids.append(doc_id)
+        return partitions
+
+    def add_documents(self, documents, metadatas=None, ids=None, workers=1):
+        """
+        문서를 메타데이터의 카테고리에 해당하는 샤드에 추가합니다.
+
+        Parameters:
+            documents (list): 문서 리스트
+            metadatas (list, optional): 각 문서의 메타데이터 ('category' 키로 샤드를 정함)
+            ids (list, optional): 각 문서의 고유 ID
+            workers (int): 샤드별 임베딩 작업자 프로세스 수 (기본값: 1)
+
+        Returns:
+            dict: 모든 샤드의 상태별 배치 수 합계
+        """
+        ids = ids or [str(i) for i in range(len(documents))]
+        metadatas = metadatas or [{} for _ in documents]
+
+        partitions = self._partition(documents, metadatas, ids)
+        summary = {}
+        for category, (shard_documents, shard_metadatas, shard_ids) in partitions.items():
+            logging.info("카테고리 '%s' 샤드에 문서 %d개를 추가합니다.", category, len(shard_documents))
+            shard_summary = self.shards[category].add_documents(shard_documents, shard_metadatas, shard_ids, workers=workers)
+            for status, count in shard_summary.items():
+                summary[status] = summary.get(status, 0) + count
+        return summary
+
+    def prune(self, keep_ids, metadatas=None):
+        """
+        각 샤드에서 해당 샤드에 속하지 않게 된 문서를 삭제합니다.
+
+        Parameters:
+            keep_ids (list): 유지할 문서 ID
+            metadatas (list, optional): 각 문서의 메타데이터 ('category' 키로 샤드를 정함)
+
+        Returns:
+            int: 삭제된 문서 수
+        """
+        metadatas = metadatas or [{} for _ in keep_ids]
+        partitions = self._partition(keep_ids, metadatas, keep_ids)
+        return sum(
+            shard.prune(partitions.get(category, ([], [], []))[2])
+            for category, shard in self.shards.items()
+        )
+
+    def load_documents(self):
+        """
+        모든 샤드에 저장된 문서를 불러옵니다.
+
+        Returns:
+            list: 저장된 문서 리스트
+        """
+        documents = []
+        for shard in self.shards.values():
+            documents.extend(shard.load_documents())
+        return documents
+
+    def load_records(self, include_embeddings=False):
+        """
+        모든 샤드에 저장된 문서를 ID, 메타데이터와 함께 불러옵니다.
+
+        Parameters:
+            include_embeddings (bool): 임베딩 벡터 포함 여부 (기본값: False)
+
+        Returns:
+            list: 문서 딕셔너리(id, text, metadata[, embedding]) 리스트
+        """
+        records = []
+        for shard in self.shards.values():
+            records.extend(shard.load_records(include_embeddings=include_embeddings))
+        return records
+
+    def embed_query(self, query):
+        """
+        질의의 임베딩을 생성합니다.
+
+        Parameters:
+            query (str): 검색 질의
+
+        Returns:
+            list: 임베딩 벡터 (실패 시 빈 리스트)
+        """
+        return self.embedding_model.get_embedding(query)
+
+    def route(self, query):
+        """
+        질의의 키워드로 검색할 샤드를 예측합니다. 일치한 키워드가 min_keyword_matches보다 적거나
+        가장 많이 일치한 카테고리가 둘 이상이면 예측이 모호한 것으로 봅니다.
+
+        Parameters:
+            query (str): 검색 질의
+
+        Returns:
+            tuple: (예측된 카테고리 리스트 (예측할 수 없으면 빈 리스트), 예측 확신 여부)
+        """
+        scores = category_scores(query)
+        ranked = sorted(scores, key=lambda category: -scores[category])
+        confident = bool(ranked) and scores[ranked[0]] >= self.min_keyword_matches and (
+            len(ranked) == 1 or scores[ranked[0]] > scores[ranked[1]]
+        )
+        return ranked[:2], confident
+
+    def _search_shards(self, categories, query, n_results, threshold, query_embedding, include_embeddings=False):
+        """
+        여러 샤드를 병렬로 검색하고 점수 순으로 상위 결과를 합칩니다.
+        """
+        shards = [self.shards[category] for category in categories if category in self.shards]
+        if len(shards) == 1:
+            return shards[0].similarity_search(
+                query, n_results, threshold=threshold, query_embedding=query_embedding, include_embeddings=include_embeddings
+            )
+
+        futures = [
+            self.executor.submit(shard.similarity_search, query, n_results, threshold, query_embedding, include_embeddings)
+            for shard in shards
+        ]
+        results = [result for future in futures for result in future.result()]
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:n_results]
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, categories=None, include_embeddings=False):
+        """
+        질의에 대한 유사한 문서를 검색합니다.
+
+        카테고리가 주어지거나 질의에서 예측되면 해당 샤드를 먼저 검색합니다. 키워드 예측이 모호하거나,
+        임계값을 넘는 결과가 min_routed_results보다 적거나, 최고 점수가 fallback_score보다 낮으면
+        잘못 예측한 것으로 보고 나머지 샤드를 병렬로 검색하여 상위 결과를 합칩니다.
+
+        Parameters:
+            query (str): 검색 질의
+            n_results (int): 반환할 결과 수
+            threshold (float): 유사도 임계값
+            query_embedding (list, optional): 미리 계산된 질의 임베딩
+            categories (list, optional): 검색할 카테고리 리스트
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부 (기본값: False)
+
+        Returns:
+            list: 유사도 점수가 임계값을 넘는 문서 리스트 (id, text, score, metadata)
+        """
+        if query_embedding is None or len(query_embedding) == 0:
+            query_embedding = self.embed_query(query)
+
+        confident = True
+        if not categories:
+            categories, confident = self.route(query)
+        categories = [category for category in categories if category in self.shards]
+        if not categories:
+            return self._search_shards(list(self.shards), query, n_results, threshold, query_embedding, include_embeddings)
+
+        results = self._search_shards(categories, query, n_results, threshold, query_embedding, include_embeddings)
+        best_score = results[0]['score'] if results else 0.0
+        if confident and len(results) >= min(self.min_routed_results, n_results) and best_score >= self.fallback_score:
+            return results
+
+        # 이미 검색한 샤드는 빼고 나머지 샤드에서만 보충합니다.
+        logging.info(
+            "예측된 샤드 %s의 결과가 불확실하여 나머지 샤드를 검색합니다. 키워드 확신: %s, 결과: %d개, 최고 점수: %.4f",
+            categories, confident, len(results), best_score
+        )
+        remaining = [category for category in self.shards if category not in categories]
+        results.extend(self._search_shards(remaining, query, n_results, threshold, query_embedding, include_embeddings))
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:n_results]
+
+    def close(self):
+        """
+        병렬 검색에 사용하는 스레드 풀을 종료합니다.
+        """
+        self.executor.shutdown(wait=True)
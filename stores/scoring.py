@@ -0,0 +1,18 @@
+def similarity_from_distance(distance, space="l2"):
+    """
+    Chroma가 반환한 거리를 유사도 점수로 변환합니다.
+
+    l2 공간의 거리는 제곱 L2 거리이고 점수는 1/(1+거리)입니다. 단위 벡터에서는 제곱 L2 거리가
+    cosine 거리(1 - 코사인 유사도)와 ip 거리(1 - 내적)의 두 배이므로, 다른 공간도 같은 척도로 변환하여
+    거리 공간을 바꿔도 같은 임계값을 사용할 수 있게 합니다.
+
+    Parameters:
+        distance (float): Chroma가 반환한 거리
+        space (str): 거리 공간 ("l2", "cosine", "ip")
+
+    Returns:
+        float: 유사도 점수
+    """
+    if space in ("cosine", "ip"):
+        distance = 2 * distance
+    return 1 / (1 + max(distance, 0.0))
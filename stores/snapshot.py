@@ -0,0 +1,308 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+
+import numpy as np
+
+from embeddings.embedding import embedding_model_version
+from stores.scoring import similarity_from_distance
+
+SNAPSHOT_FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+
+def _write_blob(directory, name, values):
+    """
+    문자열 리스트를 UTF-8 바이트 파일과 오프셋 배열로 저장합니다.
+
+    Parameters:
+        directory (str): 저장 경로
+        name (str): 파일 이름 접두사
+        values (list): 저장할 문자열 리스트
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as file:
+        for value in encoded:
+            file.write(value)
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+
+def _write_cache(directory, name, cache):
+    """
+    캐시 항목을 임베딩 행렬(.npy)과 나머지 필드(.json)로 저장합니다.
+    """
+    entries, embeddings = cache.export_entries()
+    if embeddings is None:
+        return False
+    np.save(os.path.join(directory, f"{name}_embeddings.npy"), embeddings.astype(np.float32))
+    _write_json(os.path.join(directory, f"{name}_entries.json"), entries)
+    return True
+
+def write_snapshot(vector_store, root_directory="snapshots", response_cache=None, answer_bank=None):
+    """
+    서빙 상태를 버전이 붙은 스냅샷 디렉터리에 저장합니다.
+    임시 디렉터리에 모두 기록한 뒤 이름을 바꾸고 CURRENT 파일을 교체하므로,
+    저장 중 중단되어도 기존 스냅샷을 읽는 워커에는 영향이 없습니다.
+
+    Parameters:
+        vector_store: 임베딩을 포함한 문서를 제공하는 벡터 저장소 (load_records 지원)
+        root_directory (str): 스냅샷 루트 경로 (기본값: "snapshots")
+        response_cache (SemanticCache, optional): 함께 저장할 응답 캐시
+        answer_bank (AnswerBank, optional): 함께 저장할 사전 생성 답변 저장소
+
+    Returns:
+        str: 생성된 스냅샷 디렉터리 경로
+    """
+    records = vector_store.load_records(include_embeddings=True)
+    if not records:
+        raise ValueError("스냅샷으로 저장할 문서가 없습니다.")
+
+    os.makedirs(root_directory, exist_ok=True)
+    version = time.strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+    temp_directory = os.path.join(root_directory, f".{version}.tmp")
+    os.makedirs(temp_directory)
+
+    try:
+        embeddings = np.asarray([record['embedding'] for record in records], dtype=np.float32)
+        np.save(os.path.join(temp_directory, "embeddings.npy"), embeddings)
+        np.save(os.path.join(temp_directory, "norms.npy"), np.einsum('ij,ij->i', embeddings, embeddings))
+        _write_blob(temp_directory, "texts", [record['text'] for record in records])
+        _write_blob(temp_directory, "ids", [record['id'] for record in records])
+        _write_blob(temp_directory, "metadatas", [json.dumps(record['metadata'], ensure_ascii=False) for record in records])
+
+        caches = []
+        if response_cache is not None and _write_cache(temp_directory, "response_cache", response_cache):
+            caches.append("response_cache")
+        if answer_bank is not None and _write_cache(temp_directory, "answer_bank", answer_bank):
+            caches.append("answer_bank")
+
+        _write_json(os.path.join(temp_directory, "manifest.json"), {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'version': version,
+            'created_at': time.time(),
+            'count': int(embeddings.shape[0]),
+            'dimension': int(embeddings.shape[1]),
+            'embedding_model': embedding_model_version(getattr(vector_store, 'embedding_model', None)),
+            # 원래 컬렉션과 같은 척도로 점수를 계산하기 위한 거리 공간
+            'space': getattr(vector_store, 'space', "l2"),
+            'caches': caches,
+            # 어휘 색인은 아직 없으므로 스냅샷에 포함되지 않습니다.
+            'lexical_index': None
+        })
+
+        snapshot_directory = os.path.join(root_directory, version)
+        os.rename(temp_directory, snapshot_directory)
+    except Exception:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        raise
+
+    current_path = os.path.join(root_directory, CURRENT_FILE)
+    with open(current_path + ".tmp", "w") as file:
+        file.write(version)
+    os.replace(current_path + ".tmp", current_path)
+
+    logging.info("스냅샷을 저장했습니다. 경로: %s, 문서 수: %d", snapshot_directory, len(records))
+    return snapshot_directory
+
+def resolve_snapshot(path):
+    """
+    스냅샷 루트 경로이면 CURRENT가 가리키는 버전 디렉터리를, 아니면 경로를 그대로 반환합니다.
+
+    Parameters:
+        path (str): 스냅샷 루트 또는 버전 디렉터리 경로
+
+    Returns:
+        str: 스냅샷 버전 디렉터리 경로
+    """
+    current_path = os.path.join(path, CURRENT_FILE)
+    if os.path.exists(current_path):
+        with open(current_path, "r") as file:
+            return os.path.join(path, file.read().strip())
+    return path
+
+class MappedStrings:
+    def __init__(self, directory, name):
+        """
+        UTF-8 바이트 파일을 읽기 전용 메모리 맵으로 열어 문자열 리스트처럼 접근합니다.
+
+        Parameters:
+            directory (str): 스냅샷 디렉터리
+            name (str): 파일 이름 접두사
+        """
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode='r')
+        self._file = open(os.path.join(directory, f"{name}.bin"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self._buffer[start:end].decode('utf-8')
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+class SnapshotVectorStore:
+    def __init__(self, snapshot_path, embedding_model):
+        """
+        스냅샷을 읽기 전용 메모리 맵으로 여는 벡터 저장소.
+        여러 워커 프로세스가 같은 스냅샷을 열면 페이지 캐시를 공유하므로 프로세스별로 메모리가 늘지 않습니다.
+
+        Parameters:
+            snapshot_path (str): 스냅샷 루트 또는 버전 디렉터리 경로
+            embedding_model: 질의 임베딩 생성 객체 (get_embedding 지원)
+        """
+        self.directory = resolve_snapshot(snapshot_path)
+        with open(os.path.join(self.directory, "manifest.json"), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 스냅샷 형식입니다: {self.manifest.get('format_version')}")
+
+        expected_model = self.manifest.get('embedding_model')
+        if expected_model and expected_model != embedding_model_version(embedding_model):
+            raise ValueError(
+                f"스냅샷의 임베딩 모델({expected_model})과 질의 임베딩 모델({embedding_model_version(embedding_model)})이 다릅니다."
+            )
+
+        self.embedding_model = embedding_model
+        # 거리 공간이 없는 이전 스냅샷은 l2 컬렉션에서 만든 것입니다.
+        self.space = self.manifest.get('space', "l2")
+        self.embeddings = np.load(os.path.join(self.directory, "embeddings.npy"), mmap_mode='r')
+        self.norms = np.load(os.path.join(self.directory, "norms.npy"), mmap_mode='r')
+        self.texts = MappedStrings(self.directory, "texts")
+        self.ids = MappedStrings(self.directory, "ids")
+        self.metadatas = MappedStrings(self.directory, "metadatas")
+        logging.info("스냅샷을 열었습니다. 버전: %s, 문서 수: %d", self.manifest['version'], self.manifest['count'])
+
+    def load_cache(self, name, cache):
+        """
+        스냅샷에 저장된 캐시 내용을 캐시 객체에 불러옵니다.
+
+        Parameters:
+            name (str): 캐시 이름 ("response_cache" 또는 "answer_bank")
+            cache: export_entries/import_entries를 지원하는 캐시 객체
+
+        Returns:
+            bool: 불러왔는지 여부
+        """
+        if name not in self.manifest.get('caches', []):
+            return False
+        embeddings = np.load(os.path.join(self.directory, f"{name}_embeddings.npy"), mmap_mode='r')
+        with open(os.path.join(self.directory, f"{name}_entries.json"), "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        cache.import_entries(entries, embeddings)
+        return True
+
+    def _record(self, index):
+        return {'id': self.ids[index], 'text': self.texts[index], 'metadata': json.loads(self.metadatas[index])}
+
+    def load_documents(self):
+        """
+        스냅샷에 저장된 문서를 불러옵니다.
+
+        Returns:
+            list: 저장된 문서 리스트
+        """
+        return list(self.texts)
+
+    def load_records(self, include_embeddings=False):
+        """
+        스냅샷에 저장된 문서를 ID, 메타데이터와 함께 불러옵니다.
+
+        Parameters:
+            include_embeddings (bool): 임베딩 벡터 포함 여부 (기본값: False)
+
+        Returns:
+            list: 문서 딕셔너리(id, text, metadata[, embedding]) 리스트
+        """
+        records = [self._record(index) for index in range(len(self.texts))]
+        if include_embeddings:
+            for index, record in enumerate(records):
+                record['embedding'] = self.embeddings[index].tolist()
+        return records
+
+    def embed_query(self, query):
+        """
+        질의의 임베딩을 생성합니다.
+
+        Parameters:
+            query (str): 검색 질의
+
+        Returns:
+            list: 임베딩 벡터 (실패 시 빈 리스트)
+        """
+        return self.embedding_model.get_embedding(query)
+
+    def _distances(self, vector):
+        """
+        Chroma와 같은 정의로 질의와 모든 문서 사이의 거리를 계산합니다.
+        l2는 제곱 L2 거리, cosine은 1 - 코사인 유사도, ip는 1 - 내적입니다.
+        """
+        products = self.embeddings @ vector
+        if self.space == "ip":
+            return 1 - products
+        if self.space == "cosine":
+            norms = np.sqrt(np.maximum(self.norms, 0.0)) * np.linalg.norm(vector)
+            return 1 - products / np.where(norms > 0, norms, 1.0)
+        return self.norms - 2 * products + vector @ vector
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, include_embeddings=False):
+        """
+        질의에 대한 유사한 문서를 전수 검색합니다. 거리와 점수는 원래 컬렉션의 거리 공간에서
+        ChromaVectorStore와 같은 방식으로 계산하므로 같은 임계값을 사용할 수 있습니다.
+
+        Parameters:
+            query (str): 검색 질의
+            n_results (int): 반환할 결과 수
+            threshold (float): 유사도 임계값
+            query_embedding (list, optional): 미리 계산된 질의 임베딩
+            include_embeddings (bool): 결과에 문서 임베딩('embedding')을 포함할지 여부 (기본값: False)
+
+        Returns:
+            list: 유사도 점수가 임계값을 넘는 문서 리스트 (id, text, score, metadata)
+        """
+        if query_embedding is None or len(query_embedding) == 0:
+            query_embedding = self.embed_query(query)
+        if query_embedding is None or len(query_embedding) == 0:
+            logging.error("질의 임베딩을 생성하지 못했습니다.")
+            return []
+
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        distances = self._distances(vector)
+        n_results = min(n_results, distances.shape[0])
+        if n_results <= 0:
+            return []
+        top = np.argpartition(distances, n_results - 1)[:n_results]
+        top = top[np.argsort(distances[top])]
+
+        filtered_results = []
+        for index in top:
+            similarity_score = similarity_from_distance(float(distances[index]), self.space)
+            if similarity_score >= threshold:
+                record = dict(self._record(int(index)), score=similarity_score)
+                if include_embeddings:
+                    record['embedding'] = self.embeddings[index].tolist()
+                filtered_results.append(record)
+        logging.info("임계값 %.2f 이상인 문서 %d개 발견.", threshold, len(filtered_results))
+        return filtered_results
+
+    def close(self):
+        """
+        메모리 맵을 닫습니다.
+        """
+        for strings in (self.texts, self.ids, self.metadatas):
+            strings.close()
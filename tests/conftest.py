@@ -0,0 +1,37 @@
+import os
+import re
+import sys
+
+import pytest
+
+# 저장소 루트의 모듈(stores, caches, utils 등)을 테스트에서 가져올 수 있도록 합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeEncoder:
+    """
+    어휘 파일 없이 동작하는 tiktoken 대역 인코더. 공백과 단어 조각을 3바이트씩 한 토큰으로 봅니다.
+    """
+    def encode_ordinary(self, text):
+        tokens = []
+        for piece in re.findall(r"\s+|\S+", text):
+            data = piece.encode("utf-8")
+            tokens.extend(data[i:i + 3] for i in range(0, len(data), 3))
+        return tokens
+
+    encode = encode_ordinary
+
+    def decode(self, tokens):
+        return b"".join(tokens).decode("utf-8", errors="replace")
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    """
+    utils.tokenizer가 네트워크에서 인코딩을 내려받지 않고 FakeEncoder를 사용하도록 합니다.
+    """
+    from utils import tokenizer
+
+    encoder = FakeEncoder()
+    monkeypatch.setattr(tokenizer, "get_encoder", lambda encoding_name=tokenizer.DEFAULT_ENCODING: encoder)
+    tokenizer.cached_count_tokens.cache_clear()
+    yield encoder
+    tokenizer.cached_count_tokens.cache_clear()
@@ -0,0 +1,57 @@
+import json
+
+from caches.answer_bank import AnswerBank
+
+VECTORS = {
+    "정산은 언제 되나요?": [1, 0, 0],
+    "정산 언제": [0, 1, 0],
+    "쿠폰은 어떻게 쓰나요?": [0, 0, 1],
+}
+
+class FakeStore:
+    def __init__(self, records):
+        self.records = records
+        self.embedded = []
+
+    def load_records(self):
+        return self.records
+
+    def embed_query(self, query):
+        self.embedded.append(query)
+        return VECTORS[query]
+
+class FakeLanguageModel:
+    def generate(self, messages):
+        # 카테고리 식별과 답변 생성 모두 같은 응답을 돌려줍니다.
+        return "정산관리"
+
+def record(doc_id, question, source=None):
+    metadata = {'question': question}
+    if source:
+        metadata['source_questions'] = json.dumps({question: source}, ensure_ascii=False)
+    return {'id': doc_id, 'text': f"Q: {question}\nA: 답변", 'metadata': metadata}
+
+def test_build_embeds_source_question_so_raw_query_matches():
+    store = FakeStore([record("1", "정산 언제", "정산은 언제 되나요?")])
+    bank = AnswerBank(threshold=0.92)
+    stats = bank.build(store, FakeLanguageModel(), max_workers=1)
+
+    assert stats['generated'] == 1
+    assert store.embedded == ["정산은 언제 되나요?"]
+    hit = bank.lookup(VECTORS["정산은 언제 되나요?"])
+    assert hit is not None and hit['question'] == "정산 언제"
+
+def test_build_falls_back_to_stored_question_without_source():
+    store = FakeStore([record("1", "정산 언제")])
+    bank = AnswerBank()
+    bank.build(store, FakeLanguageModel(), max_workers=1)
+    assert store.embedded == ["정산 언제"]
+
+def test_entry_is_rebuilt_when_source_question_appears():
+    bank = AnswerBank()
+    bank.build(FakeStore([record("1", "정산 언제")]), FakeLanguageModel(), max_workers=1)
+
+    store = FakeStore([record("1", "정산 언제", "정산은 언제 되나요?")])
+    stats = bank.build(store, FakeLanguageModel(), max_workers=1)
+    assert stats['generated'] == 1 and stats['reused'] == 0
+    assert bank.entries["정산 언제"]['version'] == 2
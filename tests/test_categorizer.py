@@ -0,0 +1,14 @@
+from constants import DEFAULT_FAQ_CATEGORY
+from utils.categorizer import assign_category, match_categories
+
+def test_match_categories_orders_by_keyword_count():
+    assert match_categories("정산 수수료와 배송 문의")[0] == "정산관리"
+    assert match_categories("안녕하세요") == []
+
+def test_match_categories_ignores_spaces():
+    assert "정산관리" in match_categories("세금 계산서 발행")
+
+def test_assign_category_prefers_question_then_answer():
+    assert assign_category("상품 옵션을 바꾸고 싶어요", "주문 후에는 변경할 수 없습니다.") == "상품관리"
+    assert assign_category("어떻게 하나요?", "정산 대금은 익일 지급됩니다.") == "정산관리"
+    assert assign_category("어떻게 하나요?", "") == DEFAULT_FAQ_CATEGORY
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("chromadb")
+
+from stores.chroma_vector_store import ChromaVectorStore
+
+class FakeCollection:
+    def __init__(self, metadata):
+        self.metadata = dict(metadata)
+
+    def modify(self, metadata=None):
+        # chromadb 0.5.0의 Collection.modify와 같이 거리 공간이 포함되면 거부합니다.
+        if "hnsw:space" in metadata:
+            raise ValueError("Changing the distance function of a collection once it is created is not supported currently.")
+        self.metadata = dict(metadata)
+
+class FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_collection(self, name, embedding_function=None):
+        return self.collection
+
+def open_store(collection, hnsw_config):
+    store = ChromaVectorStore.__new__(ChromaVectorStore)
+    store.client = FakeClient(collection)
+    store.collection_name = "faq_collection"
+    store.embedding_function = None
+    store.hnsw_config = hnsw_config
+    return store, store._open_collection()
+
+def test_search_ef_is_applied_to_existing_collection():
+    collection = FakeCollection({"hnsw:space": "cosine", "hnsw:M": 16, "hnsw:search_ef": 10})
+    store, _ = open_store(collection, {"search_ef": 64})
+    assert collection.metadata["hnsw:search_ef"] == 64
+    assert collection.metadata["hnsw:M"] == 16
+    assert store.space == "cosine"
+
+class RecordingCollection:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, documents, ids, metadatas, embeddings):
+        self.upserts.append(list(ids))
+
+class BatchEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def get_embeddings(self, texts):
+        self.calls += 1
+        return [[float(len(text)), 1.0] for text in texts]
+
+def test_add_documents_embeds_in_batches_and_commits_in_groups(tmp_path):
+    store = ChromaVectorStore.__new__(ChromaVectorStore)
+    store.collection = RecordingCollection()
+    store.embedding_model = BatchEmbedding()
+    store.batch_size = 4
+    store.commit_batches = 3
+    store.journal_file = str(tmp_path / "journal.jsonl")
+
+    documents = [f"문서 {i}" for i in range(20)]
+    summary = store.add_documents(documents, [{'question': str(i)} for i in range(20)], [str(i) for i in range(20)])
+
+    assert summary['committed'] == 5 and summary['failed'] == 0
+    assert store.embedding_model.calls == 5
+    # 배치 3개를 모아 한 번에 반영하고, 남은 배치는 마지막에 반영합니다.
+    assert [len(ids) for ids in store.collection.upserts] == [12, 8]
+    assert sorted(int(doc_id) for ids in store.collection.upserts for doc_id in ids) == list(range(20))
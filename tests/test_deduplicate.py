@@ -0,0 +1,31 @@
+import json
+
+from utils.deduplicate import NearDuplicateFilter, merged_questions, source_questions
+
+ANSWER = "정산 은 매주 수요일 에 등록 된 계좌 로 지급 됩니다 보류 된 금액 은 다음 정산 에 포함 됩니다"
+
+def chunk(question, answer):
+    return f"Q: {question}\nA: {answer}"
+
+def test_repeated_answers_are_merged_into_first_chunk():
+    documents = [chunk("정산 일정", ANSWER), chunk("정산 언제", ANSWER), chunk("쿠폰 사용", "쿠폰 은 결제 화면 에서 선택 합니다 중복 사용 은 불가 합니다")]
+    metadatas = [
+        {'question': "정산 일정", 'source_questions': json.dumps({"정산 일정": "정산 일정은?"}, ensure_ascii=False)},
+        {'question': "정산 언제", 'source_questions': json.dumps({"정산 언제": "정산은 언제 되나요?"}, ensure_ascii=False)},
+        {'question': "쿠폰 사용"}
+    ]
+    kept, kept_metadatas, report = NearDuplicateFilter(threshold=0.9).deduplicate(documents, metadatas)
+
+    assert kept == [documents[0], documents[2]]
+    assert merged_questions(kept_metadatas[0]) == ["정산 언제"]
+    assert source_questions(kept_metadatas[0]) == {"정산 일정": "정산 일정은?", "정산 언제": "정산은 언제 되나요?"}
+    assert report['embeddings_saved'] == 1 and report['merged_groups'] == 1
+
+def test_answers_shorter_than_shingle_are_not_merged():
+    documents = [chunk("배송 가능", "네 가능"), chunk("반품 가능", "네 가능"), chunk("교환 가능", "네")]
+    metadatas = [{'question': "배송 가능"}, {'question': "반품 가능"}, {'question': "교환 가능"}]
+    kept, kept_metadatas, report = NearDuplicateFilter(threshold=0.5).deduplicate(documents, metadatas)
+
+    assert kept == documents
+    assert all('merged_questions' not in metadata for metadata in kept_metadatas)
+    assert report['skipped_short'] == 3 and report['embeddings_saved'] == 0
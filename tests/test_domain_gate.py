@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from chains.domain_gate import (
+    DomainGate,
+    char_bigrams,
+    is_out_of_domain_response,
+    load_domain_classifier,
+    save_domain_classifier,
+    train_domain_classifier,
+)
+from constants import OUT_OF_DOMAIN_MESSAGE
+
+DOCUMENTS = [
+    "Q: 정산 일정 은 어떻게 되나요 ?\nA: 구매 확정 후 정산 됩니다 .",
+    "Q: 상품 등록 은 어떻게 하나요 ?\nA: 상품 관리 메뉴 에서 등록 합니다 .",
+    "Q: 배송비 설정 방법\nA: 배송비 템플릿 에서 설정 합니다 .",
+]
+
+def test_out_of_domain_response_ignores_spacing_and_quotes():
+    assert is_out_of_domain_response(f"'{OUT_OF_DOMAIN_MESSAGE.replace(' ', '  ')}'")
+    assert not is_out_of_domain_response("정산관리 (Settlement Management)")
+
+def test_char_bigrams_stay_within_words():
+    assert char_bigrams("정산 일정!") == {"정산", "일정"}
+    assert char_bigrams("a") == {"a"}
+
+def test_lexical_overlap_separates_faq_and_off_topic_questions():
+    gate = DomainGate.from_documents(DOCUMENTS)
+    assert gate.lexical_overlap("정산은 언제 되나요?") > gate.lexical_overlap("오늘 날씨 어때?")
+    assert gate.lexical_overlap("") == 0.0
+
+def test_refuses_only_when_every_signal_is_off_topic():
+    gate = DomainGate.from_documents(DOCUMENTS, score_threshold=0.45, lexical_threshold=0.3)
+    assert not gate.check("오늘 날씨 어때?", [{'score': 0.2}])['in_domain']
+    assert gate.check("오늘 날씨 어때?", [{'score': 0.6}])['in_domain']
+    assert gate.check("상품 등록 방법", [])['in_domain']
+    assert gate.decide(0.1, 0.1, probability=0.9)
+    assert not gate.decide(0.1, 0.1, probability=0.1)
+
+def test_classifier_round_trip_and_model_guard(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = np.vstack([rng.normal(1, 0.1, (20, 4)), rng.normal(-1, 0.1, (20, 4))]).astype(np.float32)
+    labels = [True] * 20 + [False] * 20
+    path = str(tmp_path / "classifier.pkl")
+    save_domain_classifier(train_domain_classifier(embeddings, labels, embedding_model="model-a"), path)
+
+    model = load_domain_classifier(path, "model-a")
+    gate = DomainGate.from_documents(DOCUMENTS, classifier=model)
+    assert gate.needs_embedding
+    assert gate.domain_probability([1, 1, 1, 1]) > 0.9
+    assert gate.domain_probability([-1, -1, -1, -1]) < 0.1
+    assert load_domain_classifier(path, "model-b") is None
+    assert load_domain_classifier(str(tmp_path / "missing.pkl")) is None
+
+def test_corrupt_classifier_file_is_ignored(tmp_path, caplog):
+    path = tmp_path / "classifier.pkl"
+    path.write_bytes(b"not a pickle")
+    assert load_domain_classifier(str(path)) is None
+    assert "주제 판별 분류기를 불러오는 중 오류 발생" in caplog.text
@@ -0,0 +1,112 @@
+import time
+
+from stores.ingestion_journal import IngestionJournal, COMMITTED, FAILED, EMBEDDED
+
+IDS = [str(i) for i in range(6)]
+DOCUMENTS = [f"문서 {i}" for i in range(6)]
+
+def run_once(path, fail_batches=(), max_attempts=3):
+    """
+    적재 실행 한 번을 흉내 냅니다. fail_batches의 배치는 임베딩 단계에서 항상 실패합니다.
+    """
+    journal = IngestionJournal(path, batch_size=2, max_attempts=max_attempts)
+    journal.begin(IDS, DOCUMENTS, model="test-model")
+    while True:
+        claim = journal.claim("worker")
+        if claim is None:
+            break
+        batch, start, end = claim
+        if batch in fail_batches:
+            journal.mark(batch, FAILED, "worker", error="임베딩 생성 실패")
+            continue
+        journal.write_spool(batch, [[float(i)] for i in range(start, end)])
+        journal.mark(batch, EMBEDDED, "worker")
+        assert journal.read_spool(batch) == [[float(i)] for i in range(start, end)]
+        journal.remove_spool(batch)
+        journal.mark(batch, COMMITTED, "worker")
+    summary = journal.summary()
+    journal.compact()
+    return journal, summary
+
+def test_claims_every_batch_once(tmp_path):
+    _, summary = run_once(str(tmp_path / "journal.jsonl"))
+    assert summary[COMMITTED] == 3 and summary[FAILED] == 0
+
+def test_failed_batch_is_retried_up_to_max_attempts(tmp_path):
+    journal, summary = run_once(str(tmp_path / "journal.jsonl"), fail_batches={1}, max_attempts=3)
+    assert summary[FAILED] == 1
+    assert journal.states()[1]['attempts'] == 3
+
+def test_failed_batch_is_committed_on_next_run(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    run_once(path, fail_batches={1})
+    journal, summary = run_once(path)
+    assert summary == {'pending': 0, 'embedded': 0, 'committed': 3, 'failed': 0}
+    assert journal.states()[1]['status'] == COMMITTED
+
+def test_worker_joining_run_keeps_attempts(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    run_once(path, fail_batches={1})
+    journal = IngestionJournal(path, batch_size=2)
+    journal.begin(IDS, DOCUMENTS, model="test-model", retry_failed=False)
+    assert journal.claim("worker") is None
+
+def test_resume_survives_truncated_last_line(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = IngestionJournal(path, batch_size=2)
+    journal.begin(IDS, DOCUMENTS, model="test-model")
+    batch, _, _ = journal.claim("worker")
+    journal.mark(batch, COMMITTED, "worker")
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"batch": 1, "status": "comm')
+
+    resumed = IngestionJournal(path, batch_size=2)
+    resumed.begin(IDS, DOCUMENTS, model="test-model")
+    assert resumed.states()[batch]['status'] == COMMITTED
+    claimed, _, _ = resumed.claim("worker")
+    assert claimed != batch
+    # 중단된 줄 뒤에 이어 쓴 기록도 다시 읽을 수 있어야 합니다.
+    assert IngestionJournal(path, batch_size=2).states()[claimed]['status'] == 'pending'
+
+def test_changed_input_archives_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    run_once(path)
+    journal = IngestionJournal(path, batch_size=2)
+    journal.begin(IDS, [document + " 수정" for document in DOCUMENTS], model="test-model")
+    assert journal.summary()[COMMITTED] == 0
+    assert any(name.endswith(".bak") for name in (p.name for p in tmp_path.iterdir()))
+
+def test_compact_keeps_latest_state(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal, _ = run_once(path, fail_batches={2})
+    with open(path, encoding="utf-8") as file:
+        lines = file.readlines()
+    assert len(lines) == 1 + 3
+    assert journal.states()[2]['status'] == FAILED
+
+def test_claim_prefers_unclaimed_then_stale_then_failed(tmp_path, monkeypatch):
+    journal = IngestionJournal(str(tmp_path / "journal.jsonl"), batch_size=2, lease_seconds=60)
+    journal.begin(IDS, DOCUMENTS, model="test-model")
+    assert [journal.claim("worker")[0] for _ in range(3)] == [0, 1, 2]
+    journal.mark(2, FAILED, "worker", error="실패")
+    journal.mark(0, COMMITTED, "worker")
+    assert journal.claim("worker")[0] == 2
+
+    # 임대 시간이 지난 처리 중 배치를 실패 배치보다 먼저 다시 가져갑니다.
+    journal.mark(2, FAILED, "worker", error="실패")
+    now = time.time()
+    monkeypatch.setattr("stores.ingestion_journal.time.time", lambda: now + 120)
+    assert journal.claim("other")[0] == 1
+    assert journal.claim("other")[0] == 2
+
+def test_mark_many_and_embedded_batches(tmp_path):
+    journal = IngestionJournal(str(tmp_path / "journal.jsonl"), batch_size=2)
+    journal.begin(IDS, DOCUMENTS, model="test-model")
+    for _ in range(3):
+        journal.claim("worker")
+    journal.mark_many([2, 0], EMBEDDED, "worker")
+    assert journal.embedded_batches() == [0, 2]
+
+    journal.mark_many([0, 2], COMMITTED, "worker")
+    assert journal.embedded_batches() == []
+    assert journal.summary()[COMMITTED] == 2
@@ -0,0 +1,82 @@
+import numpy as np
+
+from stores.ivfpq_vector_store import IVFPQIndex, IVFPQVectorStore, kmeans, write_ivfpq_index
+from stores.scoring import similarity_from_distance
+
+def clustered_vectors(count=2000, dimension=32, clusters=20, seed=0):
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = generator.integers(0, clusters, size=count)
+    return centers[labels] + 0.3 * generator.normal(size=(count, dimension)).astype(np.float32)
+
+def exact_neighbors(vectors, query, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return set(np.argsort(distances)[:k].tolist())
+
+def recall_at_k(index, vectors, queries, k, **search_options):
+    hits = 0
+    for query in queries:
+        positions, _ = index.search(query, k, **search_options)
+        found = set(index.order[positions].tolist())
+        hits += len(found & exact_neighbors(vectors, query, k))
+    return hits / (k * len(queries))
+
+def test_reranked_search_recalls_exact_neighbors():
+    vectors = clustered_vectors()
+    index = IVFPQIndex(nlist=16, m=8, ksub=64).build(vectors, iterations=10)
+    queries = vectors[:50] + 0.05
+
+    assert recall_at_k(index, vectors, queries, 10, nprobe=8, rerank=128) >= 0.95
+
+def test_more_probes_do_not_reduce_recall():
+    vectors = clustered_vectors(seed=1)
+    index = IVFPQIndex(nlist=32, m=8, ksub=64).build(vectors, iterations=10)
+    queries = vectors[:50] + 0.05
+
+    narrow = recall_at_k(index, vectors, queries, 10, nprobe=1, rerank=0)
+    wide = recall_at_k(index, vectors, queries, 10, nprobe=32, rerank=0)
+    assert wide >= narrow
+    assert recall_at_k(index, vectors, queries, 10, nprobe=32, rerank=256) == 1.0
+
+def test_saved_index_returns_same_results(tmp_path):
+    vectors = clustered_vectors(count=500)
+    index = IVFPQIndex(nlist=8, m=4, ksub=32).build(vectors, iterations=5)
+    index.save(str(tmp_path))
+    loaded = IVFPQIndex.load(str(tmp_path))
+
+    expected_positions, expected_distances = index.search(vectors[0], 5)
+    positions, distances = loaded.search(vectors[0], 5)
+    assert positions.tolist() == expected_positions.tolist()
+    assert np.allclose(distances, expected_distances)
+
+def test_kmeans_centroids_are_cluster_means():
+    vectors = np.array([[0, 0], [0, 2], [10, 10], [10, 12]], dtype=np.float32)
+    centroids = kmeans(vectors, 2, iterations=5)
+    assert sorted(map(tuple, centroids.round(3).tolist())) == [(0.0, 1.0), (10.0, 11.0)]
+
+class SourceStore:
+    space = "cosine"
+    embedding_model = None
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def load_records(self, include_embeddings=False):
+        return [
+            {'id': str(i), 'text': f"문서 {i}", 'metadata': {}, 'embedding': vector.tolist()}
+            for i, vector in enumerate(self.vectors)
+        ]
+
+def test_scores_follow_source_collection_space(tmp_path):
+    # 노름이 제각각인 벡터에서는 cosine 점수와 L2 점수가 다릅니다.
+    vectors = clustered_vectors(count=300, dimension=16)
+    directory = write_ivfpq_index(SourceStore(vectors), str(tmp_path / "index"), nlist=4, m=4)
+    store = IVFPQVectorStore(directory, embedding_model=None, nprobe=4, rerank=300)
+    assert store.space == "cosine"
+
+    query = vectors[7] * 3
+    results = store.similarity_search("", n_results=3, threshold=0.0, query_embedding=query.tolist())
+    assert results[0]['id'] == "7"
+    cosine = float(vectors[7] @ query / (np.linalg.norm(vectors[7]) * np.linalg.norm(query)))
+    assert np.isclose(results[0]['score'], similarity_from_distance(1 - cosine, "cosine"), atol=1e-5)
+    store.close()
@@ -0,0 +1,46 @@
+import argparse
+
+import pytest
+
+from benchmarks.load_generator import _execute, chain_runner_factory
+
+DOCUMENTS = ["Q: 정산 일정은 어떻게 되나요?\nA: 구매 확정 후 정산됩니다.", "Q: 상품 등록 방법\nA: 상품관리 메뉴에서 등록합니다."]
+
+def make_args(**overrides):
+    values = dict(
+        transport="inproc", llm_latency="constant:0", embedding_latency="constant:0", error_rate=0.0,
+        threshold=0.0, cache=False, cache_threshold=0.95, seed=0
+    )
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+@pytest.mark.parametrize("transport", ["inproc", "http"])
+def test_stub_errors_are_counted(fake_encoder, transport):
+    make_runner, stop = chain_runner_factory(make_args(transport=transport, error_rate=1.0), DOCUMENTS)
+    try:
+        result = _execute(make_runner(), "정산 일정 알려주세요", 0.0)
+    finally:
+        stop()
+    assert result['error'] is not None
+
+@pytest.mark.parametrize("transport", ["inproc", "http"])
+def test_successful_requests_record_stages(fake_encoder, transport):
+    make_runner, stop = chain_runner_factory(make_args(transport=transport), DOCUMENTS)
+    try:
+        result = _execute(make_runner(), "정산 일정 알려주세요", 0.0)
+    finally:
+        stop()
+    assert result['error'] is None
+    assert {'retrieval', 'category', 'intent', 'answer'} <= set(result['stages'])
+
+def test_question_with_list_items_does_not_prompt(fake_encoder, monkeypatch):
+    def fail_input(prompt=""):
+        raise AssertionError("부하 생성기는 사용자 입력을 기다리면 안 됩니다.")
+    monkeypatch.setattr("builtins.input", fail_input)
+
+    make_runner, stop = chain_runner_factory(make_args(), DOCUMENTS)
+    try:
+        result = _execute(make_runner(), "쿠폰 - 포인트 - 적립금 차이가 뭔가요?", 0.0)
+    finally:
+        stop()
+    assert result['error'] is None
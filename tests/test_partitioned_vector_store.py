@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from stores.partitioned_vector_store import PartitionedVectorStore
+
+class FakeShard:
+    def __init__(self, name, scores):
+        self.name = name
+        self.scores = scores
+        self.calls = 0
+
+    def similarity_search(self, query, n_results=5, threshold=0.35, query_embedding=None, include_embeddings=False):
+        self.calls += 1
+        results = [
+            {'id': f"{self.name}-{index}", 'text': self.name, 'score': score, 'metadata': {}}
+            for index, score in enumerate(self.scores) if score >= threshold
+        ]
+        return results[:n_results]
+
+def make_store(shard_scores, min_routed_results=1, fallback_score=0.5, min_keyword_matches=2):
+    store = PartitionedVectorStore.__new__(PartitionedVectorStore)
+    store.shards = {name: FakeShard(name, scores) for name, scores in shard_scores.items()}
+    store.min_routed_results = min_routed_results
+    store.fallback_score = fallback_score
+    store.min_keyword_matches = min_keyword_matches
+    store.executor = ThreadPoolExecutor(max_workers=4)
+    return store
+
+def test_confident_routed_shard_with_few_results_does_not_search_all_shards():
+    store = make_store({"정산관리": [0.9, 0.2], "상품관리": [0.8], "판매관리": [0.7]})
+    results = store.similarity_search("정산", n_results=5, threshold=0.35, query_embedding=[1.0], categories=["정산관리"])
+    assert [result['id'] for result in results] == ["정산관리-0"]
+    assert store.shards["상품관리"].calls == store.shards["판매관리"].calls == 0
+    store.close()
+
+def test_empty_routed_shard_is_topped_up_from_remaining_shards():
+    store = make_store({"정산관리": [0.1], "상품관리": [0.8], "판매관리": [0.7]})
+    results = store.similarity_search("정산", n_results=2, threshold=0.35, query_embedding=[1.0], categories=["정산관리"])
+    assert [result['id'] for result in results] == ["상품관리-0", "판매관리-0"]
+    assert store.shards["정산관리"].calls == 1
+    store.close()
+
+def test_weak_routed_results_are_merged_with_other_shards():
+    # 키워드로 잘못 예측한 샤드의 약한 결과(0.4)보다 다른 샤드의 정답(0.8)이 앞에 와야 합니다.
+    store = make_store({"정산관리": [0.4, 0.38], "상품관리": [0.8], "판매관리": [0.3]})
+    results = store.similarity_search("정산", n_results=2, threshold=0.35, query_embedding=[1.0], categories=["정산관리"])
+    assert [result['id'] for result in results] == ["상품관리-0", "정산관리-0"]
+    assert store.shards["정산관리"].calls == 1 and store.shards["상품관리"].calls == 1
+    store.close()
+
+def test_ambiguous_keyword_route_searches_other_shards(monkeypatch):
+    monkeypatch.setattr(
+        "stores.partitioned_vector_store.category_scores", lambda query: {"정산관리": 1, "상품관리": 1}
+    )
+    store = make_store({"정산관리": [0.9], "상품관리": [0.6], "판매관리": [0.95]})
+    routed, confident = store.route("정산 상품")
+    assert set(routed) == {"정산관리", "상품관리"} and not confident
+
+    results = store.similarity_search("정산 상품", n_results=1, threshold=0.35, query_embedding=[1.0])
+    assert [result['id'] for result in results] == ["판매관리-0"]
+    store.close()
+
+def test_unrouted_query_searches_all_shards_once():
+    store = make_store({"정산관리": [0.6], "상품관리": [0.8]})
+    results = store.similarity_search("안녕하세요", n_results=5, threshold=0.35, query_embedding=[1.0], categories=None)
+    assert [result['id'] for result in results] == ["상품관리-0", "정산관리-0"]
+    assert all(shard.calls == 1 for shard in store.shards.values())
+    store.close()
+
+def test_close_shuts_down_executor():
+    store = make_store({"정산관리": [0.9]})
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.executor.submit(print)
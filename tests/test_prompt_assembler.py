@@ -0,0 +1,37 @@
+from prompts.prompt_assembler import CompiledPrompt
+
+TEMPLATE = """# 역할
+당신은 판매자 상담 챗봇입니다.
+
+# 참고 문서
+{context}
+
+# 규칙
+문서에 없는 내용은 답하지 않습니다.
+
+**질문 의도**
+{intent}
+"""
+
+def test_without_stable_prefix_matches_str_format(fake_encoder):
+    prompt = CompiledPrompt(TEMPLATE, stable_prefix=False)
+    assert prompt.format(context="문서", intent="의도") == TEMPLATE.format(context="문서", intent="의도")
+    assert prompt.fields == ("context", "intent")
+
+def test_static_sections_form_a_prefix_independent_of_values(fake_encoder):
+    prompt = CompiledPrompt(TEMPLATE)
+    first = prompt.format(context="정산 문서", intent="정산 일정")
+    second = prompt.format(context="쿠폰 문서 전체", intent="쿠폰 사용")
+
+    assert prompt.static_prefix.startswith("# 역할") and "# 규칙" in prompt.static_prefix
+    assert first.startswith(prompt.static_prefix) and second.startswith(prompt.static_prefix)
+    assert first.endswith("**질문 의도**\n정산 일정\n")
+
+def test_token_count_adds_only_value_tokens(fake_encoder):
+    prompt = CompiledPrompt(TEMPLATE)
+    empty_tokens = prompt.count_tokens(context="", intent="")
+    text, tokens = prompt.build(context="정산 문서", intent="정산 일정")
+
+    assert tokens == empty_tokens + len(fake_encoder.encode("정산 문서")) + len(fake_encoder.encode("정산 일정"))
+    # 구역 경계의 공백이 합쳐지는 만큼만 전체 인코딩 결과와 다릅니다.
+    assert abs(tokens - len(fake_encoder.encode(text))) <= 2
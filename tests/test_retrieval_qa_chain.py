@@ -0,0 +1,76 @@
+import pytest
+
+from benchmarks.stubs import StubEmbedding, StubLanguageModel, StubVectorStore
+from caches.semantic_cache import SemanticCache
+from retrievers.vector_store_retriever import VectorStoreRetriever
+
+DOCUMENTS = [
+    "Q: 정산 일정은 어떻게 되나요?\nA: 구매 확정 후 1영업일에 정산됩니다.",
+    "Q: 상품 등록은 어떻게 하나요?\nA: 상품관리 메뉴에서 상품을 등록합니다.",
+    "Q: 배송비 설정은 어디서 하나요?\nA: 배송비 템플릿에서 설정합니다.",
+]
+
+class CountingLanguageModel(StubLanguageModel):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def generate(self, messages):
+        self.calls += 1
+        return super().generate(messages)
+
+@pytest.fixture
+def make_chain(fake_encoder):
+    from chains.retrieval_qa_chain import RetrievalQAChain
+
+    def make(**kwargs):
+        store = StubVectorStore(DOCUMENTS, StubEmbedding())
+        language_model = CountingLanguageModel()
+        chain = RetrievalQAChain(VectorStoreRetriever(store, k=2, threshold=0.0), language_model=language_model, **kwargs)
+        return chain, language_model
+    return make
+
+def test_response_cache_serves_repeated_first_question(make_chain):
+    cache = SemanticCache()
+    chain, language_model = make_chain(response_cache=cache)
+    answer = chain.run("정산 일정 알려주세요")
+    calls = language_model.calls
+
+    chain.conversation_history = []
+    assert chain.run("정산 일정 알려주세요") == answer
+    assert language_model.calls == calls
+
+def test_response_cache_ignores_questions_with_history(make_chain):
+    cache = SemanticCache()
+    chain, language_model = make_chain(response_cache=cache)
+    chain.run("정산 일정 알려주세요")
+    assert len(cache.entries) == 1
+
+    # 대화 이력이 있는 후속 질문은 저장하지도, 다른 대화의 답변으로 쓰지도 않습니다.
+    chain.run("그럼 비용은?")
+    assert len(cache.entries) == 1
+    calls = language_model.calls
+    chain.run("정산 일정 알려주세요")
+    assert language_model.calls > calls
+
+def test_truncate_history_keeps_most_recent_lines(fake_encoder):
+    from chains.retrieval_qa_chain import truncate_history
+
+    history = "\n".join(f"사용자: 질문 {i}" for i in range(10))
+    assert truncate_history(history, max_tokens=10_000) == history
+
+    truncated = truncate_history(history, max_tokens=30)
+    assert truncated.endswith("사용자: 질문 9")
+    assert "질문 0" not in truncated
+    assert len(fake_encoder.encode(truncated + "\n")) <= 30
+
+def test_assemble_prompt_drops_lowest_ranked_documents_over_budget(make_chain):
+    from prompts.prompt_assembler import CompiledPrompt
+
+    chain, _ = make_chain(prompt_token_budget=40)
+    prompt = CompiledPrompt("# 문서\n{context}\n")
+    system_prompt = chain.assemble_prompt(prompt, ["짧은 문서", "아주 " * 50 + "긴 문서"])
+    assert "짧은 문서" in system_prompt and "긴 문서" not in system_prompt
+
+    system_prompt = chain.assemble_prompt(prompt, ["아주 " * 50])
+    assert "해당 카테고리에 대한 추가 정보는 제공되지 않습니다." in system_prompt
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+from caches.semantic_cache import SemanticCache
+
+def embedding(*values):
+    return list(values)
+
+def test_lookup_returns_answer_above_threshold():
+    cache = SemanticCache(threshold=0.95)
+    cache.add("정산 일정", embedding(1, 0, 0), "답변", "정산관리", "의도", {"1": "hash"})
+    hit = cache.lookup(embedding(1, 0.01, 0))
+    assert hit['answer'] == "답변" and hit['document_ids'] == ["1"]
+    assert cache.lookup(embedding(0, 1, 0)) is None
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    cache = SemanticCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr("caches.semantic_cache.time.time", lambda: now[0])
+    cache.add("정산 일정", embedding(1, 0), "답변", "정산관리", "의도")
+    now[0] += 11
+    assert cache.lookup(embedding(1, 0)) is None
+    assert not cache.entries
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.add("a", embedding(1, 0, 0), "A", None, None)
+    cache.add("b", embedding(0, 1, 0), "B", None, None)
+    assert cache.lookup(embedding(1, 0, 0))['answer'] == "A"
+    cache.add("c", embedding(0, 0, 1), "C", None, None)
+    assert cache.lookup(embedding(0, 1, 0)) is None
+    assert cache.lookup(embedding(1, 0, 0))['answer'] == "A"
+
+def test_invalidate_changed_removes_stale_entries():
+    cache = SemanticCache()
+    cache.add("a", embedding(1, 0), "A", None, None, {"1": "old"})
+    cache.add("b", embedding(0, 1), "B", None, None, {"2": "same"})
+    assert cache.invalidate_changed({"1": "new", "2": "same"}) == 1
+    assert cache.lookup(embedding(0, 1))['answer'] == "B"
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SemanticCache(persist_path=path, embedding_model="model-a")
+    cache.add("a", embedding(3, 4), "A", "정산관리", "의도")
+    cache.save()
+    assert not list(tmp_path.glob("*.tmp"))
+
+    loaded = SemanticCache(persist_path=path, embedding_model="model-a")
+    assert loaded.lookup(embedding(3, 4))['answer'] == "A"
+    np.testing.assert_allclose(next(iter(loaded.entries.values()))['embedding'], [0.6, 0.8], rtol=1e-6)
+    with open(path, encoding="utf-8") as file:
+        assert json.load(file)['embedding_model'] == "model-a"
+
+def test_cache_from_other_embedding_model_is_ignored(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SemanticCache(persist_path=path, embedding_model="model-a")
+    cache.add("a", embedding(1, 0), "A", None, None)
+    cache.save()
+    assert not SemanticCache(persist_path=path, embedding_model="model-b").entries
+
+def test_concurrent_saves_to_shared_path(tmp_path):
+    import threading
+
+    path = str(tmp_path / "cache.json")
+    caches = []
+    for index in range(8):
+        cache = SemanticCache(persist_path=path)
+        cache.add(f"질문 {index}", embedding(1, index), f"답변 {index}", None, None)
+        caches.append(cache)
+
+    errors = []
+    def save(cache):
+        try:
+            for _ in range(20):
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert not list(tmp_path.glob("*.tmp"))
+    assert len(SemanticCache(persist_path=path).entries) == 1
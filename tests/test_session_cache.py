@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from caches.session_cache import SessionCandidateCache, is_follow_up
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def candidates():
+    embeddings = [unit(1, 0, 0), unit(1, 0.1, 0), unit(0, 1, 0), unit(0, 0, 1)]
+    return [
+        {'id': str(i), 'text': f"문서 {i}", 'score': 1 / (1 + i), 'metadata': {}, 'embedding': embedding}
+        for i, embedding in enumerate(embeddings)
+    ]
+
+@pytest.mark.parametrize("query, expected", [
+    ("그럼 기한은요?", True),
+    ("그거 취소하면요?", True),
+    ("수수료는요?", True),
+    ("정산 기한은요?", True),
+    ("상품 등록 방법 알려주세요", False),
+    ("스마트스토어 정산 일정은 어떻게 되나요?", False),
+])
+def test_is_follow_up(query, expected):
+    assert is_follow_up(query) is expected
+
+def test_update_returns_top_k_without_embeddings():
+    cache = SessionCandidateCache()
+    top = cache.update(candidates(), 2)
+    assert [result['id'] for result in top] == ["0", "1"]
+    assert all('embedding' not in result for result in top)
+    assert cache.embeddings.shape == (4, 3)
+
+def test_new_topic_question_does_not_reuse_pool():
+    cache = SessionCandidateCache()
+    cache.update(candidates(), 2)
+    assert cache.rerank("상품 등록 방법 알려주세요", unit(1, 0, 0), 2, 0.0) is None
+    assert cache.hits == 0
+
+def test_follow_up_reranks_pool_and_carries_category():
+    cache = SessionCandidateCache()
+    cache.update(candidates(), 2)
+    cache.remember_category("정산관리")
+    results, category = cache.rerank("그럼 기한은요?", unit(1, 0.02, 0), 2, 0.0)
+    assert [result['id'] for result in results] == ["0", "1"]
+    assert results[0]['score'] > 0.99
+    assert category == "정산관리"
+    assert cache.hits == 1 and cache.category_reuses == 1
+
+def test_follow_up_on_different_topic_falls_back():
+    cache = SessionCandidateCache(fallback_threshold=0.8)
+    cache.update([result for result in candidates() if result['id'] in ("0", "1")], 2)
+    # 코사인 0.5(점수 0.5)는 같은 도메인의 다른 주제에서도 흔하므로 재사용하지 않습니다.
+    assert cache.rerank("그럼 배송은요?", unit(1, np.sqrt(3), 0), 2, 0.0) is None
+    assert cache.misses == 1
+
+def test_clear_and_missing_embeddings_disable_reuse():
+    cache = SessionCandidateCache()
+    cache.update(candidates(), 2)
+    cache.clear()
+    assert cache.rerank("그럼 기한은요?", unit(1, 0, 0), 2, 0.0) is None
+    without_embeddings = [{key: value for key, value in result.items() if key != 'embedding'} for result in candidates()]
+    assert len(cache.update(without_embeddings, 2)) == 2
+    assert cache.rerank("그럼 기한은요?", unit(1, 0, 0), 2, 0.0) is None
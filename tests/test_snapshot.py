@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from caches.semantic_cache import SemanticCache
+from stores.scoring import similarity_from_distance
+from stores.snapshot import SnapshotVectorStore, write_snapshot
+
+class FakeEmbedding:
+    model = "fake-embedding"
+
+    def get_embedding(self, text):
+        return [1.0, 0.0, 0.0]
+
+class FakeStore:
+    def __init__(self, embeddings, space="l2"):
+        self.embedding_model = FakeEmbedding()
+        self.space = space
+        self.embeddings = embeddings
+
+    def load_records(self, include_embeddings=False):
+        return [
+            {'id': str(index), 'text': f"문서 {index}", 'metadata': {'category': "정산관리"}, 'embedding': list(embedding)}
+            for index, embedding in enumerate(self.embeddings)
+        ]
+
+EMBEDDINGS = [[2.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 3.0]]
+
+def chroma_distance(embedding, query, space):
+    embedding, query = np.asarray(embedding), np.asarray(query)
+    if space == "cosine":
+        return 1 - embedding @ query / (np.linalg.norm(embedding) * np.linalg.norm(query))
+    if space == "ip":
+        return 1 - embedding @ query
+    return float(((embedding - query) ** 2).sum())
+
+def test_similarity_from_distance_matches_across_spaces():
+    # 단위 벡터에서 cosine 거리는 제곱 L2 거리의 절반이므로 두 배로 변환합니다.
+    assert similarity_from_distance(0.5, "l2") == similarity_from_distance(0.25, "cosine") == pytest.approx(2 / 3)
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_snapshot_scores_match_collection_space(tmp_path, space):
+    write_snapshot(FakeStore(EMBEDDINGS, space), str(tmp_path))
+    store = SnapshotVectorStore(str(tmp_path), FakeEmbedding())
+    assert store.space == space
+
+    query = [0.8, 0.6, 0.0]
+    results = store.similarity_search("질문", n_results=3, threshold=0.0, query_embedding=query)
+    expected = sorted(
+        ((str(index), similarity_from_distance(chroma_distance(embedding, query, space), space)) for index, embedding in enumerate(EMBEDDINGS)),
+        key=lambda item: -item[1]
+    )
+    assert [result['id'] for result in results] == [doc_id for doc_id, _ in expected]
+    for result, (_, score) in zip(results, expected):
+        assert result['score'] == pytest.approx(score, rel=1e-5)
+    store.close()
+
+def test_snapshot_round_trips_records_and_caches(tmp_path):
+    cache = SemanticCache()
+    cache.add("정산 일정", [1.0, 0.0], "답변", "정산관리", "의도", {"0": "hash"})
+    write_snapshot(FakeStore(EMBEDDINGS), str(tmp_path), response_cache=cache)
+
+    store = SnapshotVectorStore(str(tmp_path), FakeEmbedding())
+    assert store.load_documents() == ["문서 0", "문서 1", "문서 2"]
+    assert store.load_records()[1]['metadata'] == {'category': "정산관리"}
+
+    loaded = SemanticCache()
+    assert store.load_cache("response_cache", loaded)
+    assert loaded.lookup([1.0, 0.0])['answer'] == "답변"
+    assert not store.load_cache("answer_bank", SemanticCache())
+    store.close()
+
+def test_snapshot_cache_matrix_stays_memory_mapped_until_add(tmp_path):
+    cache = SemanticCache(ttl_seconds=None)
+    cache.add("정산 일정", [1.0, 0.0], "정산", None, None, {"0": "hash"})
+    cache.add("상품 등록", [0.0, 1.0], "상품", None, None, {"1": "hash"})
+    write_snapshot(FakeStore(EMBEDDINGS), str(tmp_path), response_cache=cache)
+    store = SnapshotVectorStore(str(tmp_path), FakeEmbedding())
+
+    loaded = SemanticCache(ttl_seconds=None)
+    store.load_cache("response_cache", loaded)
+    assert loaded.lookup([0.0, 1.0])['answer'] == "상품"
+    assert isinstance(loaded._matrix, np.memmap)
+
+    # 지운 항목은 공유 행렬을 복사하지 않고 검색에서만 제외합니다.
+    assert loaded.invalidate_documents(["1"]) == 1
+    assert loaded.lookup([0.0, 1.0]) is None
+    assert isinstance(loaded._matrix, np.memmap)
+
+    loaded.add("배송비", [0.6, 0.8], "배송", None, None)
+    assert loaded.lookup([0.6, 0.8])['answer'] == "배송"
+    assert not isinstance(loaded._matrix, np.memmap)
+    assert loaded.lookup([1.0, 0.0])['answer'] == "정산"
+    store.close()
@@ -0,0 +1,76 @@
+import pytest
+
+from utils.deduplicate import merged_questions, source_questions
+
+@pytest.fixture
+def splitter_factory(fake_encoder, monkeypatch):
+    from utils import splitter
+
+    monkeypatch.setattr(splitter, "get_encoder", lambda encoding_name=None: fake_encoder)
+    return splitter.TokenTextSplitter
+
+def sentence(index):
+    return f"문장 {index} 은 정산 절차 를 설명합니다."
+
+def test_long_answer_is_split_within_budget_with_question_on_every_chunk(splitter_factory):
+    splitter = splitter_factory(chunk_tokens=60, overlap_tokens=10, pack_tokens=0)
+    answer = " ".join(sentence(i) for i in range(12))
+    documents, metadatas = splitter.split([{'question': "정산 절차", 'answer': answer}])
+
+    assert len(documents) > 1
+    assert all(document.startswith("Q: 정산 절차\nA: ") for document in documents)
+    assert all(metadata['token_count'] <= 60 for metadata in metadatas)
+    # 모든 문장이 어느 청크에든 들어 있어야 합니다.
+    assert all(any(sentence(i) in document for document in documents) for i in range(12))
+
+def test_consecutive_chunks_overlap(splitter_factory):
+    splitter = splitter_factory(chunk_tokens=60, overlap_tokens=20, pack_tokens=0)
+    answer = " ".join(sentence(i) for i in range(12))
+    documents, _ = splitter.split([{'question': "정산 절차", 'answer': answer}])
+
+    assert len(documents) > 1
+    for previous, current in zip(documents, documents[1:]):
+        # 다음 청크는 이전 청크의 마지막 문장 끝부분으로 시작합니다.
+        head = current.partition("\nA: ")[2].split(". ")[0] + "."
+        assert previous.endswith(head)
+
+def test_short_items_are_packed_by_category(splitter_factory):
+    splitter = splitter_factory(chunk_tokens=200, overlap_tokens=10, pack_tokens=50)
+    items = [
+        {'question': "정산 일정", 'answer': "매주 수요일", 'category': "정산", 'source_question': "정산 일정은?"},
+        {'question': "정산 계좌", 'answer': "등록 계좌", 'category': "정산", 'source_question': "정산 계좌는?"},
+        {'question': "쿠폰 사용", 'answer': "결제 화면", 'category': "쿠폰"},
+    ]
+    documents, metadatas = splitter.split(items)
+
+    assert documents[0] == "Q: 정산 일정\nA: 매주 수요일\n\nQ: 정산 계좌\nA: 등록 계좌"
+    assert merged_questions(metadatas[0]) == ["정산 계좌"]
+    assert metadatas[0]['packed_count'] == 2
+    assert source_questions(metadatas[0]) == {"정산 일정": "정산 일정은?", "정산 계좌": "정산 계좌는?"}
+    assert documents[1] == "Q: 쿠폰 사용\nA: 결제 화면"
+    assert metadatas[1]['category'] == "쿠폰" and 'source_questions' not in metadatas[1]
+
+def test_overlap_must_be_less_than_half_chunk(splitter_factory):
+    with pytest.raises(ValueError):
+        splitter_factory(chunk_tokens=40, overlap_tokens=20)
+
+def test_oversized_word_is_split_on_token_boundaries(splitter_factory):
+    splitter = splitter_factory(chunk_tokens=20, overlap_tokens=2, pack_tokens=0)
+    word = "가" * 100
+    documents, metadatas = splitter.split([{'question': "q", 'answer': word}])
+
+    assert all(metadata['token_count'] <= 20 for metadata in metadatas)
+    assert "".join(document.partition("\nA: ")[2].replace(" ", "") for document in documents) == word
+
+def test_long_question_header_is_truncated_to_fit_chunk(splitter_factory):
+    splitter = splitter_factory(chunk_tokens=80, overlap_tokens=5, pack_tokens=0)
+    question = " ".join(f"질문{i}" for i in range(60))
+    answer = " ".join(sentence(i) for i in range(6))
+    documents, metadatas = splitter.split([{'question': question, 'answer': answer}])
+
+    assert len(documents) > 1
+    assert all(metadata['token_count'] <= 80 for metadata in metadatas)
+    # 청크 본문에는 잘린 질문을 붙이고, 메타데이터에는 원래 질문을 그대로 남깁니다.
+    assert all(metadata['question'] == question for metadata in metadatas)
+    assert all(document.startswith("Q: 질문0 ") and question not in document for document in documents)
+    assert all(any(sentence(i) in document for document in documents) for i in range(6))
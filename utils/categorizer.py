@@ -0,0 +1,46 @@
+from constants import FAQ_CATEGORY_KEYWORDS, DEFAULT_FAQ_CATEGORY
+
+def category_scores(text):
+    """
+    텍스트에 포함된 카테고리별 키워드 수를 셉니다.
+
+    Parameters:
+        text (str): 질문 또는 문서 텍스트
+
+    Returns:
+        dict: 키워드가 하나 이상 일치한 카테고리별 일치 키워드 수
+    """
+    compact_text = text.replace(" ", "")
+    scores = {}
+    for category, keywords in FAQ_CATEGORY_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword.replace(" ", "") in compact_text)
+        if score:
+            scores[category] = score
+    return scores
+
+def match_categories(text):
+    """
+    텍스트에 포함된 키워드로 관련 카테고리를 찾습니다.
+
+    Parameters:
+        text (str): 질문 또는 문서 텍스트
+
+    Returns:
+        list: 일치한 키워드 수가 많은 순으로 정렬된 카테고리 리스트
+    """
+    scores = category_scores(text)
+    return sorted(scores, key=lambda category: -scores[category])
+
+def assign_category(question, answer=""):
+    """
+    FAQ 항목의 카테고리를 정합니다. 질문의 키워드를 우선하고, 없으면 답변의 키워드를 사용합니다.
+
+    Parameters:
+        question (str): FAQ 질문
+        answer (str): FAQ 답변
+
+    Returns:
+        str: 카테고리 이름
+    """
+    matches = match_categories(question) or match_categories(answer)
+    return matches[0] if matches else DEFAULT_FAQ_CATEGORY
@@ -0,0 +1,217 @@
+import json
+import logging
+import zlib
+
+import numpy as np
+
+QUESTION_PREFIX = "Q: "
+ANSWER_PREFIX = "A: "
+
+def answer_body(document):
+    """
+    청크에서 질문 부분을 제외한 답변 본문을 반환합니다.
+    같은 답변이 여러 질문에 반복되는 경우를 찾기 위해 질문은 비교 대상에서 제외합니다.
+
+    Parameters:
+        document (str): "Q: 질문\nA: 답변" 형식의 청크 또는 이어지는 답변 청크
+
+    Returns:
+        str: 답변 본문
+    """
+    if document.startswith(QUESTION_PREFIX):
+        _, _, rest = document.partition("\n")
+        return rest[len(ANSWER_PREFIX):] if rest.startswith(ANSWER_PREFIX) else rest
+    return document
+
+def shingles(text, size=3):
+    """
+    공백으로 구분된 토큰(Okt 형태소)으로 연속된 토큰 묶음(shingle)의 해시 집합을 만듭니다.
+
+    Parameters:
+        text (str): 형태소 단위로 띄어 쓴 텍스트
+        size (int): shingle당 토큰 수 (기본값: 3)
+
+    Returns:
+        set: shingle의 32비트 해시 집합
+    """
+    tokens = text.split()
+    if not tokens:
+        return set()
+    if len(tokens) <= size:
+        return {zlib.crc32(" ".join(tokens).encode('utf-8'))}
+    return {
+        zlib.crc32(" ".join(tokens[i:i + size]).encode('utf-8'))
+        for i in range(len(tokens) - size + 1)
+    }
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class NearDuplicateFilter:
+    def __init__(self, threshold=0.9, num_perm=128, bands=16, shingle_size=3, seed=0):
+        """
+        MinHash 서명과 LSH 밴딩으로 거의 같은 청크를 찾아 하나로 합치는 필터 초기화.
+
+        LSH 버킷을 공유하는 후보만 실제 Jaccard 유사도로 비교하므로 모든 쌍을 비교하지 않습니다.
+
+        Parameters:
+            threshold (float): 중복으로 판단할 Jaccard 유사도 임계값 (기본값: 0.9)
+            num_perm (int): MinHash 해시 함수 수 (기본값: 128)
+            bands (int): LSH 밴드 수, num_perm의 약수여야 함 (기본값: 16)
+            shingle_size (int): shingle당 토큰 수 (기본값: 3)
+            seed (int): 해시 함수 난수 시드 (기본값: 0)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm은 bands의 배수여야 합니다.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # 곱셈-시프트 해싱: (a * x + b) mod 2^64의 상위 32비트, a는 홀수
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = generator.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        """
+        shingle 집합의 MinHash 서명을 계산합니다.
+
+        Parameters:
+            shingle_set (set): shingle 해시 집합
+
+        Returns:
+            numpy.ndarray: (num_perm,) 형태의 서명
+        """
+        if not shingle_set:
+            return np.zeros(self.num_perm, dtype=np.uint64)
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def deduplicate(self, documents, metadatas):
+        """
+        거의 같은 청크를 하나로 합칩니다. 먼저 나온 청크를 대표로 남기고,
+        합쳐진 청크의 원래 질문은 대표 청크의 메타데이터에 기록합니다.
+        답변 본문이 shingle_size 토큰보다 짧은 청크는 비교하지 않고 그대로 남깁니다.
+
+        Parameters:
+            documents (list): 청크 리스트
+            metadatas (list): 각 청크의 메타데이터 ('question' 키 사용)
+
+        Returns:
+            tuple: (남은 청크 리스트, 남은 메타데이터 리스트, 결과 요약 딕셔너리)
+        """
+        buckets = {}
+        representatives = []
+        merged = {}
+        saved_bytes = 0
+
+        short = 0
+        for index, document in enumerate(documents):
+            body = answer_body(document)
+            if len(body.split()) < self.shingle_size:
+                # shingle 하나도 만들 수 없는 짧은 답변은 서명이 한두 값으로 뭉쳐 우연히 같아지기 쉬우므로
+                # 질문이 다른 청크를 잘못 합치지 않도록 비교하지 않고 그대로 남깁니다.
+                representatives.append((index, None))
+                short += 1
+                continue
+            shingle_set = shingles(body, self.shingle_size)
+            band_keys = self._band_keys(self.signature(shingle_set))
+
+            candidates = {rep for key in band_keys for rep in buckets.get(key, ())}
+            match = max(
+                ((jaccard(shingle_set, representatives[rep][1]), rep) for rep in candidates),
+                default=(0.0, None)
+            )
+            if match[1] is not None and match[0] >= self.threshold:
+                merged.setdefault(representatives[match[1]][0], []).append(index)
+                saved_bytes += len(document.encode('utf-8'))
+                continue
+
+            rep = len(representatives)
+            representatives.append((index, shingle_set))
+            for key in band_keys:
+                buckets.setdefault(key, []).append(rep)
+
+        kept_documents, kept_metadatas = [], []
+        for index, _ in representatives:
+            metadata = dict(metadatas[index])
+            duplicates = merged.get(index)
+            if duplicates:
+                # 여러 항목을 묶은 청크는 이미 merged_questions를 가지므로 함께 합칩니다.
+                questions = merged_questions(metadata)
+                for duplicate in duplicates:
+                    for question in [metadatas[duplicate].get('question')] + merged_questions(metadatas[duplicate]):
+                        if question and question != metadata.get('question') and question not in questions:
+                            questions.append(question)
+                # Chroma 메타데이터는 스칼라 값만 허용하므로 JSON 문자열로 저장합니다.
+                metadata['merged_questions'] = json.dumps(questions, ensure_ascii=False)
+                metadata['duplicate_count'] = len(duplicates)
+                sources = source_questions(metadata)
+                for duplicate in duplicates:
+                    for question, source in source_questions(metadatas[duplicate]).items():
+                        sources.setdefault(question, source)
+                if sources:
+                    metadata['source_questions'] = json.dumps(sources, ensure_ascii=False)
+            kept_documents.append(documents[index])
+            kept_metadatas.append(metadata)
+
+        report = {
+            'input': len(documents),
+            'kept': len(kept_documents),
+            'embeddings_saved': len(documents) - len(kept_documents),
+            'bytes_saved': saved_bytes,
+            'merged_groups': len(merged),
+            'skipped_short': short
+        }
+        logging.info(
+            "중복 제거 완료. 입력: %d개, 유지: %d개, 절약한 임베딩: %d개, 절약한 텍스트: %d바이트",
+            report['input'], report['kept'], report['embeddings_saved'], report['bytes_saved']
+        )
+        return kept_documents, kept_metadatas, report
+
+def merged_questions(metadata):
+    """
+    청크 메타데이터에서 중복 제거나 짧은 항목 묶음으로 합쳐진 질문 목록을 읽습니다.
+
+    Parameters:
+        metadata (dict): 청크 메타데이터
+
+    Returns:
+        list: 합쳐진 질문 리스트 (없으면 빈 리스트)
+    """
+    value = (metadata or {}).get('merged_questions')
+    if not value:
+        return []
+    try:
+        return json.loads(value)
+    except ValueError:
+        return []
+
+def source_questions(metadata):
+    """
+    청크 메타데이터에서 전처리된 질문별 원래 질문 문장을 읽습니다.
+
+    Parameters:
+        metadata (dict): 청크 메타데이터
+
+    Returns:
+        dict: 전처리된 질문을 키로 하는 원래 질문 딕셔너리 (없으면 빈 딕셔너리)
+    """
+    value = (metadata or {}).get('source_questions')
+    if not value:
+        return {}
+    try:
+        sources = json.loads(value)
+    except ValueError:
+        return {}
+    return sources if isinstance(sources, dict) else {}
@@ -0,0 +1,13 @@
+import hashlib
+
+def content_hash(text):
+    """
+    텍스트 내용의 해시를 계산합니다.
+
+    Parameters:
+        text (str): 해시를 계산할 텍스트
+
+    Returns:
+        str: SHA-256 해시 문자열
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -78,14 +78,15 @@ def preprocess_qa_data(faq_data: dict) -> list:
 
     for question, answer in faq_data.items():
         # 질문과 답변에서 불필요한 특수문자 제거 및 전처리
-        cleaned_question = re.sub(r'\\[a-zA-Z0-9]+', '', question)
-        cleaned_question = preprocess_text(cleaned_question)
+        source_question = re.sub(r'\s+', ' ', re.sub(r'\\[a-zA-Z0-9]+', '', question)).strip()
+        cleaned_question = preprocess_text(source_question)
 
         cleaned_answer = re.sub(unwanted_text_pattern, '', answer).strip()
         cleaned_answer = re.sub(r'\\[a-zA-Z0-9]+', '', cleaned_answer)
         cleaned_answer = preprocess_text(cleaned_answer)
 
         # 정제된 질문과 답변을 리스트에 추가
-        qa_pairs.append({'question': cleaned_question, 'answer': cleaned_answer})
+        # 사용자는 형태소 분석 전의 문장으로 질문하므로, 대표 질문 임베딩용으로 원래 질문도 함께 보관합니다.
+        qa_pairs.append({'question': cleaned_question, 'answer': cleaned_answer, 'source_question': source_question})
 
     return qa_pairs
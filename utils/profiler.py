@@ -0,0 +1,230 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ("sample", "deterministic")
+
+# 스택 샘플과 메모리 스냅샷에서 제외할 프로파일러 자신의 프레임
+_IGNORED_FILES = (os.path.abspath(__file__), tracemalloc.__file__, threading.__file__)
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class QueryProfiler:
+    def __init__(self, output_dir="profiles", mode="sample", interval=0.005, trace_memory=True,
+                 top_allocations=20, traceback_depth=10):
+        """
+        질문 단위 CPU/메모리 프로파일러 초기화. 명시적으로 만들어 체인에 넘길 때만 동작하며,
+        체인에 프로파일러가 없으면 단계마다 None 확인 한 번 외에는 비용이 없습니다.
+
+        - sample: 백그라운드 스레드가 interval마다 질문을 처리하는 스레드의 스택을 기록합니다.
+          결과는 flamegraph.pl, speedscope 등에서 읽을 수 있는 접힌 스택(folded) 형식입니다.
+        - deterministic: 단계별 cProfile 결과를 .prof 파일로 저장합니다 (snakeviz, flameprof 등에서 사용).
+
+        두 모드 모두 단계별 경과/CPU 시간과 할당량을 기록하고, trace_memory가 켜져 있으면
+        질문 사이마다 tracemalloc 스냅샷을 비교하여 가장 많이 늘어난 할당 위치를 기록합니다.
+
+        Parameters:
+            output_dir (str): 결과 파일을 저장할 디렉터리 (기본값: "profiles")
+            mode (str): "sample" 또는 "deterministic" (기본값: "sample")
+            interval (float): 스택 샘플링 간격(초) (기본값: 0.005)
+            trace_memory (bool): tracemalloc으로 메모리를 추적할지 여부 (기본값: True)
+            top_allocations (int): 보고서에 기록할 할당 위치 수 (기본값: 20)
+            traceback_depth (int): tracemalloc이 저장할 호출 스택 깊이 (기본값: 10)
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"지원하지 않는 프로파일링 모드입니다: {mode}")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self.traceback_depth = traceback_depth
+
+        self.query_count = 0
+        self.queries = []
+        self.folded = Counter()
+        self.stage_profiles = {}
+
+        self._stages = []
+        self._query_folded = None
+        self._query_record = None
+        self._thread_id = None
+        self._sampler = None
+        self._running = threading.Event()
+        self._active_profile = None
+        self._previous_snapshot = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """
+        프로파일링을 시작합니다. 메모리 추적과 샘플링 스레드를 켭니다.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_depth)
+            self._started_tracemalloc = True
+        if self.trace_memory:
+            self._previous_snapshot = self._snapshot()
+        if self.mode == "sample":
+            self._running.set()
+            self._sampler = threading.Thread(target=self._sample_loop, name="query-profiler", daemon=True)
+            self._sampler.start()
+        logging.info("프로파일링을 시작했습니다. 모드: %s, 출력 디렉터리: %s", self.mode, self.output_dir)
+
+    def stop(self):
+        """
+        프로파일링을 멈추고 전체 결과를 저장합니다.
+        """
+        if self._sampler is not None:
+            self._running.clear()
+            self._sampler.join()
+            self._sampler = None
+        if self.mode == "sample":
+            self._write_folded(os.path.join(self.output_dir, "cpu.folded"), self.folded)
+        else:
+            for name, profile in self.stage_profiles.items():
+                profile.dump_stats(os.path.join(self.output_dir, f"stage_{name.replace('/', '.')}.prof"))
+            self._write_stage_functions(os.path.join(self.output_dir, "cpu_top.txt"))
+        if self.trace_memory:
+            self._write_allocations(os.path.join(self.output_dir, "allocations_top.txt"), self._snapshot().statistics('traceback'), "전체 할당 상위")
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        with open(os.path.join(self.output_dir, "stages.json"), "w", encoding="utf-8") as file:
+            json.dump(self.queries, file, ensure_ascii=False, indent=2)
+        logging.info("프로파일링 결과를 저장했습니다: %s", self.output_dir)
+
+    @contextmanager
+    def query(self, query):
+        """
+        질문 하나의 처리 구간을 표시합니다. 끝나면 질문별 접힌 스택과 이전 질문 이후 늘어난 할당을 저장합니다.
+
+        Parameters:
+            query (str): 사용자 질문
+        """
+        self.query_count += 1
+        self._thread_id = threading.get_ident()
+        self._query_folded = Counter()
+        self._query_record = {'query': query, 'number': self.query_count, 'stages': {}}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # 보고서 작성 시간이 샘플에 섞이지 않도록 먼저 샘플링 대상을 비웁니다.
+            record, folded = self._query_record, self._query_folded
+            self._query_record, self._query_folded = None, None
+            record['wall_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['retained_kib'] = round((current - start_memory) / 1024, 1)
+                record['peak_kib'] = round((peak - start_memory) / 1024, 1)
+                snapshot = self._snapshot()
+                growth = snapshot.compare_to(self._previous_snapshot, 'traceback')
+                self._previous_snapshot = snapshot
+                self._write_allocations(
+                    os.path.join(self.output_dir, "allocations.txt"), growth,
+                    f"질문 {record['number']}: {query}", append=True
+                )
+            if self.mode == "sample":
+                self._write_folded(os.path.join(self.output_dir, f"query_{record['number']:03d}.folded"), folded)
+            self.queries.append(record)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        처리 단계 구간을 표시합니다. 단계 안에서 다시 단계를 표시하면 "바깥/안쪽" 경로로 기록됩니다.
+
+        Parameters:
+            name (str): 단계 이름 (예: retrieval, category, prompt)
+        """
+        self._stages.append(name)
+        path = "/".join(self._stages)
+        outer_profile = self._active_profile
+        if self.mode == "deterministic":
+            # cProfile은 한 번에 하나만 켤 수 있으므로 바깥 단계의 프로파일을 잠시 멈춥니다.
+            if outer_profile is not None:
+                outer_profile.disable()
+            self._active_profile = self.stage_profiles.setdefault(path, cProfile.Profile())
+            self._active_profile.enable()
+        start_memory = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - started, time.thread_time() - started_cpu
+            allocated = tracemalloc.get_traced_memory()[0] - start_memory if self.trace_memory else 0
+            if self.mode == "deterministic":
+                self._active_profile.disable()
+                self._active_profile = outer_profile
+                if outer_profile is not None:
+                    outer_profile.enable()
+            self._stages.pop()
+            if self._query_record is not None:
+                stats = self._query_record['stages'].setdefault(path, {'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'retained_kib': 0.0})
+                stats['calls'] += 1
+                stats['wall_ms'] = round(stats['wall_ms'] + wall * 1000, 3)
+                stats['cpu_ms'] = round(stats['cpu_ms'] + cpu * 1000, 3)
+                stats['retained_kib'] = round(stats['retained_kib'] + allocated / 1024, 1)
+
+    def _sample_loop(self):
+        """
+        질문 처리 중인 스레드의 스택을 주기적으로 기록합니다. 경과 시간 기준 샘플이므로
+        LLM 응답 대기 같은 I/O 대기 시간도 함께 나타납니다.
+        """
+        while self._running.is_set():
+            time.sleep(self.interval)
+            folded = self._query_folded
+            if folded is None:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename not in _IGNORED_FILES and not code.co_filename.endswith("contextlib.py"):
+                    frames.append(_frame_label(code))
+                frame = frame.f_back
+            stages = [f"[{stage}]" for stage in list(self._stages)] or ["[other]"]
+            key = ";".join(stages + frames[::-1])
+            folded[key] += 1
+            self.folded[key] += 1
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES
+        ] + [tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")])
+
+    def _write_folded(self, path, folded):
+        with open(path, "w", encoding="utf-8") as file:
+            for key, count in folded.most_common():
+                file.write(f"{key} {count}\n")
+
+    def _write_allocations(self, path, statistics, title, append=False):
+        with open(path, "a" if append else "w", encoding="utf-8") as file:
+            file.write(f"=== {title} ===\n")
+            for statistic in statistics[:self.top_allocations]:
+                size_diff = getattr(statistic, 'size_diff', None)
+                change = f" ({size_diff / 1024:+.1f} KiB)" if size_diff is not None else ""
+                file.write(f"{statistic.size / 1024:.1f} KiB{change}, {statistic.count}개 블록\n")
+                for line in statistic.traceback.format(limit=self.traceback_depth, most_recent_first=True):
+                    file.write(f"    {line}\n")
+            file.write("\n")
+
+    def _write_stage_functions(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for name, profile in self.stage_profiles.items():
+                file.write(f"=== {name} ===\n")
+                pstats.Stats(profile, stream=file).sort_stats('cumulative').print_stats(self.top_allocations)
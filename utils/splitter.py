@@ -1,5 +1,11 @@
+import json
+import re
+
 from tqdm import tqdm
 
+from utils.deduplicate import source_questions
+from utils.tokenizer import DEFAULT_ENCODING, get_encoder
+
 class FAQTextSplitter:
     def __init__(self, chunk_size, chunk_overlap, separator_pattern='\n\n'):
         """
@@ -35,7 +41,7 @@ class FAQTextSplitter:
 
             chunks = self.split_document(combined_text)
             documents.extend(chunks)
-            metadatas.extend([{'question': question}] * len(chunks))
+            metadatas.extend({'question': question} for _ in chunks)
 
         return documents, metadatas
 
@@ -68,3 +74,228 @@ class FAQTextSplitter:
             chunks.append(current_chunk.strip())
 
         return chunks
+
+# 한국어 문장 경계. 전처리(normalize_text)에서 문장 부호가 지워지므로 종결 어미 뒤의 공백도 경계로 봅니다.
+SENTENCE_BOUNDARY = re.compile(
+    r'\n+'
+    r'|(?<=[.!?])\s+'
+    r'|(?<=죠)\s+'
+    r'|(?<=니다|니까|세요|어요|아요|해요|에요|예요|네요|지요|까요|군요|었다|았다|였다|한다|된다|있다|없다|이다)\s+'
+)
+
+class TokenTextSplitter:
+    def __init__(self, chunk_tokens=256, overlap_tokens=32, pack_tokens=64, encoding_name=DEFAULT_ENCODING):
+        """
+        FAQ 텍스트를 토큰 수 기준으로 분할하는 클래스 초기화.
+
+        긴 답변은 한국어 문장 경계에서 나누고 이전 청크의 끝부분을 토큰 수 기준으로 겹쳐 넣으며,
+        짧은 FAQ 항목은 같은 카테고리끼리 한 청크로 묶어 임베딩 호출 수를 줄입니다.
+
+        Parameters:
+            chunk_tokens (int): 청크의 최대 토큰 수 (기본값: 256)
+            overlap_tokens (int): 이어지는 청크에 겹쳐 넣을 최대 토큰 수 (기본값: 32)
+            pack_tokens (int): 이 토큰 수 이하인 FAQ 항목은 다른 항목과 묶음, 0이면 묶지 않음 (기본값: 64)
+            encoding_name (str): tiktoken 인코딩 이름 (기본값: 'cl100k_base')
+        """
+        if overlap_tokens >= chunk_tokens // 2:
+            raise ValueError("overlap_tokens는 chunk_tokens의 절반보다 작아야 합니다.")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.pack_tokens = min(pack_tokens, chunk_tokens)
+        self.encoder = get_encoder(encoding_name)
+
+    def _count(self, text):
+        return len(self.encoder.encode_ordinary(text))
+
+    def sentences(self, text):
+        """
+        텍스트를 문장 단위로 나눕니다.
+
+        Parameters:
+            text (str): 답변 텍스트
+
+        Returns:
+            list: 문장 리스트
+        """
+        return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+    def _units(self, text, limit):
+        """
+        텍스트를 limit 토큰 이하의 (조각, 토큰 수) 단위로 나눕니다. 문장 경계를 우선하고,
+        limit보다 긴 문장은 단어 경계에서, 그래도 긴 단어는 토큰 경계에서 나눕니다.
+        조각을 공백으로 이어 붙일 때 생기는 토큰을 고려해 조각마다 1토큰을 더해 셉니다.
+        """
+        for sentence in self.sentences(text):
+            count = self._count(sentence) + 1
+            if count <= limit:
+                yield sentence, count
+                continue
+
+            words, words_tokens = [], 0
+            for word in sentence.split():
+                tokens = self.encoder.encode_ordinary(word)
+                if len(tokens) + 1 > limit:
+                    if words:
+                        yield " ".join(words), words_tokens
+                        words, words_tokens = [], 0
+                    for start in range(0, len(tokens), limit - 1):
+                        piece = tokens[start:start + limit - 1]
+                        yield self.encoder.decode(piece), len(piece) + 1
+                    continue
+                if words and words_tokens + len(tokens) + 1 > limit:
+                    yield " ".join(words), words_tokens
+                    words, words_tokens = [], 0
+                words.append(word)
+                words_tokens += len(tokens) + 1
+            if words:
+                yield " ".join(words), words_tokens
+
+    def _overlap(self, pieces):
+        """
+        청크의 끝에서 overlap_tokens 이내의 단어들을 다음 청크 앞에 붙일 조각으로 만듭니다.
+        """
+        words, tokens = [], 0
+        for word in reversed(" ".join(pieces).split()):
+            count = self._count(word) + 1
+            if tokens + count > self.overlap_tokens:
+                break
+            words.append(word)
+            tokens += count
+        if not words:
+            return [], 0
+        return [" ".join(reversed(words))], tokens
+
+    def split_answer(self, answer, budget):
+        """
+        답변을 budget 토큰 이하의 본문 조각으로 나눕니다. 이어지는 조각은 이전 조각의 끝부분으로 시작합니다.
+
+        Parameters:
+            answer (str): 답변 텍스트
+            budget (int): 조각당 최대 토큰 수
+
+        Returns:
+            generator: 본문 조각
+        """
+        pieces, tokens = [], 0
+        # 조각을 budget - overlap_tokens 이하로 나누었으므로 겹쳐 넣은 부분 뒤에는 항상 다음 조각이 들어갑니다.
+        for unit, count in self._units(answer, budget - self.overlap_tokens):
+            if pieces and tokens + count > budget:
+                yield " ".join(pieces)
+                pieces, tokens = self._overlap(pieces)
+            pieces.append(unit)
+            tokens += count
+        if pieces:
+            yield " ".join(pieces)
+
+    def _continuation_header(self, question):
+        """
+        긴 답변의 각 청크 앞에 붙일 질문 머리말을 만듭니다. 답변 본문에 청크의 절반 이상을 남기도록
+        머리말이 chunk_tokens의 절반을 넘으면 질문을 토큰 경계에서 잘라냅니다.
+        """
+        header = f"Q: {question}\nA: "
+        limit = self.chunk_tokens // 2
+        if self._count(header) <= limit:
+            return header
+        tokens = self.encoder.encode_ordinary(question)
+        keep = max(0, limit - self._count("Q: \nA: "))
+        while True:
+            header = f"Q: {self.encoder.decode(tokens[:keep]).rstrip()}\nA: "
+            # 잘린 경계에서 토큰이 합쳐지거나 나뉠 수 있으므로 실제 토큰 수로 확인합니다.
+            if keep == 0 or self._count(header) <= limit:
+                return header
+            keep -= 1
+
+    def _chunk(self, text, metadata):
+        metadata['token_count'] = self._count(text)
+        return text, metadata
+
+    def _flush(self, pack):
+        """
+        묶어 둔 짧은 FAQ 항목들을 청크 하나로 만듭니다.
+        """
+        text = "\n\n".join(entry_text for entry_text, _ in pack)
+        first = pack[0][1]
+        metadata = dict(first)
+        others = []
+        for _, entry in pack[1:]:
+            if entry['question'] and entry['question'] != first['question'] and entry['question'] not in others:
+                others.append(entry['question'])
+        sources = {}
+        for _, entry in pack:
+            for question, source in source_questions(entry).items():
+                sources.setdefault(question, source)
+        if sources:
+            metadata['source_questions'] = json.dumps(sources, ensure_ascii=False)
+        if others:
+            # 묶인 질문은 중복 제거로 합쳐진 질문과 같은 키에 기록하여 질문별 묶음에서 모두 찾을 수 있게 합니다.
+            metadata['merged_questions'] = json.dumps(others, ensure_ascii=False)
+            metadata['packed_count'] = len(pack)
+        return self._chunk(text, metadata)
+
+    def iter_chunks(self, faq_data):
+        """
+        FAQ 데이터를 청크로 분할하면서 하나씩 내보냅니다. 입력도 순서대로 한 항목씩 읽으므로
+        전체 데이터를 메모리에 올리지 않고 처리할 수 있습니다.
+
+        Parameters:
+            faq_data (iterable): FAQ 항목(question, answer, 선택적으로 category, source_question) 이터러블
+
+        Returns:
+            generator: (청크, 메타데이터) 튜플
+        """
+        separator_tokens = self._count("\n\n")
+        pack, pack_tokens = [], 0
+
+        for item in tqdm(faq_data, desc="FAQ 데이터 처리 중"):
+            question = item.get('question', '')
+            answer = item.get('answer', '')
+            metadata = {'question': question}
+            source = item.get('source_question')
+            if source and source != question:
+                metadata['source_questions'] = json.dumps({question: source}, ensure_ascii=False)
+            if item.get('category'):
+                metadata['category'] = item['category']
+
+            header = f"Q: {question}\nA: "
+            text = header + answer
+            tokens = self._count(text)
+
+            if tokens <= self.pack_tokens:
+                if pack and (
+                    pack[0][1].get('category') != metadata.get('category')
+                    or pack_tokens + separator_tokens + tokens > self.chunk_tokens
+                ):
+                    yield self._flush(pack)
+                    pack, pack_tokens = [], 0
+                pack_tokens += tokens + (separator_tokens if pack else 0)
+                pack.append((text, metadata))
+                continue
+
+            if tokens <= self.chunk_tokens:
+                yield self._chunk(text, metadata)
+                continue
+
+            # 이어지는 청크에도 질문을 붙여 청크마다 어떤 질문의 답변인지 드러나게 합니다.
+            header = self._continuation_header(question)
+            budget = self.chunk_tokens - self._count(header)
+            for body in self.split_answer(answer, budget):
+                yield self._chunk(header + body, dict(metadata))
+
+        if pack:
+            yield self._flush(pack)
+
+    def split(self, faq_data):
+        """
+        FAQ 데이터를 청크로 분할합니다.
+
+        Parameters:
+            faq_data (iterable): FAQ 데이터
+
+        Returns:
+            tuple: 분할된 문서 리스트와 메타데이터 리스트
+        """
+        documents, metadatas = [], []
+        for document, metadata in self.iter_chunks(faq_data):
+            documents.append(document)
+            metadatas.append(metadata)
+        return documents, metadatas
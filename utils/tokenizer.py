@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_ENCODING = 'cl100k_base'
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name=DEFAULT_ENCODING):
+    """
+    tiktoken 인코더를 불러옵니다. 인코더 생성은 어휘 파일을 읽고 정규식을 컴파일하므로 이름별로 한 번만 만듭니다.
+
+    Parameters:
+        encoding_name (str): 인코딩 이름 (기본값: 'cl100k_base')
+
+    Returns:
+        tiktoken.Encoding: 인코더
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    """
+    텍스트의 토큰 수를 계산합니다.
+
+    Parameters:
+        text (str): 입력 텍스트
+        encoding_name (str): 사용될 인코딩 이름 (기본값: 'cl100k_base')
+
+    Returns:
+        int: 토큰 수
+    """
+    return len(get_encoder(encoding_name).encode_ordinary(text))
+
+@lru_cache(maxsize=4096)
+def cached_count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    """
+    텍스트의 토큰 수를 계산하고 결과를 보관합니다. 검색 문서나 대화 이력 줄처럼
+    여러 단계와 질문에서 반복되는 텍스트를 다시 인코딩하지 않기 위해 사용합니다.
+
+    Parameters:
+        text (str): 입력 텍스트
+        encoding_name (str): 사용될 인코딩 이름 (기본값: 'cl100k_base')
+
+    Returns:
+        int: 토큰 수
+    """
+    return count_tokens(text, encoding_name)